@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+
+"""
+Offline accuracy and speed benchmark of `backend.lookup_song`.
+
+Replays the YTMusic responses of a fixture (see `spotify2ytmusic.replay`)
+for every track of its corpus, with each search algorithm, and reports:
+
+- precision: correct matches / songs a match was returned for
+- recall: correct matches / songs that are on YTMusic
+- API calls per track
+- CPU time per track
+
+The default fixture, fixtures/matcher_corpus.json.gz, holds the tracks of
+tests/playliststest.json and a synthetic library, with search results made
+to look like YTMusic's: the right song ranked among covers, live and
+karaoke versions, title variants such as "(Remastered)", songs only
+available as videos and songs not available at all.  It was generated by
+`--regenerate`; a fixture recorded from the real service with
+`replay.RecordingYTMusic` can be given instead with --fixture.
+
+    python -m benchmarks.matcher [--fixture FILE] [--algo 0 1 2] [--json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.replay import (
+    Fixture,
+    ReplayYTMusic,
+    load_fixture,
+    save_fixture,
+    search_key,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE = os.path.join(HERE, "fixtures", "matcher_corpus.json.gz")
+PLAYLISTS_FILE = os.path.join(HERE, os.pardir, "tests", "playliststest.json")
+
+WORDS = (
+    "love night heart fire dream light river blue gold summer rain road "
+    "home wild star ghost city dance shadow ocean stone silver echo winter "
+    "morning glass paper electric velvet sugar thunder neon broken lonely "
+    "midnight golden honey crystal desert empire garden hollow iron jungle"
+).split()
+PLACES = ["Wembley", "Budokan", "the BBC", "Red Rocks", "Montreux"]
+
+
+def _phrase(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).title()
+
+
+def _playliststest_albums() -> List[Dict[str, Any]]:
+    """The tracks of tests/playliststest.json, one album per track."""
+    albums = []
+    for song in backend.iter_spotify_playlist(
+        "68QlHDwCiXfhodLpS72iOx", PLAYLISTS_FILE, reverse_playlist=False
+    ):
+        albums.append(
+            {
+                "name": song.album,
+                "artist": song.artist,
+                "tracks": [(song.title, song.duration_ms or 200000)],
+            }
+        )
+    return albums
+
+
+def _synthetic_albums(rng: random.Random, tracks: int) -> List[Dict[str, Any]]:
+    albums = []
+    while tracks > 0:
+        count = min(tracks, rng.randint(6, 14))
+        tracks -= count
+        albums.append(
+            {
+                "name": _phrase(rng, 1, 3),
+                "artist": _phrase(rng, 1, 2),
+                "tracks": [
+                    (_phrase(rng, 1, 4), rng.randint(120, 420) * 1000)
+                    for _ in range(count)
+                ],
+            }
+        )
+    return albums
+
+
+def _result(
+    kind: str,
+    video_id: str,
+    title: str,
+    artists: Iterable[str],
+    album: Optional[str],
+    seconds: int,
+) -> Dict[str, Any]:
+    return {
+        "resultType": kind,
+        "videoId": video_id,
+        "title": title,
+        "artists": [{"name": name, "id": None} for name in artists],
+        "album": {"name": album, "id": None} if album else None,
+        "duration_seconds": seconds,
+    }
+
+
+def build_fixture(synthetic_tracks: int = 2500, seed: int = 2024) -> Fixture:
+    """Generate the benchmark corpus and the responses YTMusic would give."""
+    rng = random.Random(seed)
+    searches: Dict[str, Any] = {}
+    get_album: Dict[str, Any] = {}
+    tracks: List[Dict[str, Any]] = []
+    ids = iter(range(10**9))
+
+    def new_id(prefix: str) -> str:
+        return f"{prefix}{next(ids):07d}"
+
+    for album in _playliststest_albums() + _synthetic_albums(rng, synthetic_tracks):
+        artist = album["artist"]
+        album_query = f"{album['name']} by {artist}"
+        album_results = []
+        album_tracks: List[Dict[str, Any]] = []
+        on_ytmusic = rng.random() < 0.5
+        if on_ytmusic:
+            # The album is on YTMusic, behind a decoy compilation half the time
+            if rng.random() < 0.5:
+                decoy = new_id("MPREb_")
+                album_results.append({"browseId": decoy, "title": "Greatest Hits"})
+                get_album[decoy] = {
+                    "tracks": [
+                        _result(
+                            "song",
+                            new_id("d"),
+                            _phrase(rng, 1, 3),
+                            [artist],
+                            "Greatest Hits",
+                            200,
+                        )
+                    ]
+                }
+            browse_id = new_id("MPREb_")
+            album_results.append({"browseId": browse_id, "title": album["name"]})
+            get_album[browse_id] = {"tracks": album_tracks}
+        searches[search_key(album_query, "albums")] = album_results
+
+        for title, duration_ms in album["tracks"]:
+            seconds = duration_ms // 1000
+            src_title = title
+            if rng.random() < 0.15:
+                src_title = f"{title} - Remastered {rng.randint(1995, 2022)}"
+
+            decoys = [
+                _result(
+                    "song",
+                    new_id("c"),
+                    title,
+                    [_phrase(rng, 1, 2)],
+                    _phrase(rng, 1, 2),
+                    seconds + rng.randint(-25, 25),
+                ),
+                _result(
+                    "song",
+                    new_id("l"),
+                    f"{title} (Live)",
+                    [artist],
+                    f"Live at {rng.choice(PLACES)}",
+                    seconds + rng.randint(20, 90),
+                ),
+                _result(
+                    "song",
+                    new_id("k"),
+                    f"{title} (Karaoke Version)",
+                    ["Karaoke Hits Band"],
+                    "Karaoke Hits",
+                    seconds + rng.randint(-5, 5),
+                ),
+                _result(
+                    "song",
+                    new_id("o"),
+                    _phrase(rng, 1, 3),
+                    [artist],
+                    album["name"],
+                    rng.randint(120, 420),
+                ),
+            ]
+            rng.shuffle(decoys)
+            videos = [
+                _result(
+                    "video",
+                    new_id("u"),
+                    f"{_phrase(rng, 2, 4)} (Official Video)",
+                    [_phrase(rng, 1, 2)],
+                    None,
+                    rng.randint(120, 420),
+                )
+            ]
+
+            availability = rng.random()
+            if availability < 0.85:
+                yt_title = rng.choice(
+                    [title, title, title.upper(), f"{title} (Remastered)"]
+                )
+                yt_artists = (
+                    [artist] if rng.random() < 0.8 else [artist, _phrase(rng, 1, 2)]
+                )
+                expected = new_id("s")
+                song = _result(
+                    "song",
+                    expected,
+                    yt_title,
+                    yt_artists,
+                    album["name"],
+                    seconds + rng.randint(-1, 1),
+                )
+                songs = decoys[:]
+                # Usually ranked first, but not always
+                songs.insert(0 if rng.random() < 0.7 else rng.randint(1, 3), song)
+                if on_ytmusic:
+                    album_tracks.append(dict(song, title=title))
+            elif availability < 0.95:
+                expected = new_id("v")
+                songs = decoys
+                videos.insert(
+                    rng.randint(0, 1),
+                    _result(
+                        "video",
+                        expected,
+                        f"{artist} - {title} (Official Video)",
+                        [artist],
+                        None,
+                        seconds + rng.randint(-4, 8),
+                    ),
+                )
+            else:
+                expected = None
+                songs = decoys
+
+            query = f"{src_title} by {artist}"
+            searches[search_key(query, "songs")] = songs
+            searches[search_key(query, "videos")] = videos
+            tracks.append(
+                {
+                    "title": src_title,
+                    "artist": artist,
+                    "album": album["name"],
+                    "duration_ms": duration_ms,
+                    "expected": expected,
+                }
+            )
+
+    return {"tracks": tracks, "responses": {"search": searches, "get_album": get_album}}
+
+
+def evaluate(fixture: Fixture, yt_search_algo: int) -> Dict[str, Any]:
+    """
+    Look up every track of `fixture` offline and measure the results.
+
+    Returns:
+        Dict[str, Any]: tracks, precision, recall, calls_per_track,
+        cpu_ms_per_track and the number of calls per method
+    """
+    yt = ReplayYTMusic(fixture["responses"])
+    album_cache = backend.AlbumCache()
+    labelled = [t for t in fixture["tracks"] if "expected" in t]
+    found = correct = 0
+
+    cpu = 0.0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for track in fixture["tracks"]:
+            start = time.process_time()
+            try:
+                video_id = backend.lookup_song(
+                    yt,
+                    track["title"],
+                    track["artist"],
+                    track["album"],
+                    yt_search_algo,
+                    album_cache=album_cache,
+                    duration_ms=track.get("duration_ms"),
+                ).get("videoId")
+            except Exception:
+                video_id = None
+            cpu += time.process_time() - start
+
+            if "expected" in track and video_id is not None:
+                found += 1
+                correct += video_id == track["expected"]
+
+    tracks = len(fixture["tracks"])
+    available = sum(t["expected"] is not None for t in labelled)
+    return {
+        "algo": yt_search_algo,
+        "tracks": tracks,
+        "precision": correct / found if found else 0.0,
+        "recall": correct / available if available else 0.0,
+        "calls_per_track": sum(yt.calls.values()) / tracks,
+        "cpu_ms_per_track": 1000 * cpu / tracks,
+        "calls": dict(yt.calls),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="Fixture to replay")
+    parser.add_argument(
+        "--algo", type=int, nargs="+", default=[0, 1, 2], help="Algorithms to run"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Rebuild the synthetic fixture before running",
+    )
+    args = parser.parse_args(argv)
+
+    if args.regenerate:
+        os.makedirs(os.path.dirname(args.fixture), exist_ok=True)
+        save_fixture(build_fixture(), args.fixture)
+    fixture = load_fixture(args.fixture)
+
+    results = [evaluate(fixture, algo) for algo in args.algo]
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{len(fixture['tracks'])} tracks from {args.fixture}")
+    print("algo  precision  recall  calls/track  cpu ms/track")
+    for r in results:
+        print(
+            f"{r['algo']:>4}  {r['precision']:>9.3f}  {r['recall']:>6.3f}"
+            f"  {r['calls_per_track']:>11.2f}  {r['cpu_ms_per_track']:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
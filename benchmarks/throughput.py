@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end throughput benchmark of `copier`, `copy_playlist` and
+`copy_all_playlists` against the YTMusic simulator.
+
+Every scenario copies a synthetic library of each size through
+`simulator.YTMusicSimulator` with a realistic latency profile (scaled by
+--time-scale), in a fresh process so that its peak memory can be measured,
+and reports:
+
+- tracks per second, wall clock
+- API calls per track
+- peak RSS of the process
+- p50 and p99 latency of looking up one track (`backend.lookup_song`)
+
+Each run is appended to a JSON history file (benchmarks/throughput_history.json
+by default), so throughput can be compared between releases.
+
+    python -m benchmarks.throughput [--sizes 1000 10000 100000] [--label v1.2]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.simulator import YTMusicSimulator, lognormal
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(HERE, "throughput_history.json")
+SCENARIOS = ("copier", "copy_playlist", "copy_all_playlists")
+
+# Roughly what YTMusic answers in, before --time-scale is applied
+LATENCY = {
+    "search": lognormal(0.25, 1.0),
+    "get_album": lognormal(0.2, 0.8),
+    "add_playlist_items": lognormal(0.4, 1.5),
+    "default": lognormal(0.3, 1.0),
+}
+PLAYLIST_SIZE = 250
+
+
+def synthetic_songs(count: int, seed: int = 0) -> List[backend.SongInfo]:
+    """
+    Return `count` tracks by a few thousand artists, about a fifth of them
+    repeats of earlier tracks, as in real libraries.
+    """
+    rng = random.Random(seed)
+    songs: List[backend.SongInfo] = []
+    for i in range(count):
+        if songs and rng.random() < 0.2:
+            songs.append(rng.choice(songs))
+            continue
+        artist = f"Artist {rng.randrange(max(1, count // 20))}"
+        songs.append(
+            backend.SongInfo(
+                f"Song {i}",
+                artist,
+                f"{artist} Album {rng.randrange(5)}",
+                rng.randint(120, 420) * 1000,
+            )
+        )
+    return songs
+
+
+def _backup(playlists: List[List[backend.SongInfo]]) -> Dict[str, Any]:
+    """Return a compact playlists.json backup of the given playlists."""
+    return {
+        "playlists": [
+            {
+                "id": f"pl{i}",
+                "name": f"Playlist {i}",
+                "tracks": [
+                    {
+                        "track": {
+                            "name": song.title,
+                            "artists": [{"name": song.artist}],
+                            "album": {"name": song.album},
+                            "duration_ms": song.duration_ms,
+                        }
+                    }
+                    for song in songs
+                ],
+            }
+            for i, songs in enumerate(playlists)
+        ]
+    }
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(
+    scenario: str,
+    size: int,
+    *,
+    lookup_workers: int = 8,
+    time_scale: float = 0.01,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Copy a synthetic library of `size` tracks with `scenario`, measuring it."""
+    songs = synthetic_songs(size, seed)
+    # A few songs aren't on YTMusic
+    catalog = {song for song in songs if int(song.title.split()[-1]) % 50}
+    yt = YTMusicSimulator(
+        sorted(catalog), latency=LATENCY, time_scale=time_scale, seed=seed
+    )
+
+    lookup_times: List[float] = []
+    lookup_song = backend.lookup_song
+
+    def timed_lookup_song(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return lookup_song(*args, **kwargs)
+        finally:
+            lookup_times.append(time.perf_counter() - start)
+
+    options: Dict[str, Any] = {"track_sleep": 0, "lookup_workers": lookup_workers}
+    with tempfile.TemporaryDirectory() as tmp, open(
+        os.devnull, "w"
+    ) as devnull, contextlib.redirect_stdout(devnull), patch.object(
+        backend, "lookup_song", timed_lookup_song
+    ), patch.object(
+        backend, "get_ytmusic", lambda *args, **kwargs: yt
+    ):
+        backup_file = os.path.join(tmp, "playlists.json")
+        if scenario == "copy_playlist":
+            playlists = [songs]
+        else:
+            playlists = [
+                songs[i : i + PLAYLIST_SIZE] for i in range(0, size, PLAYLIST_SIZE)
+            ]
+        with open(backup_file, "w", encoding="utf-8") as f:
+            json.dump(_backup(playlists), f)
+        library_playlists = backend.LibraryPlaylists()
+
+        start = time.perf_counter()
+        if scenario == "copier":
+            backend.copier(
+                iter(songs), yt.create_playlist("Benchmark", ""), yt=yt, **options
+            )
+        elif scenario == "copy_playlist":
+            backend.copy_playlist(
+                "pl0",
+                "+Benchmark",
+                spotify_playlist_file=backup_file,
+                library_playlists=library_playlists,
+                **options,
+            )
+        elif scenario == "copy_all_playlists":
+            backend.copy_all_playlists(
+                spotify_playlist_file=backup_file,
+                library_playlists=library_playlists,
+                **options,
+            )
+        else:
+            raise ValueError(f"Unknown scenario: {scenario}")
+        elapsed = time.perf_counter() - start
+
+    added = sum(len(pl["tracks"]) for pl in yt.playlists.values())
+    return {
+        "scenario": scenario,
+        "tracks": size,
+        "added": added,
+        "seconds": elapsed,
+        "tracks_per_second": size / elapsed,
+        "calls_per_track": sum(yt.calls.values()) / size,
+        "peak_rss_mb": _peak_rss_mb(),
+        "lookup_p50_ms": 1000 * (_percentile(lookup_times, 0.5) or 0),
+        "lookup_p99_ms": 1000 * (_percentile(lookup_times, 0.99) or 0),
+        "calls": dict(yt.calls),
+    }
+
+
+def run_isolated(scenario: str, size: int, **kwargs: Any) -> Dict[str, Any]:
+    """`run_scenario` in a new process, so peak RSS is the scenario's own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scenario, scenario, size, **kwargs).result()
+
+
+def _default_label() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def append_history(filename: str, entry: Dict[str, Any]) -> None:
+    """Append a run to the JSON history file."""
+    history: List[Dict[str, Any]] = []
+    if os.path.exists(filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    history.append(entry)
+    tmp_file = filename + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_file, filename)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--lookup-workers", type=int, default=8)
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=0.01,
+        help="Factor applied to the simulated latencies (default: %(default)s)",
+    )
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument(
+        "--label", default=None, help="Name of this run (default: git describe)"
+    )
+    parser.add_argument(
+        "--no-history", action="store_true", help="Don't record the results"
+    )
+    args = parser.parse_args(argv)
+
+    params = {"lookup_workers": args.lookup_workers, "time_scale": args.time_scale}
+    results = []
+    print(
+        f"{'scenario':<20} {'tracks':>7} {'tracks/s':>9} {'calls/track':>11}"
+        f" {'peak RSS MB':>11} {'p50 ms':>7} {'p99 ms':>7}"
+    )
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            r = run_isolated(scenario, size, **params)
+            results.append(r)
+            rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "?"
+            print(
+                f"{scenario:<20} {size:>7} {r['tracks_per_second']:>9.1f}"
+                f" {r['calls_per_track']:>11.2f} {rss:>11}"
+                f" {r['lookup_p50_ms']:>7.1f} {r['lookup_p99_ms']:>7.1f}"
+            )
+
+    if not args.no_history:
+        append_history(
+            args.history,
+            {
+                "label": args.label or _default_label(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "params": params,
+                "results": results,
+            },
+        )
+        print(f"Results appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,12 @@ import sys
 import inspect
 
 def list_commands(module):
-    # include only functions defined in e.g. 'cli' module
-    commands = [name for name, obj in inspect.getmembers(module) if inspect.isfunction(obj)]
+    # include only public functions defined in e.g. 'cli' module
+    commands = [
+        name
+        for name, obj in inspect.getmembers(module)
+        if inspect.isfunction(obj) and not name.startswith("_")
+    ]
     return commands
 
 available_commands = list_commands(cli)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+"""
+asyncio counterparts of the `backend` copy functions.
+
+Lookups and playlist writes run as cooperative tasks on one event loop, with
+a semaphore bounding how many lookups are in flight.  ytmusicapi itself is
+blocking, so every YTMusic call is handed to the loop's executor; use `run`
+to get an executor sized to the requested concurrency.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Awaitable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from ytmusicapi import YTMusic
+
+from . import backend
+from .backend import SongInfo
+from .journal import Journal
+from .match_cache import MatchCache
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+
+T = TypeVar("T")
+
+
+def run(main: Awaitable[T], concurrency: int = 32) -> T:
+    """
+    Run a coroutine of this module on a new event loop.
+
+    The loop's default executor gets one thread per concurrent lookup plus one
+    for the playlist writer, instead of asyncio's CPU-based default.
+    """
+
+    async def _main() -> T:
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 1))
+        return await main
+
+    return asyncio.run(_main())
+
+
+async def copier(
+    src_tracks: Iterator[SongInfo],
+    dst_pl_id: Optional[str] = None,
+    dry_run: bool = False,
+    track_sleep: float = 0.1,
+    yt_search_algo: int = 0,
+    *,
+    yt: Optional[YTMusic] = None,
+    match_cache: Optional[MatchCache] = None,
+    album_cache: Optional[backend.AlbumCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    concurrency: int = 32,
+    journal: Optional[Journal] = None,
+    journal_key: Optional[str] = None,
+    sync: bool = False,
+    resolved: Optional[backend.ResolvedSongs] = None,
+    dedupe: bool = False,
+    destination: Optional[backend.DestinationTracks] = None,
+) -> None:
+    """
+    Copy tracks from Spotify to YouTube Music, see `backend.copier`.
+
+    Up to `concurrency` lookups run at once, while a single commit stage
+    reports and writes the results in source order.
+
+    Args:
+        src_tracks: Iterator of Spotify tracks to copy
+        dst_pl_id: YouTube Music playlist ID (None for Liked Songs)
+        dry_run: If True, don't actually add tracks
+        track_sleep: Sleep time after each lookup
+        yt_search_algo: Search algorithm (0=exact, 1=extended, 2=approximate)
+        yt: YTMusic client (auto-initialized if None)
+        match_cache: Optional persistent cache of earlier matches
+        album_cache: Album cache to use (a new one is created for this run if None)
+        rate_limiter: Optional rate limiter for the YTMusic calls
+        metrics: Optional metrics the YTMusic calls and cache hits are recorded in
+        batch_size: Number of tracks sent per add_playlist_items call
+        concurrency: Number of songs looked up concurrently
+        journal: Optional checkpoint journal to resume from and record to
+        journal_key: Key of this copy in the journal (default: dst_pl_id)
+        sync: If True, only copy tracks missing from the destination
+        resolved: Songs resolved beforehand by `backend.resolve_songs`
+        dedupe: If True (and no `resolved` is given), resolve distinct songs first
+        destination: With `sync`, the destination fetched beforehand (it is
+            fetched here if None)
+    """
+    if yt is None:
+        yt = backend.get_ytmusic(rate_limiter, metrics)
+    else:
+        yt = backend._wrap_ytmusic(yt, rate_limiter, metrics)
+    if album_cache is None:
+        album_cache = backend.AlbumCache()
+    backend._track_caches(metrics, match_cache, album_cache)
+
+    if destination is None:
+        yt_pl = await asyncio.to_thread(
+            backend._check_destination_playlist, yt, dst_pl_id, sync
+        )
+        if yt_pl is not None:
+            destination = backend.DestinationTracks(
+                yt_pl["tracks"], match_cache, yt_search_algo
+            )
+
+    committer = backend._TrackCommitter(
+        backend.PlaylistWriter(yt, dst_pl_id, dry_run=dry_run, batch_size=batch_size),
+        journal,
+        journal_key or dst_pl_id or "Liked Songs",
+        destination if sync else None,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    pending_tracks: Iterable[Tuple[int, SongInfo]] = committer.pending_tracks(
+        src_tracks
+    )
+    if dedupe and resolved is None:
+        pending_tracks = list(pending_tracks)
+        resolved = await asyncio.to_thread(
+            backend.resolve_songs,
+            yt,
+            [src_track for _, src_track in pending_tracks],
+            yt_search_algo,
+            track_sleep,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            lookup_workers=concurrency,
+        )
+
+    async def _lookup(src_track: SongInfo) -> Union[Dict[str, Any], Exception]:
+        if resolved is not None:
+            result = resolved.get(backend._track_key(src_track))
+            if result is not None:
+                return result
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(
+                    backend.lookup_song,
+                    yt,
+                    src_track.title,
+                    src_track.artist,
+                    src_track.album,
+                    yt_search_algo,
+                    match_cache=match_cache,
+                    album_cache=album_cache,
+                    duration_ms=src_track.duration_ms,
+                )
+            except Exception as e:
+                return e
+            finally:
+                if track_sleep:
+                    await asyncio.sleep(track_sleep)
+
+    # Schedule lookups at most two "waves" ahead of the commit stage, so that
+    # memory stays bounded however long the source is.
+    in_flight: Deque[Tuple[int, SongInfo, asyncio.Task]] = deque()
+    for index, src_track in pending_tracks:
+        in_flight.append((index, src_track, asyncio.create_task(_lookup(src_track))))
+        if len(in_flight) >= 2 * concurrency:
+            index, src_track, task = in_flight.popleft()
+            await asyncio.to_thread(committer.commit, index, src_track, await task)
+    while in_flight:
+        index, src_track, task = in_flight.popleft()
+        await asyncio.to_thread(committer.commit, index, src_track, await task)
+
+    await asyncio.to_thread(committer.finish)
+
+
+async def copy_playlist(
+    spotify_playlist_id: str,
+    ytmusic_playlist_id: str,
+    spotify_playlists_encoding: str = "utf-8",
+    dry_run: bool = False,
+    track_sleep: float = 0.1,
+    yt_search_algo: int = 0,
+    reverse_playlist: bool = True,
+    privacy_status: str = "PRIVATE",
+    *,
+    match_cache: Optional[MatchCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    concurrency: int = 32,
+    journal: Optional[Journal] = None,
+    sync: bool = False,
+    spotify_playlist_file: Union[str, backend.SpotifyLibrary] = "playlists.json",
+    library_playlists: Optional[backend.LibraryPlaylists] = None,
+    dedupe: bool = False,
+) -> None:
+    """Copy a Spotify playlist to a YTMusic playlist, see `backend.copy_playlist`."""
+    journal_key = f"{spotify_playlist_id}>{ytmusic_playlist_id}"
+    if journal is not None and journal.is_done(journal_key):
+        print(f"Playlist {spotify_playlist_id} was already copied, skipping")
+        return
+
+    print(f"Using search algorithm: {yt_search_algo}")
+    yt = backend.get_ytmusic(rate_limiter, metrics)
+    ytmusic_playlist_id = await asyncio.to_thread(
+        backend._resolve_destination,
+        yt,
+        spotify_playlist_id,
+        ytmusic_playlist_id,
+        privacy_status,
+        spotify_playlist_file,
+        spotify_playlists_encoding,
+        library_playlists,
+    )
+
+    await copier(
+        backend.iter_spotify_playlist(
+            spotify_playlist_id,
+            spotify_playlist_file,
+            spotify_encoding=spotify_playlists_encoding,
+            reverse_playlist=reverse_playlist,
+        ),
+        ytmusic_playlist_id,
+        dry_run,
+        track_sleep,
+        yt_search_algo,
+        yt=yt,
+        match_cache=match_cache,
+        metrics=metrics,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        journal=journal,
+        journal_key=journal_key,
+        sync=sync,
+        dedupe=dedupe,
+    )
+
+
+async def copy_all_playlists(
+    track_sleep: float = 0.1,
+    dry_run: bool = False,
+    spotify_playlists_encoding: str = "utf-8",
+    yt_search_algo: int = 0,
+    reverse_playlist: bool = True,
+    privacy_status: str = "PRIVATE",
+    *,
+    match_cache: Optional[MatchCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    concurrency: int = 32,
+    journal: Optional[Journal] = None,
+    sync: bool = False,
+    spotify_playlist_file: Union[str, backend.SpotifyLibrary] = "playlists.json",
+    library_playlists: Optional[backend.LibraryPlaylists] = None,
+    parallel_playlists: int = 1,
+    dedupe: bool = False,
+    include_liked: bool = False,
+) -> None:
+    """
+    Copy all Spotify playlists to YTMusic, see `backend.copy_all_playlists`.
+
+    With `parallel_playlists` > 1, that many playlists are copied as
+    concurrent tasks, each with up to `concurrency` lookups in flight.
+    """
+    library = spotify_playlist_file
+    if not isinstance(library, backend.SpotifyLibrary):
+        library = backend.SpotifyLibrary(library, spotify_playlists_encoding)
+    yt = backend.get_ytmusic(rate_limiter, metrics)
+    album_cache = backend.AlbumCache()
+    if library_playlists is None:
+        library_playlists = backend.LibraryPlaylists()
+    # Playlists with the same name must not both create it
+    create_lock = asyncio.Lock()
+    playlists = list(backend._playlists_to_copy(library))
+    liked = library.playlist_by_name("Liked Songs") if include_liked else None
+    if include_liked and liked is None:
+        print("NOTE: There are no Liked Songs in the backup")
+
+    resolved = None
+    destinations: Dict[str, backend.DestinationTracks] = {}
+    if dedupe:
+        if sync:
+            destinations = await asyncio.to_thread(
+                backend._sync_destinations,
+                yt,
+                playlists,
+                liked,
+                match_cache,
+                yt_search_algo,
+                library_playlists,
+            )
+        resolved = await asyncio.to_thread(
+            backend.resolve_songs,
+            yt,
+            backend._songs_to_copy(
+                playlists, liked, reverse_playlist, journal, destinations
+            ),
+            yt_search_algo,
+            track_sleep,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            lookup_workers=concurrency,
+        )
+
+    async def _copy_playlist(src_pl: backend.SpotifyPlaylist, pl_name: str) -> None:
+        journal_key = f"{src_pl.id}>+{pl_name}"
+        if journal is not None and journal.is_done(journal_key):
+            print(f"Playlist '{pl_name}' was already copied, skipping")
+            return
+
+        async with create_lock:
+            dst_pl_id = await asyncio.to_thread(
+                backend._find_or_create_playlist,
+                yt,
+                pl_name,
+                privacy_status,
+                library_playlists,
+            )
+
+        await copier(
+            backend.iter_spotify_playlist(
+                src_pl.id,
+                library,
+                reverse_playlist=reverse_playlist,
+            ),
+            dst_pl_id,
+            dry_run,
+            track_sleep,
+            yt_search_algo,
+            yt=yt,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            metrics=metrics,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            journal=journal,
+            journal_key=journal_key,
+            sync=sync,
+            resolved=resolved,
+            destination=destinations.get(journal_key),
+        )
+        print("\nPlaylist done!\n")
+
+    if parallel_playlists <= 1:
+        for src_pl, pl_name in playlists:
+            await _copy_playlist(src_pl, pl_name)
+    else:
+        semaphore = asyncio.Semaphore(parallel_playlists)
+        with backend.PlaylistOutput.installed() as output:
+
+            async def _captured(src_pl: backend.SpotifyPlaylist, pl_name: str) -> None:
+                async with semaphore:
+                    with output.capture():
+                        await _copy_playlist(src_pl, pl_name)
+
+            results = await asyncio.gather(
+                *(
+                    _captured(src_pl, pl_name)
+                    for src_pl, pl_name in backend._largest_first(playlists)
+                ),
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    if liked is not None:
+        if journal is not None and journal.is_done("Liked Songs"):
+            print("Liked Songs were already copied, skipping")
+        else:
+            await copier(
+                backend.iter_spotify_playlist(None, library, reverse_playlist=False),
+                None,
+                dry_run,
+                track_sleep,
+                yt_search_algo,
+                yt=yt,
+                match_cache=match_cache,
+                album_cache=album_cache,
+                metrics=metrics,
+                batch_size=batch_size,
+                concurrency=concurrency,
+                journal=journal,
+                journal_key="Liked Songs",
+                sync=sync,
+                resolved=resolved,
+                destination=destinations.get("Liked Songs"),
+            )
+
+    print("All done!")
@@ -1,17 +1,45 @@
 #!/usr/bin/env python3
 
+import contextvars
+import io
 import json
 import sys
 import os
 import time
-import re
-from typing import Optional, Union, Iterator, Dict, List, Any
-from collections import namedtuple
+import threading
+from typing import (
+    Optional,
+    Union,
+    Iterator,
+    Iterable,
+    Dict,
+    List,
+    Any,
+    Callable,
+    Tuple,
+    Deque,
+    Set,
+    TextIO,
+)
+from collections import namedtuple, deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 
 from ytmusicapi import YTMusic
 
-SongInfo = namedtuple("SongInfo", ["title", "artist", "album"])
+from .journal import Journal
+from .jsonstream import JSONStreamReader
+from .library_index import LibraryIndex, find_index
+from .match_cache import MatchCache, song_key
+from .metrics import Metrics, count_retry
+from .ratelimit import RateLimiter
+from .scoring import ACCEPT_CONFIDENCE, MIN_CONFIDENCE, TrackMatcher
+
+# duration_ms is only used to rank search results, it is None if unknown
+SongInfo = namedtuple(
+    "SongInfo", ["title", "artist", "album", "duration_ms"], defaults=[None]
+)
 
 
 @dataclass
@@ -20,6 +48,7 @@ class ResearchDetails:
     query: Optional[str] = field(default=None)
     songs: Optional[List[Dict[str, Any]]] = field(default=None)
     suggestions: Optional[List[str]] = field(default=None)
+    confidence: Optional[float] = field(default=None)
 
 
 class YTMusicError(Exception):
@@ -27,9 +56,15 @@ class YTMusicError(Exception):
     pass
 
 
-def get_ytmusic() -> YTMusic:
+def get_ytmusic(
+    rate_limiter: Optional[RateLimiter] = None, metrics: Optional[Metrics] = None
+) -> YTMusic:
     """
     Initialize and return YTMusic client using oauth.json credentials.
+
+    Args:
+        rate_limiter: Optional rate limiter the client's calls are subject to
+        metrics: Optional metrics the client's calls are recorded in
     
     Returns:
         YTMusic: Configured YTMusic client
@@ -43,16 +78,35 @@ def get_ytmusic() -> YTMusic:
         sys.exit(1)
 
     try:
-        return YTMusic("oauth.json")
+        yt = YTMusic("oauth.json")
     except json.decoder.JSONDecodeError as e:
         print(f"ERROR: JSON Decode error while trying start YTMusic: {e}")
         print("       This typically means a problem with a 'oauth.json' file.")
         print("       Have you logged in to YTMusic?  Run 'ytmusicapi oauth' to login")
         sys.exit(1)
 
+    return _wrap_ytmusic(yt, rate_limiter, metrics)
+
+
+def _wrap_ytmusic(
+    yt: YTMusic,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+) -> YTMusic:
+    """Instrument and rate limit `yt`, timing the calls themselves, not the waits."""
+    if metrics is not None:
+        yt = metrics.wrap(yt)
+    if rate_limiter is not None:
+        yt = rate_limiter.wrap(yt)
+    return yt
+
 
 def _ytmusic_create_playlist(
-    yt: YTMusic, title: str, description: str, privacy_status: str = "PRIVATE"
+    yt: YTMusic,
+    title: str,
+    description: str,
+    privacy_status: str = "PRIVATE",
+    library_playlists: Optional["LibraryPlaylists"] = None,
 ) -> str:
     """
     Create a playlist on YTMusic with retry logic.
@@ -62,6 +116,7 @@ def _ytmusic_create_playlist(
         title: Playlist title
         description: Playlist description
         privacy_status: Privacy setting (PRIVATE, PUBLIC, UNLISTED)
+        library_playlists: Optional library snapshot to add the playlist to
         
     Returns:
         str: Playlist ID
@@ -82,6 +137,7 @@ def _ytmusic_create_playlist(
                     f"ERROR: (Retrying create_playlist: {title}) {e} in {exception_sleep} seconds"
                 )
                 if attempt < 9:  # Don't sleep on last attempt
+                    count_retry(yt, "create_playlist")
                     time.sleep(exception_sleep)
                     exception_sleep *= 2
 
@@ -93,6 +149,8 @@ def _ytmusic_create_playlist(
     if isinstance(result, dict):
         raise YTMusicError(f"Failed to create playlist (name: {title}): {result}")
 
+    if library_playlists is not None:
+        library_playlists.add(title, result)
     time.sleep(1)  # Needed to avoid missing playlist ID error
     return result
 
@@ -108,6 +166,33 @@ def load_playlists_json(filename: str = "playlists.json", encoding: str = "utf-8
         raise json.JSONDecodeError(f"Invalid JSON in '{filename}': {e}", e.doc, e.pos)
 
 
+def list_spotify_playlists(
+    spotify_playlist_file: Union[str, "SpotifyLibrary"] = "playlists.json",
+    spotify_encoding: str = "utf-8",
+) -> List[Dict[str, Any]]:
+    """
+    Return the id, name and track_count of every Spotify playlist.
+
+    Read from the index of the backup file if there is an up to date one.
+    """
+    if isinstance(spotify_playlist_file, SpotifyLibrary):
+        return [
+            {"id": pl.id, "name": pl.name, "track_count": len(pl.tracks)}
+            for pl in spotify_playlist_file.playlists
+        ]
+
+    index_file = find_index(spotify_playlist_file)
+    if index_file is not None:
+        with LibraryIndex(index_file) as index:
+            return index.playlists()
+
+    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
+    return [
+        {"id": pl.get("id"), "name": pl["name"], "track_count": len(pl["tracks"])}
+        for pl in spotify_pls["playlists"]
+    ]
+
+
 def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
     """
     Create a YTMusic playlist.
@@ -127,86 +212,502 @@ def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
 
 
 def iter_spotify_liked_albums(
-    spotify_playlist_file: str = "playlists.json",
+    spotify_playlist_file: Union[str, "SpotifyLibrary"] = "playlists.json",
     spotify_encoding: str = "utf-8",
 ) -> Iterator[SongInfo]:
-    """Yield songs from liked albums on Spotify."""
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
+    """
+    Yield songs from liked albums on Spotify.
 
-    if "albums" not in spotify_pls:
+    The backup file is streamed, so only one album is held in memory at a time,
+    or read from its index if there is one (see `library_index`).
+    """
+    if isinstance(spotify_playlist_file, SpotifyLibrary):
+        yield from spotify_playlist_file.liked_albums
         return
 
-    for album in [x["album"] for x in spotify_pls["albums"]]:
-        for track in album["tracks"]["items"]:
-            yield SongInfo(track["name"], track["artists"][0]["name"], album["name"])
+    index_file = find_index(spotify_playlist_file)
+    if index_file is not None:
+        with LibraryIndex(index_file) as index:
+            for title, artist, album, duration_ms in index.liked_album_tracks():
+                yield SongInfo(title, artist, album, duration_ms)
+        return
+
+    with open(spotify_playlist_file, "r", encoding=spotify_encoding) as f:
+        reader = JSONStreamReader(f)
+        for key in reader.iter_object():
+            if key != "albums":
+                reader.skip_value()
+                continue
+            for _ in reader.iter_array():
+                for album_key in reader.iter_object():
+                    if album_key != "album":
+                        reader.skip_value()
+                        continue
+                    album = reader.read_value()
+                    for track in album["tracks"]["items"]:
+                        yield SongInfo(
+                            track["name"],
+                            track["artists"][0]["name"],
+                            album["name"],
+                            track.get("duration_ms"),
+                        )
+
+
+def _iter_json_playlists(
+    spotify_playlist_file: str, spotify_encoding: str
+) -> Iterator[Tuple[int, JSONStreamReader]]:
+    """Yield (index, reader) positioned at each playlist object of a backup file."""
+    with open(spotify_playlist_file, "r", encoding=spotify_encoding) as f:
+        reader = JSONStreamReader(f)
+        for key in reader.iter_object():
+            if key != "playlists":
+                reader.skip_value()
+                continue
+            for index in reader.iter_array():
+                yield index, reader
+
+
+def _stream_spotify_playlist(
+    spotify_playlist_file: str,
+    spotify_encoding: str,
+    src_pl_id: Optional[str],
+) -> Iterator[Any]:
+    """
+    Stream a playlist out of a playlists.json file.
+
+    Yields the playlist name first, then the raw track items one by one.
+    Nothing is yielded if the playlist is not found.
+
+    A playlist is normally recognized by its "id" (or "name" for Liked Songs)
+    before its "tracks" are reached, which is the key order of the backup.
+    One that only turns out to match after its tracks is read again in a
+    second pass, so the tracks of other playlists are never kept in memory.
+    """
+    if src_pl_id is None:
+        match_key, wanted = "name", "Liked Songs"
+    else:
+        match_key, wanted = "id", src_pl_id
+
+    late_match = None
+    for index, reader in _iter_json_playlists(spotify_playlist_file, spotify_encoding):
+        src_pl: Dict[str, Any] = {}
+        for key in reader.iter_object():
+            if key == "tracks" and str(src_pl.get(match_key)) == wanted:
+                yield src_pl.get("name", src_pl_id)
+                for _ in reader.iter_array():
+                    yield reader.read_value()
+                return
+            if key in ("id", "name"):
+                src_pl[key] = reader.read_value()
+            else:
+                reader.skip_value()
+        if str(src_pl.get(match_key)) == wanted:
+            late_match = index
+            break
+
+    if late_match is None:
+        return
+
+    yield src_pl.get("name", src_pl_id)
+    for index, reader in _iter_json_playlists(spotify_playlist_file, spotify_encoding):
+        if index != late_match:
+            reader.skip_value()
+            continue
+        for key in reader.iter_object():
+            if key != "tracks":
+                reader.skip_value()
+                continue
+            for _ in reader.iter_array():
+                yield reader.read_value()
+            return
+
+
+def _spotify_track_song(src_track: Dict[str, Any]) -> Optional[SongInfo]:
+    """Return the SongInfo of a playlist track item, or None if it has no track."""
+    if src_track["track"] is None:
+        print(f"WARNING: Spotify track seems to be malformed, Skipping. Track: {src_track!r}")
+        return None
+
+    try:
+        src_album_name = src_track["track"]["album"]["name"]
+        src_track_artist = src_track["track"]["artists"][0]["name"]
+    except (TypeError, KeyError) as e:
+        print(f"ERROR: Spotify track seems to be malformed. Track: {src_track!r}")
+        raise e
+
+    src_track_name = src_track["track"]["name"]
+    return SongInfo(
+        src_track_name,
+        src_track_artist,
+        src_album_name,
+        src_track["track"].get("duration_ms"),
+    )
+
+
+def _compact_track(src_track: Dict[str, Any]) -> Union[SongInfo, Dict[str, Any]]:
+    """
+    Return a playlist track item as a SongInfo with interned strings.
+
+    Items that don't make a song are returned as they are, so that iterating
+    them reports the problem like reading the backup directly does.
+    """
+    try:
+        track = src_track["track"]
+        return SongInfo(
+            sys.intern(track["name"]),
+            sys.intern(track["artists"][0]["name"]),
+            sys.intern(track["album"]["name"]),
+            track.get("duration_ms"),
+        )
+    except (TypeError, KeyError, IndexError):
+        return src_track
+
+
+class SpotifyPlaylist:
+    """A playlist of a `SpotifyLibrary`."""
+
+    __slots__ = ("id", "name", "tracks")
+
+    def __init__(
+        self,
+        id: Optional[str] = None,
+        name: Optional[str] = None,
+        tracks: Optional[List[Union[SongInfo, Dict[str, Any]]]] = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.tracks = tracks if tracks is not None else []
+
+    def songs(self, reverse: bool = False) -> Iterator[SongInfo]:
+        """
+        Yield the songs of the playlist without any output.
+
+        Items that are not songs are left out, numbering the songs the same
+        way as `iter_spotify_playlist` does for tracks it can copy.
+        """
+        tracks = reversed(self.tracks) if reverse else self.tracks
+        for track in tracks:
+            if isinstance(track, SongInfo):
+                yield track
+
+
+class SpotifyLibrary:
+    """
+    A Spotify backup parsed once and kept in memory.
+
+    Pass it instead of a playlists.json filename to the Spotify iterators,
+    `list_spotify_playlists` and the copy functions to avoid parsing the
+    backup again for every playlist.  Playlists are indexed by id and name,
+    and their tracks are kept as SongInfo tuples with interned strings, so
+    an artist or album shared by many tracks is stored once.
+
+    Args:
+        spotify_playlist_file: Path to playlists backup file (or its index)
+        spotify_encoding: Character encoding
+    """
+
+    def __init__(
+        self,
+        spotify_playlist_file: str = "playlists.json",
+        spotify_encoding: str = "utf-8",
+    ) -> None:
+        self.playlists: List[SpotifyPlaylist] = []
+        self.liked_albums: List[SongInfo] = []
+        self._by_id: Dict[str, SpotifyPlaylist] = {}
+        self._by_name: Dict[str, SpotifyPlaylist] = {}
+
+        index_file = find_index(spotify_playlist_file)
+        if index_file is not None:
+            self._load_index(index_file)
+        else:
+            self._load_json(spotify_playlist_file, spotify_encoding)
+
+    def playlist(self, src_pl_id: Optional[str]) -> SpotifyPlaylist:
+        """Return a playlist by ID ("Liked Songs" if None)."""
+        if src_pl_id is None:
+            src_pl = self._by_name.get("Liked Songs")
+        else:
+            src_pl = self._by_id.get(src_pl_id)
+        if src_pl is None:
+            raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
+        return src_pl
+
+    def playlist_by_name(self, name: str) -> Optional[SpotifyPlaylist]:
+        """Return the first playlist called `name`, if any."""
+        return self._by_name.get(name)
+
+    def _add(self, src_pl: SpotifyPlaylist) -> None:
+        self.playlists.append(src_pl)
+        self._by_id.setdefault(str(src_pl.id), src_pl)
+        self._by_name.setdefault(str(src_pl.name), src_pl)
+
+    def _load_json(self, spotify_playlist_file: str, spotify_encoding: str) -> None:
+        with open(spotify_playlist_file, "r", encoding=spotify_encoding) as f:
+            reader = JSONStreamReader(f)
+            for key in reader.iter_object():
+                if key == "playlists":
+                    for _ in reader.iter_array():
+                        self._add(self._read_playlist(reader))
+                elif key == "albums":
+                    for _ in reader.iter_array():
+                        for album_key in reader.iter_object():
+                            if album_key != "album":
+                                reader.skip_value()
+                                continue
+                            album = reader.read_value()
+                            album_name = sys.intern(album["name"])
+                            self.liked_albums.extend(
+                                SongInfo(
+                                    sys.intern(track["name"]),
+                                    sys.intern(track["artists"][0]["name"]),
+                                    album_name,
+                                    track.get("duration_ms"),
+                                )
+                                for track in album["tracks"]["items"]
+                            )
+                else:
+                    reader.skip_value()
+
+    @staticmethod
+    def _read_playlist(reader: JSONStreamReader) -> SpotifyPlaylist:
+        src_pl = SpotifyPlaylist()
+        for key in reader.iter_object():
+            if key == "tracks":
+                src_pl.tracks = [
+                    _compact_track(reader.read_value()) for _ in reader.iter_array()
+                ]
+            elif key in ("id", "name"):
+                setattr(src_pl, key, reader.read_value())
+            else:
+                reader.skip_value()
+        return src_pl
+
+    def _load_index(self, index_file: str) -> None:
+        with LibraryIndex(index_file) as index:
+            for position, pl in enumerate(index.playlists()):
+                self._add(
+                    SpotifyPlaylist(
+                        pl["id"],
+                        pl["name"],
+                        [
+                            SongInfo(
+                                sys.intern(title),
+                                sys.intern(artist),
+                                sys.intern(album),
+                                duration_ms,
+                            )
+                            if raw is None
+                            else json.loads(raw)
+                            for (
+                                title,
+                                artist,
+                                album,
+                                duration_ms,
+                                raw,
+                            ) in index.playlist_tracks(position)
+                        ],
+                    )
+                )
+            self.liked_albums = [
+                SongInfo(
+                    sys.intern(title), sys.intern(artist), sys.intern(album), duration_ms
+                )
+                for title, artist, album, duration_ms in index.liked_album_tracks()
+            ]
+
+
+def _iter_indexed_playlist(
+    index_file: str, src_pl_id: Optional[str], reverse_playlist: bool
+) -> Iterator[SongInfo]:
+    """`iter_spotify_playlist` reading from a library index."""
+    with LibraryIndex(index_file) as index:
+        found = index.find_playlist(src_pl_id)
+        if found is None:
+            raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
+        position, src_pl_name = found
+        print(f"== Spotify Playlist: {src_pl_name}")
+
+        for title, artist, album, duration_ms, raw in index.playlist_tracks(
+            position, reverse=reverse_playlist
+        ):
+            if raw is None:
+                yield SongInfo(title, artist, album, duration_ms)
+                continue
+            song = _spotify_track_song(json.loads(raw))
+            if song is not None:
+                yield song
 
 
 def iter_spotify_playlist(
     src_pl_id: Optional[str] = None,
-    spotify_playlist_file: str = "playlists.json",
+    spotify_playlist_file: Union[str, SpotifyLibrary] = "playlists.json",
     spotify_encoding: str = "utf-8",
     reverse_playlist: bool = True,
 ) -> Iterator[SongInfo]:
     """
     Yield songs from a specific Spotify playlist.
+
+    The backup file is streamed and songs are yielded as they are parsed, so
+    only one track is held in memory at a time.  With `reverse_playlist` the
+    songs of the requested playlist (but not their raw JSON) are collected
+    first, since the last track can only be yielded once it has been read.
+    If the backup has an up to date index (see `library_index`) the playlist
+    is read from that instead.
     
     Args:
         src_pl_id: Spotify playlist ID (None for "Liked Songs")
-        spotify_playlist_file: Path to playlists backup file
+        spotify_playlist_file: Path to playlists backup file, or a SpotifyLibrary
         spotify_encoding: Character encoding
         reverse_playlist: If True, reverse playlist order
         
     Yields:
         SongInfo: Song information
     """
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
+    if isinstance(spotify_playlist_file, SpotifyLibrary):
+        src_pl = spotify_playlist_file.playlist(src_pl_id)
+        print(f"== Spotify Playlist: {src_pl.name}")
+        tracks = reversed(src_pl.tracks) if reverse_playlist else src_pl.tracks
+        for track in tracks:
+            song = track if isinstance(track, SongInfo) else _spotify_track_song(track)
+            if song is not None:
+                yield song
+        return
 
-    def find_spotify_playlist(spotify_pls: Dict[str, Any], src_pl_id: Optional[str]) -> Dict[str, Any]:
-        """Find Spotify playlist by ID or name."""
-        for src_pl in spotify_pls["playlists"]:
-            if src_pl_id is None and str(src_pl.get("name")) == "Liked Songs":
-                return src_pl
-            if src_pl_id is not None and str(src_pl.get("id")) == src_pl_id:
-                return src_pl
-        raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
-
-    src_pl = find_spotify_playlist(spotify_pls, src_pl_id)
-    src_pl_name = src_pl["name"]
+    index_file = find_index(spotify_playlist_file)
+    if index_file is not None:
+        yield from _iter_indexed_playlist(index_file, src_pl_id, reverse_playlist)
+        return
+
+    pl_items = _stream_spotify_playlist(
+        spotify_playlist_file, spotify_encoding, src_pl_id
+    )
+    try:
+        src_pl_name = next(pl_items)
+    except StopIteration:
+        raise ValueError(f"Could not find Spotify playlist {src_pl_id}") from None
     print(f"== Spotify Playlist: {src_pl_name}")
 
-    pl_tracks = src_pl["tracks"]
+    songs = (_spotify_track_song(src_track) for src_track in pl_items)
     if reverse_playlist:
-        pl_tracks = reversed(pl_tracks)
+        songs = reversed(list(songs))
 
-    for src_track in pl_tracks:
-        if src_track["track"] is None:
-            print(f"WARNING: Spotify track seems to be malformed, Skipping. Track: {src_track!r}")
-            continue
+    for song in songs:
+        if song is not None:
+            yield song
 
-        try:
-            src_album_name = src_track["track"]["album"]["name"]
-            src_track_artist = src_track["track"]["artists"][0]["name"]
-        except (TypeError, KeyError) as e:
-            print(f"ERROR: Spotify track seems to be malformed. Track: {src_track!r}")
-            raise e
-            
-        src_track_name = src_track["track"]["name"]
-        yield SongInfo(src_track_name, src_track_artist, src_album_name)
 
+class LibraryPlaylists:
+    """
+    Snapshot of the YTMusic library playlists, indexed by title.
+
+    The library is fetched once, on first use, and playlists created through
+    `_ytmusic_create_playlist` are added to it in place, so copying many
+    playlists doesn't refetch the library for every one.  With a `filename`
+    the snapshot is also saved to disk and reused by later runs until it is
+    `ttl` seconds old; call `invalidate` after changing the library by other
+    means.
 
-def get_playlist_id_by_name(yt: YTMusic, title: str) -> Optional[str]:
+    Args:
+        filename: Optional JSON file to keep the snapshot in
+        ttl: Seconds a saved snapshot stays valid
+    """
+
+    def __init__(self, filename: Optional[str] = None, ttl: float = 3600) -> None:
+        self.filename = filename
+        self.ttl = ttl
+        self._playlists: Optional[List[Dict[str, Any]]] = None
+        self._by_title: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def playlists(self, yt: YTMusic) -> List[Dict[str, Any]]:
+        """Return the library playlists (playlistId, title and count)."""
+        with self._lock:
+            if self._playlists is None:
+                playlists = self._load()
+                if playlists is None:
+                    playlists = [
+                        {k: pl[k] for k in ("playlistId", "title", "count") if k in pl}
+                        for pl in yt.get_library_playlists(limit=5000)
+                    ]
+                    self._save(playlists)
+                self._playlists = playlists
+                self._by_title = {}
+                for pl in playlists:
+                    self._by_title.setdefault(pl["title"], pl["playlistId"])
+            return list(self._playlists)
+
+    def get(self, yt: YTMusic, title: str) -> Optional[str]:
+        """Return the ID of the first library playlist called `title`."""
+        self.playlists(yt)
+        with self._lock:
+            return self._by_title.get(title)
+
+    def add(self, title: str, playlist_id: str) -> None:
+        """Record a newly created playlist."""
+        with self._lock:
+            if self._playlists is None:
+                return
+            self._playlists.append(
+                {"playlistId": playlist_id, "title": title, "count": 0}
+            )
+            self._by_title.setdefault(title, playlist_id)
+            self._save(self._playlists)
+
+    def invalidate(self) -> None:
+        """Drop the snapshot, in memory and on disk."""
+        with self._lock:
+            self._playlists = None
+            self._by_title = {}
+            if self.filename is not None and os.path.exists(self.filename):
+                os.remove(self.filename)
+
+    def _load(self) -> Optional[List[Dict[str, Any]]]:
+        if self.filename is None or not os.path.exists(self.filename):
+            return None
+        try:
+            with open(self.filename, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if snapshot.get("fetched", 0) < time.time() - self.ttl:
+            return None
+        return snapshot["playlists"]
+
+    def _save(self, playlists: List[Dict[str, Any]]) -> None:
+        if self.filename is None:
+            return
+        fetched = time.time()
+        if os.path.exists(self.filename):
+            # Additions don't make an older snapshot any fresher
+            try:
+                with open(self.filename, "r", encoding="utf-8") as f:
+                    fetched = min(fetched, json.load(f).get("fetched", fetched))
+            except (OSError, json.JSONDecodeError):
+                pass
+        tmp_file = self.filename + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"fetched": fetched, "playlists": playlists}, f)
+        os.replace(tmp_file, self.filename)
+
+
+def get_playlist_id_by_name(
+    yt: YTMusic, title: str, library_playlists: Optional[LibraryPlaylists] = None
+) -> Optional[str]:
     """
     Look up a YTMusic playlist ID by name.
     
     Args:
         yt: YTMusic client
         title: Playlist title
+        library_playlists: Library snapshot to look in (fetched anew if None)
         
     Returns:
         Optional[str]: Playlist ID or None if not found
     """
+    if library_playlists is None:
+        library_playlists = LibraryPlaylists()
     try:
-        playlists = yt.get_library_playlists(limit=5000)
+        return library_playlists.get(yt, title)
     except KeyError as e:
         print("=" * 60)
         print(f"Attempting to look up playlist '{title}' failed with KeyError: {e}")
@@ -217,11 +718,80 @@ def get_playlist_id_by_name(yt: YTMusic, title: str) -> Optional[str]:
         print("=" * 60)
         raise
 
-    for pl in playlists:
-        if pl["title"] == title:
-            return pl["playlistId"]
 
-    return None
+class AlbumCache:
+    """
+    In-memory LRU cache of album searches and album tracklists.
+
+    Meant to live for one run: songs from the same album then share a single
+    album search and `get_album` call, and matching a title against a cached
+    album is a dictionary lookup.  Threads that miss on a key another thread
+    is already fetching wait for that fetch instead of repeating it.  A
+    `maxsize` of 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._searches: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._albums: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        # Fetches in progress, by (id of cache, key)
+        self._in_flight: Dict[Tuple[int, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def search_albums(self, yt: YTMusic, query: str) -> List[Dict[str, Any]]:
+        """Return the album search results for `query`."""
+        return self._get(
+            self._searches, query, lambda: yt.search(query=query, filter="albums")
+        )
+
+    def album_tracks(self, yt: YTMusic, browse_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return the tracks of an album, indexed by title."""
+
+        def _fetch() -> Dict[str, Dict[str, Any]]:
+            tracks_by_title: Dict[str, Dict[str, Any]] = {}
+            for track in yt.get_album(browse_id)["tracks"]:
+                tracks_by_title.setdefault(track["title"], track)
+            return tracks_by_title
+
+        return self._get(self._albums, browse_id, _fetch)
+
+    def _get(
+        self, cache: "OrderedDict[str, Any]", key: str, fetch: Callable[[], Any]
+    ) -> Any:
+        in_flight_key = (id(cache), key)
+        with self._lock:
+            if key in cache:
+                self.hits += 1
+                cache.move_to_end(key)
+                return cache[key]
+            future = self._in_flight.get(in_flight_key)
+            if future is None:
+                self.misses += 1
+                future = self._in_flight[in_flight_key] = Future()
+                fetching = True
+            else:
+                self.hits += 1
+                fetching = False
+
+        if not fetching:
+            return future.result()
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[in_flight_key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[in_flight_key]
+            if self.maxsize > 0:
+                cache[key] = value
+                while len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+        future.set_result(value)
+        return value
 
 
 def lookup_song(
@@ -231,9 +801,17 @@ def lookup_song(
     album_name: str,
     yt_search_algo: int,
     details: Optional[ResearchDetails] = None,
+    *,
+    match_cache: Optional[MatchCache] = None,
+    album_cache: Optional[AlbumCache] = None,
+    duration_ms: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Look up a song on YTMusic using various search algorithms.
+
+    The approximate algorithm ranks the search results with
+    `scoring.TrackMatcher`, and only searches videos as well if no song
+    reaches `scoring.ACCEPT_CONFIDENCE`.
     
     Args:
         yt: YTMusic client
@@ -242,6 +820,9 @@ def lookup_song(
         album_name: Album name
         yt_search_algo: Search algorithm (0=exact, 1=extended, 2=approximate)
         details: Optional research details object
+        match_cache: Optional persistent cache of earlier matches
+        album_cache: Optional cache of album searches and tracklists
+        duration_ms: Spotify track duration, used to rank approximate matches
         
     Returns:
         Dict[str, Any]: Song information
@@ -249,13 +830,55 @@ def lookup_song(
     Raises:
         ValueError: If no track is found
     """
+    if album_cache is None:
+        album_cache = AlbumCache(maxsize=0)
+
+    # Research lookups always go to YTMusic so that `details` gets filled in
+    if match_cache is None or details is not None:
+        return _search_song(
+            yt,
+            track_name,
+            artist_name,
+            album_name,
+            yt_search_algo,
+            album_cache,
+            details,
+            duration_ms,
+        )
+
+    track = match_cache.get(track_name, artist_name, album_name, yt_search_algo)
+    if track is None:
+        track = _search_song(
+            yt,
+            track_name,
+            artist_name,
+            album_name,
+            yt_search_algo,
+            album_cache,
+            duration_ms=duration_ms,
+        )
+        match_cache.put(track_name, artist_name, album_name, yt_search_algo, track)
+    return track
+
+
+def _search_song(
+    yt: YTMusic,
+    track_name: str,
+    artist_name: str,
+    album_name: str,
+    yt_search_algo: int,
+    album_cache: AlbumCache,
+    details: Optional[ResearchDetails] = None,
+    duration_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Search YTMusic for a song, see `lookup_song`."""
     # Try to find exact match in album first
-    albums = yt.search(query=f"{album_name} by {artist_name}", filter="albums")
+    albums = album_cache.search_albums(yt, f"{album_name} by {artist_name}")
     for album in albums[:3]:
         try:
-            for track in yt.get_album(album["browseId"])["tracks"]:
-                if track["title"] == track_name:
-                    return track
+            track = album_cache.album_tracks(yt, album["browseId"]).get(track_name)
+            if track is not None:
+                return track
         except Exception as e:
             print(f"Unable to lookup album ({e}), continuing...")
 
@@ -272,6 +895,8 @@ def lookup_song(
         case 0:  # Exact match
             if details:
                 details.songs = songs
+            if not songs:
+                raise ValueError(f"Did not find {track_name} by {artist_name}")
             return songs[0]
 
         case 1:  # Extended match
@@ -285,50 +910,506 @@ def lookup_song(
             raise ValueError(f"Did not find {track_name} by {artist_name} from {album_name}")
 
         case 2:  # Approximate match
-            for song in songs:
-                # Remove everything in brackets in the song title
-                song_title_without_brackets = re.sub(r"[\[(].*?[])]", "", song["title"])
-                if (
-                    (
-                        song_title_without_brackets == track_name
-                        and song["album"]["name"] == album_name
-                    )
-                    or (song_title_without_brackets == track_name)
-                    or (song_title_without_brackets in track_name)
-                    or (track_name in song_title_without_brackets)
-                ) and (
-                    song["artists"][0]["name"] == artist_name
-                    or artist_name in song["artists"][0]["name"]
-                ):
-                    return song
+            matcher = TrackMatcher(track_name, artist_name, album_name, duration_ms)
+            song, confidence = matcher.best(songs)
 
             # Try video search as last resort
-            track_name_lower = track_name.lower()
-            first_song_title = songs[0]["title"].lower()
-            if (
-                track_name_lower not in first_song_title
-                or songs[0]["artists"][0]["name"] != artist_name
-            ):
-                print("Not found in songs, searching videos")
-                videos = yt.search(query=f"{track_name} by {artist_name}", filter="videos")
-
-                for video in videos:
-                    video_title = video["title"].lower()
-                    if (
-                        track_name_lower in video_title
-                        and artist_name.lower() in video_title
-                    ) or (track_name_lower in video_title):
-                        print("Found a video")
-                        return video
-                else:
-                    raise ValueError(f"Did not find {track_name} by {artist_name} from {album_name}")
-            else:
-                return songs[0]
+            if confidence < ACCEPT_CONFIDENCE:
+                print(f"Not found in songs ({confidence:.2f}), searching videos")
+                videos = yt.search(query=query, filter="videos")
+                video, video_confidence = matcher.best(videos)
+                if video_confidence > confidence:
+                    print("Found a video")
+                    song, confidence = video, video_confidence
+
+            if details:
+                details.songs = songs
+                details.confidence = confidence
+            if song is None or confidence < MIN_CONFIDENCE:
+                raise ValueError(f"Did not find {track_name} by {artist_name} from {album_name}")
+            return song
 
         case _:
             raise ValueError(f"Invalid search algorithm: {yt_search_algo}")
 
 
+class PlaylistWriter:
+    """
+    Commit resolved tracks to a YTMusic playlist, or to Liked Songs.
+
+    Playlist additions are buffered and sent in chunks of `batch_size` videoIds,
+    in the order they were added.  A chunk that keeps raising is retried as a
+    whole and then bisected, so a single bad track only costs a few extra
+    calls.  A chunk YTMusic rejects (with `duplicates=False` one track already
+    in the playlist rejects the chunk) is checked against the tracks of the
+    playlist, fetched once per writer: the tracks already there are settled
+    as rejected without another call, the others are sent one by one.  Liked
+    Songs have no batch API and are rated one by one.
+
+    `on_commit`, if given, is called with (videoId, status) for every track
+    once its write is settled, status being "added", "rejected" or "error".
+    """
+
+    CHUNK_RETRIES = 3
+    TRACK_RETRIES = 10
+
+    def __init__(
+        self,
+        yt: YTMusic,
+        dst_pl_id: Optional[str],
+        dry_run: bool = False,
+        batch_size: int = 50,
+        on_commit: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.yt = yt
+        self.dst_pl_id = dst_pl_id
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.on_commit = on_commit
+        self.error_count = 0
+        self.pending: List[str] = []
+        # videoIds in the playlist, once a rejected chunk needed them
+        self._present: Optional[Set[str]] = None
+
+    def add(self, video_id: str) -> None:
+        """Queue a track, flushing the queue once a full chunk is collected."""
+        if self.dry_run:
+            return
+        if self.dst_pl_id is None:
+            if self._call(
+                "rate_song",
+                lambda: self.yt.rate_song(video_id, "LIKE"),
+                video_id,
+                self.TRACK_RETRIES,
+            ):
+                self._committed([video_id], "added")
+            else:
+                self.error_count += 1
+                self._committed([video_id], "error")
+            return
+
+        self.pending.append(video_id)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send all queued tracks to the playlist."""
+        chunk, self.pending = self.pending, []
+        if chunk:
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, video_ids: List[str]) -> None:
+        response: Any = None
+
+        def _add() -> None:
+            nonlocal response
+            response = self.yt.add_playlist_items(
+                playlistId=self.dst_pl_id, videoIds=video_ids, duplicates=False
+            )
+
+        description = f"{self.dst_pl_id} {video_ids[0]}"
+        if len(video_ids) > 1:
+            description += f" +{len(video_ids) - 1} more"
+        retries = self.TRACK_RETRIES if len(video_ids) == 1 else self.CHUNK_RETRIES
+
+        if self._call("add_playlist_items", _add, description, retries):
+            if not isinstance(response, dict) or "SUCCEEDED" in str(
+                response.get("status", "SUCCEEDED")
+            ):
+                self._committed(video_ids, "added")
+                return
+            if len(video_ids) == 1:
+                print(
+                    f"NOTE: YTMusic did not add {video_ids[0]} to {self.dst_pl_id}"
+                    " (already in playlist?)"
+                )
+                self._committed(video_ids, "rejected")
+                return
+            present = self._present_video_ids()
+            for video_id in video_ids:
+                if video_id in present:
+                    print(
+                        f"NOTE: {video_id} is already in {self.dst_pl_id}, not adding it"
+                    )
+                    self._committed([video_id], "rejected")
+                else:
+                    self._write_chunk([video_id])
+            return
+        elif len(video_ids) == 1:
+            self.error_count += 1
+            self._committed(video_ids, "error")
+            return
+
+        middle = len(video_ids) // 2
+        self._write_chunk(video_ids[:middle])
+        self._write_chunk(video_ids[middle:])
+
+    def _present_video_ids(self) -> Set[str]:
+        """Return the videoIds in the playlist, fetching them the first time."""
+        if self._present is None:
+            tracks: List[Dict[str, Any]] = []
+
+            def _get() -> None:
+                nonlocal tracks
+                playlist = self.yt.get_playlist(playlistId=self.dst_pl_id, limit=None)
+                tracks = playlist.get("tracks") or []
+
+            # Without them, every track of the chunk is sent on its own
+            self._call("get_playlist", _get, str(self.dst_pl_id), self.CHUNK_RETRIES)
+            self._present = {t["videoId"] for t in tracks if t.get("videoId")}
+        return self._present
+
+    def _committed(self, video_ids: List[str], status: str) -> None:
+        if self._present is not None and status == "added":
+            self._present.update(video_ids)
+        if self.on_commit is not None:
+            for video_id in video_ids:
+                self.on_commit(video_id, status)
+
+    def _call(
+        self, call: str, func: Callable[[], Any], description: str, retries: int
+    ) -> bool:
+        """
+        Make the YTMusic `call` by calling `func`, with exponential backoff,
+        returning False if it kept failing.
+        """
+        description = f"{call}: {description}"
+        exception_sleep = 5
+        for attempt in range(retries):
+            try:
+                func()
+                return True
+            except Exception as e:
+                if attempt == retries - 1:
+                    print(f"ERROR: ({description}) {e}, giving up")
+                    break
+                print(
+                    f"ERROR: (Retrying {description}) {e} in {exception_sleep} seconds"
+                )
+                count_retry(self.yt, call)
+                time.sleep(exception_sleep)
+                exception_sleep *= 2
+        return False
+
+
+def _resolve_tracks(
+    yt: YTMusic,
+    src_tracks: Iterable[Tuple[int, SongInfo]],
+    yt_search_algo: int,
+    track_sleep: float,
+    *,
+    match_cache: Optional[MatchCache] = None,
+    album_cache: Optional[AlbumCache] = None,
+    lookup_workers: int = 1,
+    resolved: Optional["ResolvedSongs"] = None,
+) -> Iterator[Tuple[int, SongInfo, Union[Dict[str, Any], Exception]]]:
+    """
+    Look up (index, track) pairs on YTMusic, yielding (index, track, result).
+
+    Results are yielded in source order.
+
+    The result is the YTMusic track, or the exception raised looking it up.
+    With `lookup_workers` > 1, lookups run ahead of the consumer on a thread
+    pool with at most two lookups per worker in flight, so memory stays bounded
+    however long the source is.  `track_sleep` is applied after every lookup,
+    i.e. per worker.  Songs found in `resolved` are not looked up again.
+    """
+
+    def _lookup(src_track: SongInfo) -> Union[Dict[str, Any], Exception]:
+        if resolved is not None:
+            result = resolved.get(_track_key(src_track))
+            if result is not None:
+                return result
+        try:
+            return lookup_song(
+                yt,
+                src_track.title,
+                src_track.artist,
+                src_track.album,
+                yt_search_algo,
+                match_cache=match_cache,
+                album_cache=album_cache,
+                duration_ms=src_track.duration_ms,
+            )
+        except Exception as e:
+            return e
+        finally:
+            if track_sleep:
+                time.sleep(track_sleep)
+
+    if lookup_workers <= 1:
+        for index, src_track in src_tracks:
+            yield index, src_track, _lookup(src_track)
+        return
+
+    with ThreadPoolExecutor(max_workers=lookup_workers) as pool:
+        in_flight: Deque[Tuple[int, SongInfo, Future]] = deque()
+        for index, src_track in src_tracks:
+            # Run in a copy of the context so the output capture applies to lookups
+            future = pool.submit(contextvars.copy_context().run, _lookup, src_track)
+            in_flight.append((index, src_track, future))
+            if len(in_flight) >= 2 * lookup_workers:
+                index, src_track, future = in_flight.popleft()
+                yield index, src_track, future.result()
+        while in_flight:
+            index, src_track, future = in_flight.popleft()
+            yield index, src_track, future.result()
+
+
+def _track_key(src_track: SongInfo) -> Tuple[str, str, str]:
+    return song_key(src_track.title, src_track.artist, src_track.album)
+
+
+ResolvedSongs = Dict[Tuple[str, str, str], Union[Dict[str, Any], ValueError]]
+
+
+def resolve_songs(
+    yt: YTMusic,
+    src_tracks: Iterable[SongInfo],
+    yt_search_algo: int = 0,
+    track_sleep: float = 0.1,
+    *,
+    match_cache: Optional[MatchCache] = None,
+    album_cache: Optional[AlbumCache] = None,
+    lookup_workers: int = 1,
+) -> ResolvedSongs:
+    """
+    Look up every distinct song of `src_tracks` once.
+
+    Songs are told apart by their normalized (title, artist, album), see
+    `match_cache.song_key`.  Pass the result as `resolved` to `copier` to
+    copy any number of sources sharing these songs without looking them up
+    again.  Songs YTMusic doesn't have are kept with the ValueError that
+    says so; songs whose lookup failed otherwise (server or network errors)
+    are left out, so that copying them looks them up again instead of
+    repeating a transient error.
+
+    Returns:
+        ResolvedSongs: YTMusic track, or not-found error, by song key
+    """
+    unique: Dict[Tuple[str, str, str], SongInfo] = {}
+    total = 0
+    for src_track in src_tracks:
+        unique.setdefault(_track_key(src_track), src_track)
+        total += 1
+    print(f"Resolving {len(unique)} distinct songs out of {total} tracks")
+
+    resolved: ResolvedSongs = {}
+    not_found = errors = 0
+    for _, src_track, dst_track in _resolve_tracks(
+        yt,
+        enumerate(unique.values()),
+        yt_search_algo,
+        track_sleep,
+        match_cache=match_cache,
+        album_cache=album_cache,
+        lookup_workers=lookup_workers,
+    ):
+        if isinstance(dst_track, ValueError):
+            not_found += 1
+        elif isinstance(dst_track, Exception):
+            errors += 1
+            continue
+        resolved[_track_key(src_track)] = dst_track
+        if (len(resolved) + errors) % 100 == 0:
+            print(f"  resolved {len(resolved) + errors}/{len(unique)}")
+
+    print(
+        f"Resolved {len(resolved) - not_found} songs, {not_found} not found, "
+        f"{errors} failed\n"
+    )
+    return resolved
+
+
+class DestinationTracks:
+    """
+    Index of the tracks already in a destination playlist, for sync mode.
+
+    Membership is decided on videoIds only, so other songs with the same
+    title (a second "Intro", a live version, another album) are still
+    copied: a source track whose cached match is in the destination is
+    skipped before any search, and a track that is looked up is not written
+    if the videoId it resolved to is present.
+    """
+
+    def __init__(
+        self,
+        tracks: List[Dict[str, Any]],
+        match_cache: Optional[MatchCache] = None,
+        yt_search_algo: int = 0,
+    ) -> None:
+        self.match_cache = match_cache
+        self.yt_search_algo = yt_search_algo
+        self.video_ids: Set[str] = {
+            track["videoId"] for track in tracks if track.get("videoId")
+        }
+
+    def __contains__(self, src_track: SongInfo) -> bool:
+        """Return whether the cached match of `src_track` is in the destination."""
+        if self.match_cache is None:
+            return False
+        # Peeked, so that the later lookup alone counts in the cache statistics
+        track = self.match_cache.peek(
+            src_track.title, src_track.artist, src_track.album, self.yt_search_algo
+        )
+        return track is not None and track["videoId"] in self.video_ids
+
+
+class _TrackCommitter:
+    """
+    Report resolved tracks in source order and hand new ones to a PlaylistWriter.
+
+    Keeps the duplicate/error accounting of a `copier` run and, if a journal
+    is given, records every settled track in it under `journal_key`.  With
+    `destination`, tracks already in the destination are skipped.
+    """
+
+    def __init__(
+        self,
+        writer: PlaylistWriter,
+        journal: Optional[Journal] = None,
+        journal_key: str = "",
+        destination: Optional[DestinationTracks] = None,
+    ) -> None:
+        self.writer = writer
+        self.destination = destination
+        self.tracks_added_set: Set[str] = set()
+        self.duplicate_count = 0
+        self.error_count = 0
+        self.resumed_count = 0
+        self.present_count = 0
+
+        # A dry run must not make a later resume skip any work
+        self.journal = journal if not writer.dry_run else None
+        self.journal_key = journal_key
+        self._pending_index: Dict[str, int] = {}
+        if self.journal is not None:
+            self.tracks_added_set.update(self.journal.video_ids(journal_key))
+            writer.on_commit = self._journal_write
+
+    def pending_tracks(
+        self, src_tracks: Iterable[SongInfo]
+    ) -> Iterator[Tuple[int, SongInfo]]:
+        """Number the source tracks, skipping those that need no more work."""
+        for index, src_track in enumerate(src_tracks):
+            if self.journal is not None and self.journal.is_done(
+                self.journal_key, index
+            ):
+                self.resumed_count += 1
+                continue
+            if self.destination is not None and src_track in self.destination:
+                self.present_count += 1
+                continue
+            yield index, src_track
+
+    def commit(
+        self,
+        index: int,
+        src_track: SongInfo,
+        dst_track: Union[Dict[str, Any], Exception],
+    ) -> None:
+        """Commit the lookup result (track or lookup error) of one source track."""
+        print(f"Spotify:   {src_track.title} - {src_track.artist} - {src_track.album}")
+
+        if isinstance(dst_track, Exception):
+            print(f"ERROR: Unable to look up song on YTMusic: {dst_track}")
+            self.error_count += 1
+            if self.journal is not None:
+                self.journal.record(self.journal_key, index, None, "lookup_error")
+            return
+
+        yt_artist_name = "<Unknown>"
+        if "artists" in dst_track and len(dst_track["artists"]) > 0:
+            yt_artist_name = dst_track["artists"][0]["name"]
+        print(
+            f"  Youtube: {dst_track['title']} - {yt_artist_name} - {dst_track.get('album', '<Unknown>')}"
+        )
+
+        if (
+            self.destination is not None
+            and dst_track["videoId"] in self.destination.video_ids
+        ):
+            print("(PRESENT, this track is already in the destination)")
+            self.present_count += 1
+            if self.journal is not None:
+                self.journal.record(
+                    self.journal_key, index, dst_track["videoId"], "present"
+                )
+        elif dst_track["videoId"] in self.tracks_added_set:
+            print("(DUPLICATE, this track has already been added)")
+            self.duplicate_count += 1
+            if self.journal is not None:
+                self.journal.record(
+                    self.journal_key, index, dst_track["videoId"], "duplicate"
+                )
+        else:
+            self.tracks_added_set.add(dst_track["videoId"])
+            self._pending_index[dst_track["videoId"]] = index
+            self.writer.add(dst_track["videoId"])
+
+    def finish(self) -> None:
+        """Flush outstanding writes and print the run summary."""
+        self.writer.flush()
+        self.error_count += self.writer.error_count
+        if self.journal is not None and self.error_count == 0:
+            self.journal.mark_done(self.journal_key)
+
+        print()
+        if self.resumed_count:
+            print(f"Resumed: skipped {self.resumed_count} tracks copied earlier")
+        if self.present_count:
+            print(f"Synced: skipped {self.present_count} tracks already present")
+        print(
+            f"Added {len(self.tracks_added_set)} tracks, encountered {self.duplicate_count} duplicates, {self.error_count} errors"
+        )
+
+    def _journal_write(self, video_id: str, status: str) -> None:
+        index = self._pending_index.pop(video_id)
+        self.journal.record(self.journal_key, index, video_id, status)
+
+
+def _check_destination_playlist(
+    yt: YTMusic, dst_pl_id: Optional[str], sync: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Make sure the destination playlist exists, exiting if it does not.
+
+    Returns:
+        Optional[Dict[str, Any]]: With `sync`, the destination playlist (or
+            Liked Songs) including all of its tracks
+    """
+    if dst_pl_id is None:
+        return yt.get_liked_songs(limit=None) if sync else None
+
+    try:
+        if sync:
+            yt_pl = yt.get_playlist(playlistId=dst_pl_id, limit=None)
+        else:
+            yt_pl = yt.get_playlist(playlistId=dst_pl_id)
+        print(f"== Youtube Playlist: {yt_pl['title']}")
+    except Exception as e:
+        print(f"ERROR: Unable to find YTMusic playlist {dst_pl_id}: {e}")
+        print("       Make sure the YTMusic playlist ID is correct, it should be something like")
+        print("      'PL_DhcdsaJ7echjfdsaJFhdsWUd73HJFca'")
+        sys.exit(1)
+    return yt_pl if sync else None
+
+
+def _track_caches(
+    metrics: Optional[Metrics],
+    match_cache: Optional[MatchCache],
+    album_cache: AlbumCache,
+) -> None:
+    """Report the hit rates of the lookup caches in `metrics`, if any."""
+    if metrics is None:
+        return
+    metrics.track_cache("album", album_cache)
+    if match_cache is not None:
+        metrics.track_cache("match", match_cache)
+
+
 def copier(
     src_tracks: Iterator[SongInfo],
     dst_pl_id: Optional[str] = None,
@@ -337,9 +1418,29 @@ def copier(
     yt_search_algo: int = 0,
     *,
     yt: Optional[YTMusic] = None,
+    match_cache: Optional[MatchCache] = None,
+    album_cache: Optional[AlbumCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    lookup_workers: int = 1,
+    journal: Optional[Journal] = None,
+    journal_key: Optional[str] = None,
+    sync: bool = False,
+    resolved: Optional[ResolvedSongs] = None,
+    dedupe: bool = False,
+    destination: Optional[DestinationTracks] = None,
 ) -> None:
     """
     Copy tracks from Spotify to YouTube Music.
+
+    With `lookup_workers` > 1 the YTMusic searches run concurrently on a thread
+    pool, while tracks are still written (and reported) one by one in source
+    order.  With a `journal`, tracks it has as done are skipped without any
+    YTMusic calls, and every track written is recorded in it.  With `sync`,
+    the destination is fetched once and tracks already in it are skipped, see
+    `DestinationTracks`.  With `dedupe`, every distinct song is looked up once
+    before anything is written, see `resolve_songs`.
     
     Args:
         src_tracks: Iterator of Spotify tracks to copy
@@ -348,75 +1449,112 @@ def copier(
         track_sleep: Sleep time between track additions
         yt_search_algo: Search algorithm (0=exact, 1=extended, 2=approximate)
         yt: YTMusic client (auto-initialized if None)
+        match_cache: Optional persistent cache of earlier matches
+        album_cache: Album cache to use (a new one is created for this run if None)
+        rate_limiter: Optional rate limiter for the YTMusic calls
+        metrics: Optional metrics the YTMusic calls and cache hits are recorded in
+        batch_size: Number of tracks sent per add_playlist_items call
+        lookup_workers: Number of songs looked up concurrently
+        journal: Optional checkpoint journal to resume from and record to
+        journal_key: Key of this copy in the journal (default: dst_pl_id)
+        sync: If True, only copy tracks missing from the destination
+        resolved: Songs resolved beforehand by `resolve_songs`
+        dedupe: If True (and no `resolved` is given), resolve distinct songs first
+        destination: With `sync`, the destination fetched beforehand (it is
+            fetched here if None)
     """
     if yt is None:
-        yt = get_ytmusic()
+        yt = get_ytmusic(rate_limiter, metrics)
+    else:
+        yt = _wrap_ytmusic(yt, rate_limiter, metrics)
+    if album_cache is None:
+        album_cache = AlbumCache()
+    _track_caches(metrics, match_cache, album_cache)
+
+    if destination is None:
+        yt_pl = _check_destination_playlist(yt, dst_pl_id, sync)
+        if yt_pl is not None:
+            destination = DestinationTracks(
+                yt_pl["tracks"], match_cache, yt_search_algo
+            )
 
-    if dst_pl_id is not None:
-        try:
-            yt_pl = yt.get_playlist(playlistId=dst_pl_id)
-            print(f"== Youtube Playlist: {yt_pl['title']}")
-        except Exception as e:
-            print(f"ERROR: Unable to find YTMusic playlist {dst_pl_id}: {e}")
-            print("       Make sure the YTMusic playlist ID is correct, it should be something like")
-            print("      'PL_DhcdsaJ7echjfdsaJFhdsWUd73HJFca'")
-            sys.exit(1)
+    committer = _TrackCommitter(
+        PlaylistWriter(yt, dst_pl_id, dry_run=dry_run, batch_size=batch_size),
+        journal,
+        journal_key or dst_pl_id or "Liked Songs",
+        destination if sync else None,
+    )
+    pending_tracks: Iterable[Tuple[int, SongInfo]] = committer.pending_tracks(
+        src_tracks
+    )
+    if dedupe and resolved is None:
+        pending_tracks = list(pending_tracks)
+        resolved = resolve_songs(
+            yt,
+            (src_track for _, src_track in pending_tracks),
+            yt_search_algo,
+            track_sleep,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            lookup_workers=lookup_workers,
+        )
+    resolved_tracks = _resolve_tracks(
+        yt,
+        pending_tracks,
+        yt_search_algo,
+        track_sleep,
+        match_cache=match_cache,
+        album_cache=album_cache,
+        lookup_workers=lookup_workers,
+        resolved=resolved,
+    )
+    for index, src_track, dst_track in resolved_tracks:
+        committer.commit(index, src_track, dst_track)
+    committer.finish()
 
-    tracks_added_set = set()
-    duplicate_count = 0
-    error_count = 0
 
-    for src_track in src_tracks:
-        print(f"Spotify:   {src_track.title} - {src_track.artist} - {src_track.album}")
+def _resolve_destination(
+    yt: YTMusic,
+    spotify_playlist_id: str,
+    ytmusic_playlist_id: str,
+    privacy_status: str,
+    spotify_playlist_file: Union[str, SpotifyLibrary] = "playlists.json",
+    spotify_encoding: str = "utf-8",
+    library_playlists: Optional[LibraryPlaylists] = None,
+) -> str:
+    """
+    Turn the destination argument of `copy_playlist` into a YTMusic playlist ID.
 
-        try:
-            dst_track = lookup_song(
-                yt, src_track.title, src_track.artist, src_track.album, yt_search_algo
-            )
-        except Exception as e:
-            print(f"ERROR: Unable to look up song on YTMusic: {e}")
-            error_count += 1
-            continue
+    A "+name" is looked up by name, and a missing playlist is created.
+    """
+    pl_name: str = ""
 
-        yt_artist_name = "<Unknown>"
-        if "artists" in dst_track and len(dst_track["artists"]) > 0:
-            yt_artist_name = dst_track["artists"][0]["name"]
-        print(
-            f"  Youtube: {dst_track['title']} - {yt_artist_name} - {dst_track.get('album', '<Unknown>')}"
-        )
+    if ytmusic_playlist_id.startswith("+"):
+        pl_name = ytmusic_playlist_id[1:]
+        ytmusic_playlist_id = get_playlist_id_by_name(yt, pl_name, library_playlists)
+        print(f"Looking up playlist '{pl_name}': id={ytmusic_playlist_id}")
 
-        if dst_track["videoId"] in tracks_added_set:
-            print("(DUPLICATE, this track has already been added)")
-            duplicate_count += 1
-        tracks_added_set.add(dst_track["videoId"])
-
-        if not dry_run:
-            exception_sleep = 5
-            for _ in range(10):
-                try:
-                    if dst_pl_id is not None:
-                        yt.add_playlist_items(
-                            playlistId=dst_pl_id,
-                            videoIds=[dst_track["videoId"]],
-                            duplicates=False,
-                        )
-                    else:
-                        yt.rate_song(dst_track["videoId"], "LIKE")
+    if ytmusic_playlist_id is None:
+        if pl_name == "":
+            print("No playlist name or ID provided, creating playlist...")
+            for pl in list_spotify_playlists(spotify_playlist_file, spotify_encoding):
+                if pl["id"] == spotify_playlist_id:
+                    pl_name = pl["name"]
                     break
-                except Exception as e:
-                    print(
-                        f"ERROR: (Retrying add_playlist_items: {dst_pl_id} {dst_track['videoId']}) {e} in {exception_sleep} seconds"
-                    )
-                    time.sleep(exception_sleep)
-                    exception_sleep *= 2
 
-        if track_sleep:
-            time.sleep(track_sleep)
+        if not pl_name:
+            pl_name = f"Spotify Playlist {spotify_playlist_id}"
 
-    print()
-    print(
-        f"Added {len(tracks_added_set)} tracks, encountered {duplicate_count} duplicates, {error_count} errors"
-    )
+        ytmusic_playlist_id = _ytmusic_create_playlist(
+            yt,
+            title=pl_name,
+            description=pl_name,
+            privacy_status=privacy_status,
+            library_playlists=library_playlists,
+        )
+        print(f"NOTE: Created playlist '{pl_name}' with ID: {ytmusic_playlist_id}")
+
+    return ytmusic_playlist_id
 
 
 def copy_playlist(
@@ -428,6 +1566,17 @@ def copy_playlist(
     yt_search_algo: int = 0,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    *,
+    match_cache: Optional[MatchCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    lookup_workers: int = 1,
+    journal: Optional[Journal] = None,
+    sync: bool = False,
+    spotify_playlist_file: Union[str, SpotifyLibrary] = "playlists.json",
+    library_playlists: Optional[LibraryPlaylists] = None,
+    dedupe: bool = False,
 ) -> None:
     """
     Copy a Spotify playlist to a YTMusic playlist.
@@ -441,36 +1590,38 @@ def copy_playlist(
         yt_search_algo: Search algorithm (0=exact, 1=extended, 2=approximate)
         reverse_playlist: If True, reverse playlist order
         privacy_status: Playlist privacy setting
+        match_cache: Optional persistent cache of earlier matches
+        rate_limiter: Optional rate limiter for the YTMusic calls
+        metrics: Optional metrics the YTMusic calls and cache hits are recorded in
+        batch_size: Number of tracks sent per add_playlist_items call
+        lookup_workers: Number of songs looked up concurrently
+        journal: Optional checkpoint journal to resume from and record to
+        sync: If True, only copy tracks missing from the destination
+        spotify_playlist_file: Path to playlists backup file, or a SpotifyLibrary
+        library_playlists: YTMusic library snapshot (fetched once if None)
+        dedupe: If True, look up every distinct song once before copying
     """
-    print(f"Using search algorithm: {yt_search_algo}")
-    yt = get_ytmusic()
-    pl_name: str = ""
-
-    if ytmusic_playlist_id.startswith("+"):
-        pl_name = ytmusic_playlist_id[1:]
-        ytmusic_playlist_id = get_playlist_id_by_name(yt, pl_name)
-        print(f"Looking up playlist '{pl_name}': id={ytmusic_playlist_id}")
-
-    if ytmusic_playlist_id is None:
-        if pl_name == "":
-            print("No playlist name or ID provided, creating playlist...")
-            spotify_pls = load_playlists_json()
-            for pl in spotify_pls["playlists"]:
-                if len(pl.keys()) > 3 and pl["id"] == spotify_playlist_id:
-                    pl_name = pl["name"]
-                    break
-
-        if not pl_name:
-            pl_name = f"Spotify Playlist {spotify_playlist_id}"
+    journal_key = f"{spotify_playlist_id}>{ytmusic_playlist_id}"
+    if journal is not None and journal.is_done(journal_key):
+        print(f"Playlist {spotify_playlist_id} was already copied, skipping")
+        return
 
-        ytmusic_playlist_id = _ytmusic_create_playlist(
-            yt, title=pl_name, description=pl_name, privacy_status=privacy_status
-        )
-        print(f"NOTE: Created playlist '{pl_name}' with ID: {ytmusic_playlist_id}")
+    print(f"Using search algorithm: {yt_search_algo}")
+    yt = get_ytmusic(rate_limiter, metrics)
+    ytmusic_playlist_id = _resolve_destination(
+        yt,
+        spotify_playlist_id,
+        ytmusic_playlist_id,
+        privacy_status,
+        spotify_playlist_file,
+        spotify_playlists_encoding,
+        library_playlists,
+    )
 
     copier(
         iter_spotify_playlist(
             spotify_playlist_id,
+            spotify_playlist_file,
             spotify_encoding=spotify_playlists_encoding,
             reverse_playlist=reverse_playlist,
         ),
@@ -479,9 +1630,177 @@ def copy_playlist(
         track_sleep,
         yt_search_algo,
         yt=yt,
+        match_cache=match_cache,
+        metrics=metrics,
+        batch_size=batch_size,
+        lookup_workers=lookup_workers,
+        journal=journal,
+        journal_key=journal_key,
+        sync=sync,
+        dedupe=dedupe,
     )
 
 
+def _playlists_to_copy(
+    library: SpotifyLibrary,
+) -> Iterator[Tuple[SpotifyPlaylist, str]]:
+    """Yield (Spotify playlist, YTMusic playlist name) for `copy_all_playlists`."""
+    for src_pl in library.playlists:
+        if str(src_pl.name) == "Liked Songs":
+            continue
+
+        pl_name = src_pl.name
+        if pl_name == "":
+            pl_name = f"Unnamed Spotify Playlist {src_pl.id}"
+        yield src_pl, pl_name
+
+
+class PlaylistOutput:
+    """
+    sys.stdout stand-in that keeps the output of concurrent playlist copies apart.
+
+    Within `capture`, whatever the current thread or asyncio task (and the
+    lookups it starts) prints is buffered, and written out in one piece when
+    the block ends.  Other output passes straight through.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self._buffer: contextvars.ContextVar[Optional[io.StringIO]] = (
+            contextvars.ContextVar("s2yt_playlist_output", default=None)
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def installed(cls) -> Iterator["PlaylistOutput"]:
+        """Replace sys.stdout with a PlaylistOutput for the duration of the block."""
+        output = cls(sys.stdout)
+        sys.stdout = output
+        try:
+            yield output
+        finally:
+            sys.stdout = output.stream
+
+    @contextmanager
+    def capture(self) -> Iterator[None]:
+        """Buffer the output of the current thread or task until the block ends."""
+        buffer = io.StringIO()
+        token = self._buffer.set(buffer)
+        try:
+            yield
+        finally:
+            self._buffer.reset(token)
+            with self._lock:
+                self.stream.write(buffer.getvalue())
+                self.stream.flush()
+
+    def write(self, text: str) -> int:
+        buffer = self._buffer.get()
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self) -> None:
+        if self._buffer.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+def _songs_to_copy(
+    playlists: Iterable[Tuple[SpotifyPlaylist, str]],
+    liked: Optional[SpotifyPlaylist],
+    reverse_playlist: bool,
+    journal: Optional[Journal],
+    destinations: Optional[Dict[str, DestinationTracks]] = None,
+) -> Iterator[SongInfo]:
+    """
+    Yield the songs `copy_all_playlists` still has to copy, for `resolve_songs`.
+
+    Songs the journal has as copied, or that `destinations` (by journal key,
+    see `_sync_destinations`) already hold, are left out.
+    """
+    sources = [
+        (src_pl, f"{src_pl.id}>+{pl_name}", reverse_playlist)
+        for src_pl, pl_name in playlists
+    ]
+    if liked is not None:
+        # Liked Songs are copied like `load_liked` does, unreversed
+        sources.append((liked, "Liked Songs", False))
+
+    for src_pl, journal_key, reverse in sources:
+        if journal is not None and journal.is_done(journal_key):
+            continue
+        destination = (destinations or {}).get(journal_key)
+        for index, src_track in enumerate(src_pl.songs(reverse)):
+            if journal is not None and journal.is_done(journal_key, index):
+                continue
+            if destination is None or src_track not in destination:
+                yield src_track
+
+
+def _sync_destinations(
+    yt: YTMusic,
+    playlists: Iterable[Tuple[SpotifyPlaylist, str]],
+    liked: Optional[SpotifyPlaylist],
+    match_cache: Optional[MatchCache],
+    yt_search_algo: int,
+    library_playlists: Optional[LibraryPlaylists] = None,
+) -> Dict[str, DestinationTracks]:
+    """
+    Index the existing destinations of `copy_all_playlists` by journal key,
+    so that `--dedupe` doesn't resolve songs `--sync` skips anyway.  The
+    copies are then given their destination instead of fetching it again.
+
+    Only cached matches are found in a destination before any search (see
+    `DestinationTracks`), so without a `match_cache` nothing is fetched.
+    """
+    destinations: Dict[str, DestinationTracks] = {}
+    if match_cache is None:
+        return destinations
+    for src_pl, pl_name in playlists:
+        dst_pl_id = get_playlist_id_by_name(yt, pl_name, library_playlists)
+        if dst_pl_id is not None:
+            yt_pl = yt.get_playlist(playlistId=dst_pl_id, limit=None)
+            destinations[f"{src_pl.id}>+{pl_name}"] = DestinationTracks(
+                yt_pl["tracks"], match_cache, yt_search_algo
+            )
+    if liked is not None:
+        destinations["Liked Songs"] = DestinationTracks(
+            yt.get_liked_songs(limit=None)["tracks"], match_cache, yt_search_algo
+        )
+    return destinations
+
+
+def _largest_first(
+    playlists: Iterable[Tuple[SpotifyPlaylist, str]]
+) -> List[Tuple[SpotifyPlaylist, str]]:
+    """Order playlists for a worker pool, so that a big one doesn't start last."""
+    return sorted(playlists, key=lambda pl: len(pl[0].tracks), reverse=True)
+
+
+def _find_or_create_playlist(
+    yt: YTMusic,
+    pl_name: str,
+    privacy_status: str,
+    library_playlists: Optional[LibraryPlaylists] = None,
+) -> str:
+    """Return the ID of the YTMusic playlist named `pl_name`, creating it if needed."""
+    dst_pl_id = get_playlist_id_by_name(yt, pl_name, library_playlists)
+    print(f"Looking up playlist '{pl_name}': id={dst_pl_id}")
+
+    if dst_pl_id is None:
+        dst_pl_id = _ytmusic_create_playlist(
+            yt,
+            title=pl_name,
+            description=pl_name,
+            privacy_status=privacy_status,
+            library_playlists=library_playlists,
+        )
+        print(f"NOTE: Created playlist '{pl_name}' with ID: {dst_pl_id}")
+    return dst_pl_id
+
+
 def copy_all_playlists(
     track_sleep: float = 0.1,
     dry_run: bool = False,
@@ -489,9 +1808,37 @@ def copy_all_playlists(
     yt_search_algo: int = 0,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    *,
+    match_cache: Optional[MatchCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[Metrics] = None,
+    batch_size: int = 50,
+    lookup_workers: int = 1,
+    journal: Optional[Journal] = None,
+    sync: bool = False,
+    spotify_playlist_file: Union[str, SpotifyLibrary] = "playlists.json",
+    library_playlists: Optional[LibraryPlaylists] = None,
+    parallel_playlists: int = 1,
+    dedupe: bool = False,
+    include_liked: bool = False,
 ) -> None:
     """
     Copy all Spotify playlists (except Liked Songs) to YTMusic playlists.
+
+    The backup is parsed once into a SpotifyLibrary (unless one is passed)
+    that all playlists are then read from.
+
+    With `parallel_playlists` > 1, whole playlists are copied on a pool of
+    that many threads, largest first, sharing the YTMusic client, rate
+    limiter and caches.  The output of each playlist is printed in one piece
+    once it is done.  A failing playlist doesn't stop the others; the first
+    error is raised after all of them finished.
+
+    With `dedupe`, the distinct songs of all playlists (and Liked Songs, with
+    `include_liked`) are looked up first, once each, and the results shared
+    by every playlist they are in, see `resolve_songs`.  With `sync` and a
+    `match_cache` as well, songs whose cached match their destination already
+    holds are not looked up.
     
     Args:
         track_sleep: Sleep time between track additions
@@ -500,38 +1847,125 @@ def copy_all_playlists(
         yt_search_algo: Search algorithm (0=exact, 1=extended, 2=approximate)
         reverse_playlist: If True, reverse playlist order
         privacy_status: Playlist privacy setting
+        match_cache: Optional persistent cache of earlier matches
+        rate_limiter: Optional rate limiter for the YTMusic calls
+        metrics: Optional metrics the YTMusic calls and cache hits are recorded in
+        batch_size: Number of tracks sent per add_playlist_items call
+        lookup_workers: Number of songs looked up concurrently
+        journal: Optional checkpoint journal to resume from and record to
+        sync: If True, only copy tracks missing from the destination
+        spotify_playlist_file: Path to playlists backup file, or a SpotifyLibrary
+        library_playlists: YTMusic library snapshot (fetched once if None)
+        parallel_playlists: Number of playlists copied concurrently
+        dedupe: If True, look up every distinct song once before copying
+        include_liked: If True, also copy Liked Songs (to YTMusic liked songs)
     """
-    spotify_pls = load_playlists_json()
-    yt = get_ytmusic()
-
-    for src_pl in spotify_pls["playlists"]:
-        if str(src_pl.get("name")) == "Liked Songs":
-            continue
+    library = spotify_playlist_file
+    if not isinstance(library, SpotifyLibrary):
+        library = SpotifyLibrary(library, spotify_playlists_encoding)
+    yt = get_ytmusic(rate_limiter, metrics)
+    album_cache = AlbumCache()
+    if library_playlists is None:
+        library_playlists = LibraryPlaylists()
+    # Playlists with the same name must not both create it
+    create_lock = threading.Lock()
+    playlists = list(_playlists_to_copy(library))
+    liked = library.playlist_by_name("Liked Songs") if include_liked else None
+    if include_liked and liked is None:
+        print("NOTE: There are no Liked Songs in the backup")
+
+    resolved = None
+    destinations: Dict[str, DestinationTracks] = {}
+    if dedupe:
+        if sync:
+            destinations = _sync_destinations(
+                yt, playlists, liked, match_cache, yt_search_algo, library_playlists
+            )
+        resolved = resolve_songs(
+            yt,
+            _songs_to_copy(playlists, liked, reverse_playlist, journal, destinations),
+            yt_search_algo,
+            track_sleep,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            lookup_workers=lookup_workers,
+        )
 
-        pl_name = src_pl["name"]
-        if pl_name == "":
-            pl_name = f"Unnamed Spotify Playlist {src_pl['id']}"
+    def _copy_playlist(src_pl: SpotifyPlaylist, pl_name: str) -> None:
+        journal_key = f"{src_pl.id}>+{pl_name}"
+        if journal is not None and journal.is_done(journal_key):
+            print(f"Playlist '{pl_name}' was already copied, skipping")
+            return
 
-        dst_pl_id = get_playlist_id_by_name(yt, pl_name)
-        print(f"Looking up playlist '{pl_name}': id={dst_pl_id}")
-        
-        if dst_pl_id is None:
-            dst_pl_id = _ytmusic_create_playlist(
-                yt, title=pl_name, description=pl_name, privacy_status=privacy_status
+        with create_lock:
+            dst_pl_id = _find_or_create_playlist(
+                yt, pl_name, privacy_status, library_playlists
             )
-            print(f"NOTE: Created playlist '{pl_name}' with ID: {dst_pl_id}")
 
         copier(
             iter_spotify_playlist(
-                src_pl["id"],
-                spotify_encoding=spotify_playlists_encoding,
+                src_pl.id,
+                library,
                 reverse_playlist=reverse_playlist,
             ),
             dst_pl_id,
             dry_run,
             track_sleep,
             yt_search_algo,
+            yt=yt,
+            match_cache=match_cache,
+            album_cache=album_cache,
+            metrics=metrics,
+            batch_size=batch_size,
+            lookup_workers=lookup_workers,
+            journal=journal,
+            journal_key=journal_key,
+            sync=sync,
+            resolved=resolved,
+            destination=destinations.get(journal_key),
         )
         print("\nPlaylist done!\n")
 
-    print("All done!") 
\ No newline at end of file
+    if parallel_playlists <= 1:
+        for src_pl, pl_name in playlists:
+            _copy_playlist(src_pl, pl_name)
+    else:
+        with PlaylistOutput.installed() as output, ThreadPoolExecutor(
+            max_workers=parallel_playlists
+        ) as pool:
+
+            def _captured(src_pl: SpotifyPlaylist, pl_name: str) -> None:
+                with output.capture():
+                    _copy_playlist(src_pl, pl_name)
+
+            futures = [
+                pool.submit(_captured, src_pl, pl_name)
+                for src_pl, pl_name in _largest_first(playlists)
+            ]
+        for future in futures:
+            future.result()
+
+    if liked is not None:
+        if journal is not None and journal.is_done("Liked Songs"):
+            print("Liked Songs were already copied, skipping")
+        else:
+            copier(
+                iter_spotify_playlist(None, library, reverse_playlist=False),
+                None,
+                dry_run,
+                track_sleep,
+                yt_search_algo,
+                yt=yt,
+                match_cache=match_cache,
+                album_cache=album_cache,
+                metrics=metrics,
+                batch_size=batch_size,
+                lookup_workers=lookup_workers,
+                journal=journal,
+                journal_key="Liked Songs",
+                sync=sync,
+                resolved=resolved,
+                destination=destinations.get("Liked Songs"),
+            )
+
+    print("All done!")
@@ -3,8 +3,17 @@
 import sys
 from argparse import ArgumentParser
 import pprint
+from typing import Optional
 
-from . import backend
+from . import async_backend, backend
+from .journal import Journal
+from .library_index import build_index
+from .match_cache import MatchCache
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+
+
+DEFAULT_JOURNAL = "s2yt_journal.jsonl"
 
 
 def create_common_parser() -> ArgumentParser:
@@ -14,7 +23,8 @@ def create_common_parser() -> ArgumentParser:
         "--track-sleep",
         type=float,
         default=0.1,
-        help="Time to sleep between each track that is added (default: 0.1)",
+        help="Time to sleep between each track that is added, ignored when "
+        "--reads-per-second or --writes-per-second is given (default: 0.1)",
     )
     parser.add_argument(
         "--dry-run",
@@ -32,30 +42,189 @@ def create_common_parser() -> ArgumentParser:
         default=0,
         help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate)",
     )
+    parser.add_argument(
+        "--match-cache",
+        default=None,
+        help="SQLite file caching YTMusic matches between runs (default: no cache)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50,
+        help="Number of tracks added to a YTMusic playlist per request (default: 50)",
+    )
+    parser.add_argument(
+        "--lookup-workers",
+        type=int,
+        default=1,
+        help="Number of songs to look up on YTMusic concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--reads-per-second",
+        type=float,
+        default=None,
+        help="Limit YTMusic searches and fetches to this rate, shared by all "
+        "s2yt processes on this host (default: unlimited)",
+    )
+    parser.add_argument(
+        "--writes-per-second",
+        type=float,
+        default=None,
+        help="Limit YTMusic playlist edits and ratings to this rate, shared by all "
+        "s2yt processes on this host (default: unlimited)",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="Record the progress of the copy in this file, so that it can be "
+        "resumed with --resume if it is interrupted (default: no journal)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the copy recorded in --journal (default: "
+        f"{DEFAULT_JOURNAL}): tracks and playlists already copied are skipped, "
+        "failed ones are retried",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Fetch the destination once and only add the tracks that are missing "
+        "from it; with --match-cache, tracks whose cached match is in it are "
+        "not even looked up",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Look up every distinct song once before adding anything, instead of "
+        "once per occurrence (copy_all_playlists does this across all playlists)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["sync", "async"],
+        default="sync",
+        help="Run lookups on a thread pool (sync) or as asyncio tasks (async), "
+        "both bounded by --lookup-workers (default: sync)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Print the calls, errors, retries and latencies of every YTMusic "
+        "endpoint, and the cache hit rates, at the end of the run",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Write those metrics to this JSON file at the end of the run",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve those metrics in the Prometheus text format on "
+        "http://127.0.0.1:PORT/metrics while the run goes on",
+    )
     return parser
 
 
+def _copy_options(args) -> dict:
+    """Return the copy keyword arguments given by the common parser options."""
+    track_sleep = args.track_sleep
+    rate_limiter = None
+    if args.reads_per_second or args.writes_per_second:
+        # The rate limiter replaces the fixed per-track sleep
+        rate_limiter = RateLimiter(args.reads_per_second, args.writes_per_second)
+        track_sleep = 0
+
+    return dict(
+        dry_run=args.dry_run,
+        track_sleep=track_sleep,
+        yt_search_algo=args.algo,
+        match_cache=MatchCache(args.match_cache) if args.match_cache else None,
+        rate_limiter=rate_limiter,
+        metrics=Metrics()
+        if args.metrics or args.metrics_file or args.metrics_port
+        else None,
+        batch_size=args.batch_size,
+        journal=_open_journal(args),
+        sync=args.sync,
+        dedupe=args.dedupe,
+    )
+
+
+def _open_journal(args) -> Optional[Journal]:
+    """Open the journal given by --journal and --resume, if any."""
+    filename = args.journal or (DEFAULT_JOURNAL if args.resume else None)
+    if args.dry_run or filename is None:
+        return None
+    try:
+        return Journal(filename, resume=args.resume)
+    except FileExistsError as e:
+        print(f"ERROR: {e} (pass --resume to continue it)")
+        sys.exit(1)
+
+
+def _run_engine(args, sync_func, async_func, *func_args, **func_kwargs):
+    """
+    Run a copy function with the engine selected by --engine, reporting its
+    metrics as the --metrics options ask, even if it fails.
+    """
+    metrics = func_kwargs.get("metrics")
+    server = None
+    if metrics is not None and args.metrics_port:
+        server = metrics.serve(args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    try:
+        if args.engine == "async":
+            async_backend.run(
+                async_func(*func_args, concurrency=args.lookup_workers, **func_kwargs),
+                concurrency=args.lookup_workers
+                * func_kwargs.get("parallel_playlists", 1),
+            )
+        else:
+            sync_func(*func_args, lookup_workers=args.lookup_workers, **func_kwargs)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if metrics is not None:
+            print(metrics.summary())
+            if args.metrics_file:
+                metrics.write_json(args.metrics_file)
+                print(f"Metrics written to {args.metrics_file}")
+
+
 def list_liked_albums():
     """List albums that have been liked."""
     for song in backend.iter_spotify_liked_albums():
         print(f"{song.album} - {song.artist} - {song.title}")
 
 
+def _add_playlist_cache_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--playlist-cache",
+        type=str,
+        default=None,
+        help="Keep the list of YTMusic library playlists in this file and reuse it "
+        "for an hour, instead of fetching it on every run.",
+    )
+
+
 def list_playlists():
     """List the playlists on Spotify and YTMusic."""
+    parser = ArgumentParser()
+    _add_playlist_cache_argument(parser)
+    args = parser.parse_args()
+
     yt = backend.get_ytmusic()
-    spotify_pls = backend.load_playlists_json()
 
     # Liked music
     print("== Spotify")
-    for src_pl in spotify_pls["playlists"]:
-        print(
-            f"{src_pl.get('id')} - {src_pl['name']:50} ({len(src_pl['tracks'])} tracks)"
-        )
+    for src_pl in backend.list_spotify_playlists():
+        print(f"{src_pl['id']} - {src_pl['name']:50} ({src_pl['track_count']} tracks)")
 
     print()
     print("== YTMusic")
-    for pl in yt.get_library_playlists(limit=5000):
+    for pl in backend.LibraryPlaylists(args.playlist_cache).playlists(yt):
         print(f"{pl['playlistId']} - {pl['title']:40} ({pl.get('count', '?')} tracks)")
 
 
@@ -111,6 +280,8 @@ def search():
     )
 
     print(f"Query: '{details.query}'")
+    if details.confidence is not None:
+        print(f"Confidence: {details.confidence:.2f}")
     print("Selected song:")
     pprint.pprint(ret)
     print()
@@ -129,14 +300,16 @@ def load_liked_albums():
     parser = create_common_parser()
     args = parser.parse_args()
 
-    backend.copier(
+    _run_engine(
+        args,
+        backend.copier,
+        async_backend.copier,
         backend.iter_spotify_liked_albums(
             spotify_encoding=args.spotify_playlists_encoding
         ),
         None,
-        args.dry_run,
-        args.track_sleep,
-        args.algo,
+        journal_key="Liked Albums",
+        **_copy_options(args),
     )
 
 
@@ -152,16 +325,18 @@ def load_liked():
 
     args = parser.parse_args()
 
-    backend.copier(
+    _run_engine(
+        args,
+        backend.copier,
+        async_backend.copier,
         backend.iter_spotify_playlist(
             None,
             spotify_encoding=args.spotify_playlists_encoding,
             reverse_playlist=args.reverse_playlist,
         ),
         None,
-        args.dry_run,
-        args.track_sleep,
-        args.algo,
+        journal_key="Liked Songs",
+        **_copy_options(args),
     )
 
 
@@ -192,16 +367,20 @@ def copy_playlist():
         default="PRIVATE",
         help="The privacy setting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
     )
+    _add_playlist_cache_argument(parser)
 
     args = parser.parse_args()
-    backend.copy_playlist(
+    _run_engine(
+        args,
+        backend.copy_playlist,
+        async_backend.copy_playlist,
         spotify_playlist_id=args.spotify_playlist_id,
         ytmusic_playlist_id=args.ytmusic_playlist_id,
-        track_sleep=args.track_sleep,
-        dry_run=args.dry_run,
         spotify_playlists_encoding=args.spotify_playlists_encoding,
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
+        library_playlists=backend.LibraryPlaylists(args.playlist_cache),
+        **_copy_options(args),
     )
 
 
@@ -219,15 +398,101 @@ def copy_all_playlists():
         default="PRIVATE",
         help="The privacy setting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
     )
+    _add_playlist_cache_argument(parser)
+    parser.add_argument(
+        "--parallel-playlists",
+        type=int,
+        default=1,
+        help="Copy this many playlists at a time, largest first (default 1). "
+        "The output of each playlist is printed when it is done.",
+    )
+
+    parser.add_argument(
+        "--include-liked",
+        action="store_true",
+        help="Also copy the Liked Songs to YTMusic liked songs, as load_liked does "
+        "(with --dedupe, songs shared with playlists are looked up once).",
+    )
 
     args = parser.parse_args()
-    backend.copy_all_playlists(
-        track_sleep=args.track_sleep,
-        dry_run=args.dry_run,
+    _run_engine(
+        args,
+        backend.copy_all_playlists,
+        async_backend.copy_all_playlists,
         spotify_playlists_encoding=args.spotify_playlists_encoding,
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
+        library_playlists=backend.LibraryPlaylists(args.playlist_cache),
+        include_liked=args.include_liked,
+        parallel_playlists=args.parallel_playlists,
+        **_copy_options(args),
+    )
+
+
+def match_cache():
+    """Inspect, purge, export or import a YTMusic match cache file."""
+    parser = ArgumentParser()
+    parser.add_argument(
+        "action",
+        choices=["stats", "purge", "export", "import"],
+        help="What to do with the cache",
+    )
+    parser.add_argument(
+        "cache_file",
+        type=str,
+        help="SQLite match cache file (as given to --match-cache)",
+    )
+    parser.add_argument(
+        "json_file",
+        type=str,
+        nargs="?",
+        help="JSON file to export to or import from",
+    )
+
+    args = parser.parse_args()
+    if args.action in ("export", "import") and not args.json_file:
+        parser.error(f"{args.action} requires a json_file argument")
+
+    with MatchCache(args.cache_file) as cache:
+        if args.action == "stats":
+            print(f"{cache.stats()['entries']} cached matches in {args.cache_file}")
+        elif args.action == "purge":
+            print(f"Removed {cache.purge()} expired or excess matches")
+        elif args.action == "export":
+            count = cache.export_json(args.json_file)
+            print(f"Exported {count} matches to {args.json_file}")
+        else:
+            count = cache.import_json(args.json_file)
+            print(f"Imported {count} matches from {args.json_file}")
+
+
+def index():
+    """Convert a playlists.json backup into an indexed library file."""
+    parser = ArgumentParser()
+    parser.add_argument(
+        "spotify_playlist_file",
+        type=str,
+        nargs="?",
+        default="playlists.json",
+        help="The Spotify backup file to index (default: playlists.json)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Index file to write (default: next to the backup, with a .sqlite "
+        "extension, where the other commands pick it up automatically)",
+    )
+    parser.add_argument(
+        "--spotify-playlists-encoding",
+        default="utf-8",
+        help="The encoding of the `playlists.json` file.",
+    )
+
+    args = parser.parse_args()
+    index_file = build_index(
+        args.spotify_playlist_file, args.output, args.spotify_playlists_encoding
     )
+    print(f"Wrote library index {index_file}")
 
 
 def gui():
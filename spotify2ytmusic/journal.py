@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Append-only checkpoint journal of copy progress.
+
+Every committed step of a copy is appended to a JSON-lines file as
+{"playlist": key, "index": n, "videoId": id, "status": status}, and a
+{"playlist": key, "status": "done"} line once a playlist copied without
+errors.  Re-opening the journal with `resume=True` lets the copy functions
+skip finished tracks and playlists without any YTMusic calls, and retry the
+ones that failed.  A journal may be shared by threads copying different
+playlists.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+# Statuses of steps that do not need to be repeated on resume
+DONE_STATUSES = {"added", "rejected", "duplicate", "present"}
+
+
+class Journal:
+    """
+    Checkpoint journal backed by a JSON-lines file.
+
+    Args:
+        filename: Path of the journal file
+        resume: If True, load the existing journal and append to it,
+            otherwise start a new one
+
+    Raises:
+        FileExistsError: If not resuming and `filename` already holds the
+            progress of an earlier copy, which would be lost
+    """
+
+    def __init__(self, filename: str = "s2yt_journal.jsonl", resume: bool = False):
+        self.filename = filename
+        self._steps: Dict[Tuple[str, int], Tuple[Optional[str], str]] = {}
+        self._done_playlists: Set[str] = set()
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(filename):
+            self._load()
+        elif not resume and os.path.exists(filename) and os.path.getsize(filename):
+            raise FileExistsError(
+                f"{filename} holds the progress of an earlier copy, resume it "
+                "or remove the file to start over"
+            )
+        self._f = open(filename, "a" if resume else "w", encoding="utf-8")
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+
+    def record(
+        self, playlist: str, index: int, video_id: Optional[str], status: str
+    ) -> None:
+        """Append the outcome of copying track `index` of `playlist`."""
+        with self._lock:
+            self._append(
+                {
+                    "playlist": playlist,
+                    "index": index,
+                    "videoId": video_id,
+                    "status": status,
+                }
+            )
+            self._steps[(playlist, index)] = (video_id, status)
+
+    def mark_done(self, playlist: str) -> None:
+        """Record that `playlist` was copied completely."""
+        with self._lock:
+            self._append({"playlist": playlist, "status": "done"})
+            self._done_playlists.add(playlist)
+            os.fsync(self._f.fileno())
+
+    def is_done(self, playlist: str, index: Optional[int] = None) -> bool:
+        """Return whether a playlist, or one of its tracks, needs no more work."""
+        with self._lock:
+            if playlist in self._done_playlists:
+                return True
+            if index is None:
+                return False
+            step = self._steps.get((playlist, index))
+        return step is not None and step[1] in DONE_STATUSES
+
+    def video_ids(self, playlist: str) -> Set[str]:
+        """Return the videoIds already written to `playlist`."""
+        with self._lock:
+            return {
+                video_id
+                for (key, _), (video_id, status) in self._steps.items()
+                if key == playlist and status in ("added", "rejected") and video_id
+            }
+
+    def _append(self, entry: Dict[str, object]) -> None:
+        """Write `entry` to the file; the caller holds `_lock`."""
+        self._f.write(json.dumps(entry) + "\n")
+        self._f.flush()
+
+    def _load(self) -> None:
+        """Load the journal file, dropping a torn last line."""
+        good = 0
+        with open(self.filename, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash, only ever the last line
+                    break
+                if entry["status"] == "done":
+                    self._done_playlists.add(entry["playlist"])
+                else:
+                    self._steps[(entry["playlist"], entry["index"])] = (
+                        entry["videoId"],
+                        entry["status"],
+                    )
+                good += len(line)
+        # Appended entries have to start on a line of their own
+        with open(self.filename, "r+b") as f:
+            f.truncate(good)
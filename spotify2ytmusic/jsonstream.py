@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+"""
+Incremental reader for JSON documents too large to load at once.
+
+The reader walks objects and arrays one member at a time, reading the file in
+chunks, so the caller decides for every member whether to decode it (with the
+C decoder of the json module), descend into it, or skip it.  Only the member
+being decoded and one chunk of the file are held in memory.
+
+Example, printing the "name" of every element of a top-level "items" array:
+
+    reader = JSONStreamReader(f)
+    for key in reader.iter_object():
+        if key != "items":
+            reader.skip_value()
+            continue
+        for _ in reader.iter_array():
+            for item_key in reader.iter_object():
+                if item_key == "name":
+                    print(reader.read_value())
+                else:
+                    reader.skip_value()
+
+Every key yielded by `iter_object` and every element announced by
+`iter_array` must be consumed with exactly one of `read_value`, `skip_value`,
+`iter_object` or `iter_array` before the loop continues.
+"""
+
+import json
+from typing import Any, Iterator, TextIO
+
+WHITESPACE = " \t\n\r"
+NUMBER_CHARS = "0123456789.eE+-"
+
+
+class JSONStreamReader:
+    """Pull-style reader of a JSON document from a text file."""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, f: TextIO) -> None:
+        self._f = f
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character, or "" at end of file."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos : self._pos + 1]
+
+    def iter_object(self) -> Iterator[str]:
+        """Enter an object, yielding its keys; each value must be consumed."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self._separator("}"):
+                return
+
+    def iter_array(self) -> Iterator[int]:
+        """Enter an array, yielding element indexes; each element must be consumed."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._separator("]"):
+                return
+
+    def read_value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut off by the buffer end ("22." or "1e" decode as 22
+            # and 1) may continue in the next chunk
+            if (
+                isinstance(value, (int, float))
+                and not self._buf[end:].lstrip(NUMBER_CHARS)
+                and self._fill()
+            ):
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self) -> None:
+        """Skip the next value without decoding it as a whole."""
+        c = self.peek()
+        if c == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif c == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self.read_value()
+
+    def _separator(self, close: str) -> bool:
+        """Consume a "," (returning False) or the closing bracket (returning True)."""
+        c = self.peek()
+        if c == ",":
+            self._pos += 1
+            return False
+        self._expect(close)
+        return True
+
+    def _expect(self, c: str) -> None:
+        if self.peek() != c:
+            raise ValueError(
+                f"Expected {c!r} at {self._buf[self._pos : self._pos + 20]!r}"
+            )
+        self._pos += 1
+
+    def _fill(self) -> bool:
+        """Read another chunk into the buffer, returning False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._f.read(self.CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""
+Indexed SQLite store of a `spotify_backup` playlists.json file.
+
+`build_index` (the `s2yt_index` command) converts the JSON backup into a
+SQLite file next to it.  The Spotify iterators of `backend` then read the
+index instead of the JSON whenever it is up to date, so finding a playlist,
+counting its tracks or reading it in reverse are indexed queries rather than
+a parse of the whole backup.  An index file can also be passed directly
+wherever a playlists.json filename is expected.
+"""
+
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .jsonstream import JSONStreamReader
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE playlists (
+    position INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    track_count INTEGER NOT NULL
+);
+CREATE INDEX playlists_id ON playlists (id);
+CREATE INDEX playlists_name ON playlists (name);
+CREATE TABLE tracks (
+    playlist INTEGER NOT NULL REFERENCES playlists (position),
+    position INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration_ms INTEGER,
+    raw TEXT,
+    PRIMARY KEY (playlist, position)
+);
+CREATE TABLE albums (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    added_at TEXT
+);
+CREATE TABLE album_tracks (
+    album INTEGER NOT NULL REFERENCES albums (position),
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    duration_ms INTEGER,
+    PRIMARY KEY (album, position)
+);
+"""
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# Bumped whenever SCHEMA changes, older indexes have to be rebuilt
+INDEX_VERSION = "2"
+
+
+def index_filename(spotify_playlist_file: str) -> str:
+    """Return the default index file name for a playlists.json file."""
+    return os.path.splitext(spotify_playlist_file)[0] + ".sqlite"
+
+
+def _source_stamp(spotify_playlist_file: str) -> str:
+    st = os.stat(spotify_playlist_file)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def find_index(spotify_playlist_file: str) -> Optional[str]:
+    """
+    Return the index to read instead of `spotify_playlist_file`, if any.
+
+    That is the file itself if it is an index, or its sibling index if that
+    was built from the current version of the file.
+    """
+    with open(spotify_playlist_file, "rb") as f:
+        is_index = f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    if is_index:
+        with LibraryIndex(spotify_playlist_file) as index:
+            index.check_version()
+        return spotify_playlist_file
+
+    filename = index_filename(spotify_playlist_file)
+    if not os.path.exists(filename):
+        return None
+    with LibraryIndex(filename) as index:
+        if index.meta.get("version") == INDEX_VERSION and index.meta.get(
+            "source_stamp"
+        ) == _source_stamp(spotify_playlist_file):
+            return filename
+    print(f"NOTE: {filename} is out of date, run s2yt_index to rebuild it")
+    return None
+
+
+def _track_columns(item: Any) -> Tuple[Any, ...]:
+    """
+    Return the (title, artist, album, duration_ms, raw) columns of a playlist
+    track item.
+    """
+    try:
+        track = item["track"]
+        return (
+            track["name"],
+            track["artists"][0]["name"],
+            track["album"]["name"],
+            track.get("duration_ms"),
+            None,
+        )
+    except (TypeError, KeyError, IndexError):
+        # Kept verbatim so that reading it reports the problem like the JSON does
+        return None, None, None, None, json.dumps(item)
+
+
+def build_index(
+    spotify_playlist_file: str = "playlists.json",
+    index_file: Optional[str] = None,
+    encoding: str = "utf-8",
+) -> str:
+    """
+    Convert a playlists.json backup into an indexed SQLite file.
+
+    The backup is streamed, so converting it needs little memory.
+
+    Args:
+        spotify_playlist_file: Path to playlists backup file
+        index_file: Path of the index to write (default: next to the backup)
+        encoding: Character encoding of the backup
+
+    Returns:
+        str: Path of the index written
+    """
+    if index_file is None:
+        index_file = index_filename(spotify_playlist_file)
+    tmp_file = index_file + ".tmp"
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    db = sqlite3.connect(tmp_file)
+    try:
+        db.executescript(SCHEMA)
+        with db, open(spotify_playlist_file, "r", encoding=encoding) as f:
+            reader = JSONStreamReader(f)
+            for key in reader.iter_object():
+                if key == "playlists":
+                    _index_playlists(db, reader)
+                elif key == "albums":
+                    _index_albums(db, reader)
+                else:
+                    reader.skip_value()
+            db.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("source", os.path.abspath(spotify_playlist_file)),
+                    ("source_stamp", _source_stamp(spotify_playlist_file)),
+                    ("version", INDEX_VERSION),
+                ],
+            )
+    finally:
+        db.close()
+    os.replace(tmp_file, index_file)
+    return index_file
+
+
+def _index_playlists(db: sqlite3.Connection, reader: JSONStreamReader) -> None:
+    for position in reader.iter_array():
+        columns: Dict[str, Any] = {"id": None, "name": None}
+        track_count = 0
+        for key in reader.iter_object():
+            if key == "tracks":
+                for track_count, _ in enumerate(reader.iter_array(), 1):
+                    db.execute(
+                        "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            position,
+                            track_count - 1,
+                            *_track_columns(reader.read_value()),
+                        ),
+                    )
+            elif key in columns:
+                columns[key] = reader.read_value()
+            else:
+                reader.skip_value()
+        db.execute(
+            "INSERT INTO playlists VALUES (?, ?, ?, ?)",
+            (position, columns["id"], columns["name"], track_count),
+        )
+
+
+def _index_albums(db: sqlite3.Connection, reader: JSONStreamReader) -> None:
+    for position in reader.iter_array():
+        added_at = None
+        for key in reader.iter_object():
+            if key == "added_at":
+                added_at = reader.read_value()
+            elif key == "album":
+                album = reader.read_value()
+                db.execute(
+                    "INSERT INTO albums VALUES (?, ?, ?)",
+                    (position, album["name"], added_at),
+                )
+                db.executemany(
+                    "INSERT INTO album_tracks VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            position,
+                            i,
+                            track["name"],
+                            track["artists"][0]["name"],
+                            track.get("duration_ms"),
+                        )
+                        for i, track in enumerate(album["tracks"]["items"])
+                    ],
+                )
+            else:
+                reader.skip_value()
+
+
+class LibraryIndex:
+    """
+    Read access to an index written by `build_index`.
+
+    Args:
+        filename: Path of the index file
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._db = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+        self.meta = dict(self._db.execute("SELECT key, value FROM meta"))
+
+    def check_version(self) -> None:
+        """Raise ValueError if the index was built by an older version."""
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"{self.filename} was built by an older version, run s2yt_index "
+                "to rebuild it"
+            )
+
+    def __enter__(self) -> "LibraryIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def playlists(self) -> List[Dict[str, Any]]:
+        """Return id, name and track_count of every playlist, in backup order."""
+        return [
+            {"id": pl_id, "name": name, "track_count": track_count}
+            for pl_id, name, track_count in self._db.execute(
+                "SELECT id, name, track_count FROM playlists ORDER BY position"
+            )
+        ]
+
+    def find_playlist(self, src_pl_id: Optional[str]) -> Optional[Tuple[int, str]]:
+        """
+        Return (position, name) of a playlist by ID, or Liked Songs if None.
+        """
+        if src_pl_id is None:
+            query = "SELECT position, name FROM playlists WHERE name = 'Liked Songs'"
+            params: Tuple[Any, ...] = ()
+        else:
+            query = "SELECT position, name FROM playlists WHERE id = ?"
+            params = (src_pl_id,)
+        return self._db.execute(query + " ORDER BY position LIMIT 1", params).fetchone()
+
+    def playlist_tracks(
+        self, position: int, reverse: bool = False
+    ) -> Iterator[Tuple[Any, ...]]:
+        """Yield (title, artist, album, duration_ms, raw) of a playlist's tracks."""
+        return self._db.execute(
+            "SELECT title, artist, album, duration_ms, raw FROM tracks"
+            " WHERE playlist = ?"
+            f" ORDER BY position {'DESC' if reverse else 'ASC'}",
+            (position,),
+        )
+
+    def liked_album_tracks(self) -> Iterator[Tuple[str, str, str, Optional[int]]]:
+        """Yield (title, artist, album, duration_ms) of all liked album tracks."""
+        return self._db.execute(
+            "SELECT t.title, t.artist, a.name, t.duration_ms FROM albums a"
+            " JOIN album_tracks t ON t.album = a.position"
+            " ORDER BY a.position, t.position"
+        )
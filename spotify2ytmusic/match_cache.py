@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+"""
+Persistent on-disk cache of Spotify -> YTMusic song matches.
+
+Matches are stored in a SQLite file keyed by the normalized
+(title, artist, album, algo) of the Spotify track, so that re-running a
+migration only has to search YTMusic for tracks it has never resolved before.
+The file uses SQLite's WAL journal, which makes it safe to share between
+several s2yt processes on the same host.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    algo INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    track TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (title, artist, album, algo)
+);
+CREATE INDEX IF NOT EXISTS matches_accessed ON matches (accessed);
+"""
+
+
+def normalize(value: Optional[str]) -> str:
+    """Normalize a title/artist/album string for use in a cache key."""
+    value = unicodedata.normalize("NFKC", value or "")
+    return " ".join(value.casefold().split())
+
+
+def song_key(title: str, artist: str, album: str) -> Tuple[str, str, str]:
+    """Return the normalized (title, artist, album) key of a song."""
+    return normalize(title), normalize(artist), normalize(album)
+
+
+class MatchCache:
+    """
+    SQLite backed cache of resolved YTMusic tracks.
+
+    Args:
+        filename: Path of the SQLite cache file (created if missing)
+        ttl: Seconds after which a cached match is considered stale (None = never)
+        max_entries: Maximum number of matches kept, least recently used are evicted
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        filename: str = "s2yt_match_cache.sqlite",
+        ttl: Optional[float] = 30 * 24 * 3600,
+        max_entries: Optional[int] = 100_000,
+    ) -> None:
+        self.filename = filename
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> "MatchCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Evict excess entries and close the database."""
+        with self._lock:
+            with self._db:
+                self._evict()
+            self._db.close()
+
+    def get(
+        self, title: str, artist: str, album: str, algo: int
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached YTMusic track for a song, or None on a miss."""
+        return self._get(title, artist, album, algo, count=True)
+
+    def peek(
+        self, title: str, artist: str, album: str, algo: int
+    ) -> Optional[Dict[str, Any]]:
+        """Like `get`, but without counting a hit or miss in the statistics."""
+        return self._get(title, artist, album, algo, count=False)
+
+    def _get(
+        self, title: str, artist: str, album: str, algo: int, count: bool
+    ) -> Optional[Dict[str, Any]]:
+        key = (*song_key(title, artist, album), algo)
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT track, created FROM matches"
+                " WHERE title = ? AND artist = ? AND album = ? AND algo = ?",
+                key,
+            ).fetchone()
+            if row is not None and self.ttl is not None and row[1] < now - self.ttl:
+                self._db.execute(
+                    "DELETE FROM matches"
+                    " WHERE title = ? AND artist = ? AND album = ? AND algo = ?",
+                    key,
+                )
+                row = None
+            if row is None:
+                self.misses += count
+                return None
+            self._db.execute(
+                "UPDATE matches SET accessed = ?"
+                " WHERE title = ? AND artist = ? AND album = ? AND algo = ?",
+                (now, *key),
+            )
+        self.hits += count
+        return json.loads(row[0])
+
+    def put(
+        self, title: str, artist: str, album: str, algo: int, track: Dict[str, Any]
+    ) -> None:
+        """Store the YTMusic track a song was resolved to."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *song_key(title, artist, album),
+                    algo,
+                    track["videoId"],
+                    json.dumps(track),
+                    now,
+                    now,
+                ),
+            )
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def purge(self) -> int:
+        """Remove expired and excess entries, returning how many were removed."""
+        with self._lock, self._db:
+            return self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit/miss counters for this session."""
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM matches").fetchone()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def export_json(self, filename: str) -> int:
+        """Write all cached matches to a JSON file, returning the number written."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT title, artist, album, algo, track, created FROM matches"
+            ).fetchall()
+        entries = [
+            {
+                "title": title,
+                "artist": artist,
+                "album": album,
+                "algo": algo,
+                "track": json.loads(track),
+                "created": created,
+            }
+            for title, artist, album, algo, track, created in rows
+        ]
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"matches": entries}, f, ensure_ascii=False)
+        return len(entries)
+
+    def import_json(self, filename: str) -> int:
+        """
+        Merge matches from a JSON file written by `export_json`.
+
+        Existing entries are only replaced by newer ones.
+
+        Returns:
+            int: Number of entries imported
+        """
+        with open(filename, "r", encoding="utf-8") as f:
+            entries = json.load(f)["matches"]
+
+        now = time.time()
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (title, artist, album, algo) DO UPDATE SET"
+                " video_id = excluded.video_id, track = excluded.track,"
+                " created = excluded.created"
+                " WHERE excluded.created > matches.created",
+                [
+                    (
+                        *song_key(e["title"], e["artist"], e["album"]),
+                        e["algo"],
+                        e["track"]["videoId"],
+                        json.dumps(e["track"]),
+                        e.get("created", now),
+                        now,
+                    )
+                    for e in entries
+                ],
+            )
+            imported = self._db.total_changes - before
+            self._evict()
+        return imported
+
+    def _evict(self) -> int:
+        """Drop expired entries, then least recently used ones above max_entries."""
+        removed = 0
+        if self.ttl is not None:
+            removed += self._db.execute(
+                "DELETE FROM matches WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if self.max_entries is not None:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM matches").fetchone()
+            if entries > self.max_entries:
+                removed += self._db.execute(
+                    "DELETE FROM matches WHERE rowid IN"
+                    " (SELECT rowid FROM matches ORDER BY accessed LIMIT ?)",
+                    (entries - self.max_entries,),
+                ).rowcount
+        return removed
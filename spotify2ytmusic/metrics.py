@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+
+"""
+Per-endpoint metrics of the YTMusic and Spotify API calls of a run.
+
+`Metrics.wrap` returns a YTMusic client whose calls are timed, and
+`spotify_backup.SpotifyAPI` times its requests into a `Metrics` it is
+given.  Every endpoint ("ytmusic.search", "spotify.playlists/{id}/tracks")
+gets:
+
+- its number of calls, and of errors by class ("HTTP 429", "ValueError")
+- the retries its callers made after errors
+- a histogram of its latencies, in fixed buckets as Prometheus has them
+
+along with the hit rates of the caches registered with `track_cache`.
+`summary` formats them for the end of a run, `write_json` saves them and
+`serve` exposes them in the Prometheus text format while the run goes on.
+
+Only the standard library is used, so that spotify_backup.py can use this
+module when it is run as a script.
+"""
+
+import bisect
+import contextlib
+import http.server
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# YTMusic calls worth timing, see ratelimit.READ_CALLS and WRITE_CALLS
+YTMUSIC_CALLS = {
+    "search",
+    "get_album",
+    "get_playlist",
+    "get_liked_songs",
+    "get_library_playlists",
+    "get_search_suggestions",
+    "add_playlist_items",
+    "rate_song",
+    "create_playlist",
+}
+
+_HTTP_STATUS = re.compile(r"\bHTTP (\d{3})\b")
+
+
+def error_class(error: BaseException) -> str:
+    """
+    Classify an API error: "HTTP <status>" if it has an HTTP status (as an
+    attribute, or in the message as ytmusicapi reports it), else the name of
+    its type, or of its cause's type for errors wrapping another one.
+    """
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return f"HTTP {status}"
+    match = _HTTP_STATUS.search(str(error))
+    if match:
+        return f"HTTP {match.group(1)}"
+    if error.__cause__ is not None:
+        return type(error.__cause__).__name__
+    return type(error).__name__
+
+
+class Histogram:
+    """Counts of observed latencies, by bucket upper bound in seconds."""
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        # The last count is of the latencies above every bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in
+        (at most the largest latency observed).
+        """
+        if not self.count:
+            return None
+        rank = max(1.0, q * self.count)
+        seen = 0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, count of latencies up to it), ending with +Inf."""
+        result = []
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+
+class _Endpoint:
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.retries = 0
+        self.latency = Histogram(bounds)
+
+
+class Metrics:
+    """
+    Thread-safe registry of API call metrics, by endpoint.
+
+    Args:
+        buckets: Upper bounds of the latency histogram buckets, in seconds
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self._caches: Dict[str, List[Any]] = {}
+
+    def _endpoint(self, endpoint: str) -> _Endpoint:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _Endpoint(self.buckets)
+        return stats
+
+    def observe(
+        self, endpoint: str, seconds: float, error: Optional[BaseException] = None
+    ) -> None:
+        """Record a call of `endpoint` that took `seconds`, and its error if any."""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.calls += 1
+            stats.latency.observe(seconds)
+            if error is not None:
+                name = error_class(error)
+                stats.errors[name] = stats.errors.get(name, 0) + 1
+
+    def retry(self, endpoint: str) -> None:
+        """Record that a failed call of `endpoint` is being retried."""
+        with self._lock:
+            self._endpoint(endpoint).retries += 1
+
+    @contextlib.contextmanager
+    def timed(self, endpoint: str) -> Iterator[None]:
+        """Context manager recording the block as a call of `endpoint`."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.observe(endpoint, time.perf_counter() - start, e)
+            raise
+        self.observe(endpoint, time.perf_counter() - start)
+
+    def track_cache(self, name: str, cache: Any) -> None:
+        """
+        Report the hit rate of `cache` (anything counting `hits` and `misses`)
+        under `name`, summed with the other caches registered under it.
+        """
+        with self._lock:
+            caches = self._caches.setdefault(name, [])
+            if not any(c is cache for c in caches):
+                caches.append(cache)
+
+    def wrap(self, yt: Any, prefix: str = "ytmusic") -> Any:
+        """Return `yt` with its calls timed (idempotent, see `instrumented`)."""
+        if instrumented(yt) is self:
+            return yt
+        return InstrumentedYTMusic(yt, self, prefix)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the metrics so far, as JSON serializable data."""
+        with self._lock:
+            endpoints = {
+                name: {
+                    "calls": stats.calls,
+                    "errors": dict(stats.errors),
+                    "retries": stats.retries,
+                    "seconds": stats.latency.sum,
+                    "max_seconds": stats.latency.max,
+                    "p50_seconds": stats.latency.quantile(0.5),
+                    "p99_seconds": stats.latency.quantile(0.99),
+                    "buckets": {
+                        "+Inf" if bound == float("inf") else str(bound): count
+                        for bound, count in stats.latency.cumulative()
+                    },
+                }
+                for name, stats in sorted(self._endpoints.items())
+            }
+            caches = {}
+            for name, registered in sorted(self._caches.items()):
+                hits = sum(cache.hits for cache in registered)
+                misses = sum(cache.misses for cache in registered)
+                lookups = hits + misses
+                caches[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / lookups if lookups else None,
+                }
+        return {
+            "elapsed_seconds": time.monotonic() - self.started,
+            "endpoints": endpoints,
+            "caches": caches,
+        }
+
+    def summary(self) -> str:
+        """Return a table of the metrics, endpoints taking the most time first."""
+        data = self.snapshot()
+        lines = [
+            f"{'endpoint':<40} {'calls':>7} {'errors':>6} {'retries':>7}"
+            f" {'p50 ms':>7} {'p99 ms':>7} {'total s':>8}"
+        ]
+        endpoints = sorted(
+            data["endpoints"].items(), key=lambda item: -item[1]["seconds"]
+        )
+        for name, stats in endpoints:
+            lines.append(
+                f"{name:<40} {stats['calls']:>7} {sum(stats['errors'].values()):>6}"
+                f" {stats['retries']:>7} {1000 * (stats['p50_seconds'] or 0):>7.0f}"
+                f" {1000 * (stats['p99_seconds'] or 0):>7.0f}"
+                f" {stats['seconds']:>8.1f}"
+            )
+            if stats["errors"]:
+                errors = ", ".join(
+                    f"{error} x{count}"
+                    for error, count in sorted(stats["errors"].items())
+                )
+                lines.append(f"    errors: {errors}")
+        for name, stats in data["caches"].items():
+            rate = stats["hit_rate"]
+            lines.append(
+                f"{name + ' cache':<40} {stats['hits']} hits, {stats['misses']} misses"
+                + (f" ({100 * rate:.0f}% hit rate)" if rate is not None else "")
+            )
+        lines.append(f"Run time: {data['elapsed_seconds']:.1f}s")
+        return "\n".join(lines)
+
+    def write_json(self, filename: str) -> None:
+        """Write `snapshot` to a JSON file (atomically)."""
+        tmp_file = filename + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+            f.write("\n")
+        os.replace(tmp_file, filename)
+
+    def prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            caches = sorted(
+                (
+                    name,
+                    sum(cache.hits for cache in registered),
+                    sum(cache.misses for cache in registered),
+                )
+                for name, registered in self._caches.items()
+            )
+            lines = [
+                "# HELP s2yt_api_calls_total API calls made, by endpoint",
+                "# TYPE s2yt_api_calls_total counter",
+            ]
+            lines += [
+                f's2yt_api_calls_total{{endpoint="{name}"}} {stats.calls}'
+                for name, stats in endpoints
+            ]
+            lines += [
+                "# HELP s2yt_api_errors_total Failed API calls, by endpoint and error",
+                "# TYPE s2yt_api_errors_total counter",
+            ]
+            lines += [
+                f's2yt_api_errors_total{{endpoint="{name}",error="{error}"}} {count}'
+                for name, stats in endpoints
+                for error, count in sorted(stats.errors.items())
+            ]
+            lines += [
+                "# HELP s2yt_api_retries_total API calls retried after an error",
+                "# TYPE s2yt_api_retries_total counter",
+            ]
+            lines += [
+                f's2yt_api_retries_total{{endpoint="{name}"}} {stats.retries}'
+                for name, stats in endpoints
+            ]
+            lines += [
+                "# HELP s2yt_api_latency_seconds Latency of API calls",
+                "# TYPE s2yt_api_latency_seconds histogram",
+            ]
+            for name, stats in endpoints:
+                for bound, count in stats.latency.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f's2yt_api_latency_seconds_bucket{{endpoint="{name}",'
+                        f'le="{le}"}} {count}'
+                    )
+                lines.append(
+                    f's2yt_api_latency_seconds_sum{{endpoint="{name}"}}'
+                    f" {stats.latency.sum}"
+                )
+                lines.append(
+                    f's2yt_api_latency_seconds_count{{endpoint="{name}"}}'
+                    f" {stats.latency.count}"
+                )
+        lines += [
+            "# HELP s2yt_cache_hits_total Cache lookups answered from the cache",
+            "# TYPE s2yt_cache_hits_total counter",
+        ]
+        lines += [f's2yt_cache_hits_total{{cache="{n}"}} {h}' for n, h, _ in caches]
+        lines += [
+            "# HELP s2yt_cache_misses_total Cache lookups not in the cache",
+            "# TYPE s2yt_cache_misses_total counter",
+        ]
+        lines += [f's2yt_cache_misses_total{{cache="{n}"}} {m}' for n, _, m in caches]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> http.server.HTTPServer:
+        """
+        Serve `prometheus` at http://host:port/metrics on a daemon thread.
+
+        Returns:
+            HTTPServer: The server, to `shutdown()` when done
+        """
+        metrics = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class InstrumentedYTMusic:
+    """Proxy for a YTMusic client that records every API call in `metrics`."""
+
+    def __init__(self, yt: Any, metrics: Metrics, prefix: str = "ytmusic") -> None:
+        self.yt = yt
+        self.metrics = metrics
+        self.prefix = prefix
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.yt, name)
+        if name not in YTMUSIC_CALLS:
+            return attr
+        endpoint = f"{self.prefix}.{name}"
+
+        def _timed(*args: Any, **kwargs: Any) -> Any:
+            with self.metrics.timed(endpoint):
+                return attr(*args, **kwargs)
+
+        return _timed
+
+
+def _proxy(yt: Any) -> Optional[InstrumentedYTMusic]:
+    """Find the `InstrumentedYTMusic` behind proxies that keep their client in `yt`."""
+    while yt is not None:
+        if isinstance(yt, InstrumentedYTMusic):
+            return yt
+        yt = vars(yt).get("yt") if hasattr(yt, "__dict__") else None
+    return None
+
+
+def instrumented(yt: Any) -> Optional[Metrics]:
+    """
+    Return the `Metrics` the calls of `yt` are recorded in, looking through
+    other proxies such as `ratelimit.RateLimitedYTMusic`.
+    """
+    proxy = _proxy(yt)
+    return proxy.metrics if proxy is not None else None
+
+
+def count_retry(yt: Any, call: str) -> None:
+    """Record a retry of the YTMusic `call` if the calls of `yt` are instrumented."""
+    proxy = _proxy(yt)
+    if proxy is not None:
+        proxy.metrics.retry(f"{proxy.prefix}.{call}")
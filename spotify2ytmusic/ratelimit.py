@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+Token-bucket rate limiting of YTMusic calls, shared between processes.
+
+Read calls (searches, album and playlist fetches) and write calls (playlist
+edits, ratings, playlist creation) draw from separate buckets.  The bucket
+state lives in a small lock-protected file, by default in the cache
+directory of the user, so every s2yt process of a user that uses the same
+file stays within one budget.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .spotify_backup import default_cache_dir
+
+READ_CALLS = {
+    "search",
+    "get_album",
+    "get_playlist",
+    "get_liked_songs",
+    "get_library_playlists",
+    "get_search_suggestions",
+}
+WRITE_CALLS = {"add_playlist_items", "rate_song", "create_playlist"}
+
+DEFAULT_STATE_FILE = os.path.join(default_cache_dir(), "ratelimit.json")
+
+
+class RateLimiter:
+    """
+    Separate read and write token buckets with state shared through a file.
+
+    Args:
+        reads_per_second: Sustained rate of read calls (None = unlimited)
+        writes_per_second: Sustained rate of write calls (None = unlimited)
+        burst: Seconds worth of calls that may be made back to back
+        state_file: File holding the shared bucket state
+    """
+
+    def __init__(
+        self,
+        reads_per_second: Optional[float] = None,
+        writes_per_second: Optional[float] = None,
+        burst: float = 1.0,
+        state_file: str = DEFAULT_STATE_FILE,
+    ) -> None:
+        self.rates = {"read": reads_per_second, "write": writes_per_second}
+        self.burst = burst
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+
+    def acquire(self, kind: str) -> float:
+        """
+        Block until a token of the given kind ("read" or "write") is available.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        rate = self.rates[kind]
+        if not rate:
+            return 0.0
+
+        capacity = max(1.0, rate * self.burst)
+        waited = 0.0
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                tokens, last = state.get(kind, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+                if tokens >= 1.0:
+                    state[kind] = (tokens - 1.0, now)
+                    return waited
+                state[kind] = (tokens, now)
+                wait = (1.0 - tokens) / rate
+            time.sleep(wait)
+            waited += wait
+
+    def wrap(self, yt: Any) -> Any:
+        """Return `yt` with its calls rate limited (idempotent)."""
+        if isinstance(yt, RateLimitedYTMusic) and yt.rate_limiter is self:
+            return yt
+        return RateLimitedYTMusic(yt, self)
+
+    def _locked_state(self) -> "_LockedState":
+        return _LockedState(self.state_file, self._lock)
+
+
+class _LockedState:
+    """Context manager holding the state file lock, yielding the bucket state."""
+
+    def __init__(self, filename: str, thread_lock: threading.Lock) -> None:
+        self.filename = filename
+        self.thread_lock = thread_lock
+        self.state: Dict[str, Any] = {}
+
+    def __enter__(self) -> Dict[str, Any]:
+        # File locks exclude other processes, the thread lock other threads
+        self.thread_lock.acquire()
+        try:
+            self.f = open(self.filename, "a+", encoding="utf-8")
+            if fcntl is not None:
+                fcntl.flock(self.f, fcntl.LOCK_EX)
+            else:
+                self.f.seek(0)
+                msvcrt.locking(self.f.fileno(), msvcrt.LK_LOCK, 1)
+            self.f.seek(0)
+            try:
+                self.state = json.loads(self.f.read() or "{}")
+            except json.JSONDecodeError:
+                self.state = {}
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return self.state
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        try:
+            if exc_type is None:
+                self.f.seek(0)
+                self.f.truncate()
+                self.f.write(json.dumps(self.state))
+                self.f.flush()
+            if fcntl is None:
+                self.f.seek(0)
+                msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
+            self.f.close()
+        finally:
+            self.thread_lock.release()
+
+
+class RateLimitedYTMusic:
+    """Proxy for a YTMusic client that takes a rate limiter token per call."""
+
+    def __init__(self, yt: Any, rate_limiter: RateLimiter) -> None:
+        self.yt = yt
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.yt, name)
+        if name in READ_CALLS:
+            kind = "read"
+        elif name in WRITE_CALLS:
+            kind = "write"
+        else:
+            return attr
+
+        def _limited(*args: Any, **kwargs: Any) -> Any:
+            self.rate_limiter.acquire(kind)
+            return attr(*args, **kwargs)
+
+        return _limited
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Record and replay YTMusic responses, for offline runs of the matcher.
+
+`RecordingYTMusic` wraps a real client and keeps every `search` and
+`get_album` response it returns; `save_fixture` writes them to a
+(gzip-compressed) JSON fixture.  `ReplayYTMusic` serves a fixture back
+without any network access and counts the calls made, so `lookup_song`
+can be benchmarked and regression-tested offline.
+
+A fixture is a JSON object:
+
+    {
+      "tracks": [{"title", "artist", "album", "duration_ms", "expected"}],
+      "responses": {
+        "search": {"<filter>:<query>": [result, ...]},
+        "get_album": {"<browseId>": album}
+      }
+    }
+
+"expected" is the videoId a track should resolve to (null if it isn't on
+YTMusic); tracks without it only count towards the performance figures.
+"""
+
+import collections
+import gzip
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+Fixture = Dict[str, Any]
+
+
+def search_key(query: str, filter: Optional[str]) -> str:
+    """Return the key of a search response in a fixture."""
+    return f"{filter or ''}:{query}"
+
+
+def load_fixture(filename: str) -> Fixture:
+    """Load a fixture, gzip-compressed if the name ends in ".gz"."""
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(fixture: Fixture, filename: str) -> None:
+    """Write a fixture, gzip-compressed if the name ends in ".gz"."""
+    if filename.endswith(".gz"):
+        # No name or mtime in the header keeps the file identical between
+        # runs with the same content, wherever it is written
+        with open(filename, "wb") as raw, gzip.GzipFile(
+            filename="", fileobj=raw, mode="wb", mtime=0
+        ) as f:
+            f.write(json.dumps(fixture, sort_keys=True).encode("utf-8"))
+    else:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, sort_keys=True)
+
+
+class RecordingYTMusic:
+    """
+    Pass calls through to a YTMusic client, recording search and album responses.
+
+    Args:
+        yt: The YTMusic client to record
+    """
+
+    def __init__(self, yt: Any) -> None:
+        self._yt = yt
+        self.responses: Dict[str, Dict[str, Any]] = {"search": {}, "get_album": {}}
+        self._lock = threading.Lock()
+
+    def search(self, query: str, filter: Optional[str] = None, **kwargs: Any) -> Any:
+        result = self._yt.search(query=query, filter=filter, **kwargs)
+        with self._lock:
+            self.responses["search"][search_key(query, filter)] = result
+        return result
+
+    def get_album(self, browseId: str) -> Any:
+        result = self._yt.get_album(browseId)
+        with self._lock:
+            self.responses["get_album"][browseId] = result
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._yt, name)
+
+    def fixture(self, tracks: List[Dict[str, Any]]) -> Fixture:
+        """Return a fixture of `tracks` and the responses recorded so far."""
+        return {"tracks": tracks, "responses": self.responses}
+
+
+class ReplayYTMusic:
+    """
+    YTMusic stand-in answering from the responses of a fixture.
+
+    Searches that weren't recorded return no results, and albums that
+    weren't recorded raise KeyError, as a failed call would.  `calls`
+    counts the calls made per method.
+
+    Args:
+        responses: The "responses" of a fixture
+    """
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]]) -> None:
+        self.responses = responses
+        self.calls: "collections.Counter[str]" = collections.Counter()
+        self.unrecorded: "collections.Counter[str]" = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, method: str, recorded: bool) -> None:
+        with self._lock:
+            self.calls[method] += 1
+            if not recorded:
+                self.unrecorded[method] += 1
+
+    def search(
+        self, query: str, filter: Optional[str] = None, **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        result = self.responses["search"].get(search_key(query, filter))
+        self._count("search", result is not None)
+        return list(result or [])
+
+    def get_album(self, browseId: str) -> Dict[str, Any]:
+        album = self.responses["get_album"].get(browseId)
+        self._count("get_album", album is not None)
+        if album is None:
+            raise KeyError(f"Album {browseId} was not recorded")
+        return album
+
+    def get_search_suggestions(self, query: str, **kwargs: Any) -> List[str]:
+        self._count("get_search_suggestions", True)
+        return []
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Ranking of YTMusic search results against a Spotify track.
+
+Every candidate of a search is scored on how well its title, artists,
+album and duration agree with the Spotify track, and the best one is
+returned along with that score as a confidence between 0 and 1.  Titles
+are compared as sets of normalized words (casefolded, accents and
+bracketed parts like "(Remastered)" removed), so word order, punctuation
+and decorations don't matter; normalization results are cached, since the
+same strings come back in search after search.
+"""
+
+import functools
+import re
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Weights of the parts of the score; parts that a candidate or the Spotify
+# track has no value for are left out, and the rest scaled up to 1
+TITLE_WEIGHT = 0.45
+ARTIST_WEIGHT = 0.30
+ALBUM_WEIGHT = 0.10
+DURATION_WEIGHT = 0.15
+
+# Durations closer than this many seconds agree fully, and the agreement
+# drops to nothing at DURATION_MAX_DIFF seconds
+DURATION_TOLERANCE = 3.0
+DURATION_MAX_DIFF = 30.0
+
+# Song matches at least this confident are taken without searching videos
+ACCEPT_CONFIDENCE = 0.75
+# Matches below this confidence count as not found
+MIN_CONFIDENCE = 0.5
+
+_BRACKETS = re.compile(r"[\[(].*?[\])]")
+_NON_WORD = re.compile(r"\W+")
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_title(value: str) -> str:
+    """Casefold, strip accents, bracketed parts and punctuation of a title."""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    value = _BRACKETS.sub(" ", value.casefold())
+    return " ".join(_NON_WORD.sub(" ", value).split())
+
+
+@functools.lru_cache(maxsize=65536)
+def tokens(value: Optional[str]) -> FrozenSet[str]:
+    """Return the set of normalized words of a title."""
+    return frozenset(normalize_title(value or "").split())
+
+
+@functools.lru_cache(maxsize=65536)
+def _title_variants(value: str) -> Tuple[FrozenSet[str], ...]:
+    # "Song - Remastered 2011" should match "Song" as well
+    variants = [tokens(value)]
+    head = value.split(" - ", 1)[0]
+    if head != value and tokens(head):
+        variants.append(tokens(head))
+    return tuple(variants)
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Return the Dice coefficient of two word sets, 0 if either is empty."""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def duration_agreement(duration_ms: float, duration_seconds: float) -> float:
+    """Return how well two durations agree, between 0 and 1."""
+    diff = abs(duration_ms / 1000 - duration_seconds)
+    if diff <= DURATION_TOLERANCE:
+        return 1.0
+    window = DURATION_MAX_DIFF - DURATION_TOLERANCE
+    return max(0.0, 1 - (diff - DURATION_TOLERANCE) / window)
+
+
+class TrackMatcher:
+    """
+    Scores YTMusic search results against one Spotify track.
+
+    Args:
+        title: Spotify track name
+        artist: Spotify artist name
+        album: Spotify album name
+        duration_ms: Spotify track duration, if known
+    """
+
+    def __init__(
+        self,
+        title: str,
+        artist: str,
+        album: Optional[str] = None,
+        duration_ms: Optional[int] = None,
+    ) -> None:
+        self.titles = _title_variants(title)
+        self.artist = tokens(artist)
+        self.album = tokens(album)
+        self.duration_ms = duration_ms
+
+    def score(self, candidate: Dict[str, Any]) -> float:
+        """Return the confidence that `candidate` is the Spotify track."""
+        artists = [tokens(a.get("name")) for a in candidate.get("artists") or []]
+        titles = _title_variants(candidate.get("title") or "")
+        if candidate.get("resultType") == "video":
+            # Video titles are usually "Artist - Title"
+            names = self.artist.union(*artists)
+            titles = tuple(t - names or t for t in titles)
+
+        total = TITLE_WEIGHT * max(
+            similarity(src, dst) for src in self.titles for dst in titles
+        )
+        weights = TITLE_WEIGHT
+        if artists:
+            total += ARTIST_WEIGHT * max(similarity(self.artist, a) for a in artists)
+        weights += ARTIST_WEIGHT  # A candidate without artists can't match them
+
+        album = candidate.get("album")
+        if self.album and album and album.get("name"):
+            total += ALBUM_WEIGHT * similarity(self.album, tokens(album["name"]))
+            weights += ALBUM_WEIGHT
+
+        duration_seconds = candidate.get("duration_seconds")
+        if self.duration_ms and duration_seconds:
+            total += DURATION_WEIGHT * duration_agreement(
+                self.duration_ms, duration_seconds
+            )
+            weights += DURATION_WEIGHT
+
+        return total / weights
+
+    def best(
+        self, candidates: Iterable[Dict[str, Any]]
+    ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Return the best scoring candidate and its confidence.
+
+        Ties go to the candidate YTMusic ranked first.
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], float]: The candidate (None if
+            there are none) and its confidence
+        """
+        best: Optional[Dict[str, Any]] = None
+        best_score = 0.0
+        for candidate in candidates:
+            score = self.score(candidate)
+            if best is None or score > best_score:
+                best, best_score = candidate, score
+        return best, best_score
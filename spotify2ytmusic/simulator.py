@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the YTMusic service, for load and fault testing.
+
+`YTMusicSimulator` implements the subset of the YTMusic client that
+`backend` uses, against an in-memory catalog and library, so copies can be
+run at realistic scale without any network access:
+
+    yt = YTMusicSimulator(
+        catalog=backend.iter_spotify_playlist(...),
+        latency={"search": lognormal(0.25, 1.0), "default": uniform(0.05, 0.2)},
+        errors={"add_playlist_items": {503: 0.02}, "default": {429: 0.01}},
+        quotas={"read": 20, "write": 5},
+    )
+    backend.copier(tracks, yt.create_playlist("Test", ""), yt=yt)
+
+Every call first waits for its latency, drawn from the distribution
+configured for the method (or "default").  It then fails with
+`YTMusicServerError` as often as configured, or with HTTP 429 if its
+kind of call ("read" or "write", see `ratelimit`) already used up its
+quota of the last second.  `calls`, `failures` and `latencies` record
+what happened, per method.
+
+Songs of the catalog are found by the queries `lookup_song` makes
+("<title> by <artist>", "<album> by <artist>"), compared casefolded.
+"""
+
+import collections
+import math
+import random
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from ytmusicapi.exceptions import YTMusicServerError
+
+from .ratelimit import READ_CALLS
+
+# A latency distribution: draws a delay in seconds from a random generator
+Latency = Callable[[random.Random], float]
+
+HTTP_REASONS = {
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+def constant(seconds: float) -> Latency:
+    """Latency of always `seconds`."""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    """Latency uniformly distributed between `low` and `high` seconds."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, p99: float) -> Latency:
+    """Log-normal latency with the given median and 99th percentile."""
+    sigma = math.log(p99 / median) / 2.326
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def _key(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+class YTMusicSimulator:
+    """
+    In-memory YTMusic service with latency, fault injection and quotas.
+
+    Args:
+        catalog: Songs available for search, as SongInfo-like tuples
+            (title, artist, album[, duration_ms])
+        latency: Latency distribution per method name, "default" for others
+        errors: Per method name (or "default"), the probability of each HTTP
+            error status, e.g. {"search": {429: 0.01, 503: 0.005}}
+        quotas: Calls per second allowed per kind of call ("read", "write"),
+            calls over quota fail with HTTP 429
+        time_scale: Factor applied to every latency, e.g. 0.01 to run a
+            realistic latency profile 100 times faster
+        seed: Seed of the latency and fault draws
+        sleep: Function used to wait (time.sleep)
+    """
+
+    def __init__(
+        self,
+        catalog: Iterable[Tuple[Any, ...]] = (),
+        *,
+        latency: Optional[Mapping[str, Latency]] = None,
+        errors: Optional[Mapping[str, Mapping[int, float]]] = None,
+        quotas: Optional[Mapping[str, float]] = None,
+        time_scale: float = 1.0,
+        seed: Optional[int] = 0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.latency = dict(latency or {})
+        self.errors = dict(errors or {})
+        self.quotas = dict(quotas or {})
+        self.time_scale = time_scale
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Deque[float]] = collections.defaultdict(
+            collections.deque
+        )
+
+        self.calls: "collections.Counter[str]" = collections.Counter()
+        self.failures: "collections.Counter[Tuple[str, int]]" = collections.Counter()
+        self.latencies: Dict[str, List[float]] = collections.defaultdict(list)
+
+        self.songs: Dict[str, Dict[str, Any]] = {}
+        self.albums: Dict[str, Dict[str, Any]] = {}
+        self._song_queries: Dict[str, List[str]] = collections.defaultdict(list)
+        self._album_queries: Dict[str, List[str]] = collections.defaultdict(list)
+        for song in catalog:
+            self.add_song(*song)
+
+        self.playlists: Dict[str, Dict[str, Any]] = {}
+        self.liked: List[str] = []
+
+    def add_song(
+        self, title: str, artist: str, album: str, duration_ms: Optional[int] = None
+    ) -> str:
+        """Add a song (and its album) to the catalog, returning its videoId."""
+        with self._lock:
+            album_key = _key(f"{album} by {artist}")
+            if album_key not in self._album_queries:
+                browse_id = f"MPREb_sim{len(self.albums):06d}"
+                self.albums[browse_id] = {
+                    "browseId": browse_id,
+                    "title": album,
+                    "artists": [{"name": artist, "id": None}],
+                    "tracks": [],
+                }
+                self._album_queries[album_key].append(browse_id)
+            browse_id = self._album_queries[album_key][0]
+
+            video_id = f"sim{len(self.songs):08d}"
+            seconds = (duration_ms or 200_000) // 1000
+            song = {
+                "resultType": "song",
+                "videoId": video_id,
+                "title": title,
+                "artists": [{"name": artist, "id": None}],
+                "album": {"name": album, "id": browse_id},
+                "duration": f"{seconds // 60}:{seconds % 60:02d}",
+                "duration_seconds": seconds,
+            }
+            self.songs[video_id] = song
+            self.albums[browse_id]["tracks"].append(song)
+            self._song_queries[_key(f"{title} by {artist}")].append(video_id)
+            return video_id
+
+    def _call(self, method: str) -> None:
+        """Account for a call: wait for its latency, then maybe fail it."""
+        kind = "read" if method in READ_CALLS else "write"
+        with self._lock:
+            self.calls[method] += 1
+            latency = self.latency.get(method, self.latency.get("default"))
+            delay = latency(self._rng) if latency else 0.0
+            errors = self.errors.get(method, self.errors.get("default", {}))
+            draw = self._rng.random()
+
+        delay *= self.time_scale
+        if delay > 0:
+            self._sleep(delay)
+
+        status = None
+        with self._lock:
+            self.latencies[method].append(delay)
+            quota = self.quotas.get(kind)
+            if quota is not None:
+                now = time.monotonic()
+                window = self._windows[kind]
+                while window and window[0] <= now - 1.0:
+                    window.popleft()
+                if len(window) >= quota:
+                    status = 429
+                else:
+                    window.append(now)
+            if status is None:
+                for error_status, probability in errors.items():
+                    draw -= probability
+                    if draw < 0:
+                        status = error_status
+                        break
+            if status is not None:
+                self.failures[(method, status)] += 1
+
+        if status is not None:
+            reason = HTTP_REASONS.get(status, "Error")
+            raise YTMusicServerError(
+                f"Server returned HTTP {status}: {reason}.\n"
+                f"Simulated failure of {method}"
+            )
+
+    # Read calls
+
+    def search(
+        self, query: str, filter: Optional[str] = None, limit: int = 20, **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        self._call("search")
+        with self._lock:
+            if filter == "albums":
+                return [
+                    {
+                        "resultType": "album",
+                        "browseId": browse_id,
+                        "title": self.albums[browse_id]["title"],
+                        "artists": self.albums[browse_id]["artists"],
+                    }
+                    for browse_id in self._album_queries.get(_key(query), [])
+                ][:limit]
+            if filter in (None, "songs"):
+                return [
+                    dict(self.songs[video_id])
+                    for video_id in self._song_queries.get(_key(query), [])
+                ][:limit]
+            return []
+
+    def get_search_suggestions(self, query: str, **kwargs: Any) -> List[str]:
+        self._call("get_search_suggestions")
+        return []
+
+    def get_album(self, browseId: str) -> Dict[str, Any]:
+        self._call("get_album")
+        with self._lock:
+            album = self.albums.get(browseId)
+            if album is None:
+                raise YTMusicServerError(
+                    "Server returned HTTP 404: Not Found.\n" f"No album {browseId}"
+                )
+            return dict(album, tracks=[dict(t) for t in album["tracks"]])
+
+    def get_playlist(
+        self, playlistId: str, limit: Optional[int] = 100, **kwargs: Any
+    ) -> Dict[str, Any]:
+        self._call("get_playlist")
+        with self._lock:
+            playlist = self.playlists.get(playlistId)
+            if playlist is None:
+                raise YTMusicServerError(
+                    "Server returned HTTP 404: Not Found.\n" f"No playlist {playlistId}"
+                )
+            video_ids = playlist["tracks"]
+            if limit is not None:
+                video_ids = video_ids[:limit]
+            return {
+                "id": playlistId,
+                "title": playlist["title"],
+                "description": playlist["description"],
+                "privacy": playlist["privacy"],
+                "trackCount": len(playlist["tracks"]),
+                "tracks": [self._track(video_id) for video_id in video_ids],
+            }
+
+    def get_liked_songs(self, limit: Optional[int] = 100) -> Dict[str, Any]:
+        self._call("get_liked_songs")
+        with self._lock:
+            video_ids = self.liked[::-1]
+            if limit is not None:
+                video_ids = video_ids[:limit]
+            return {
+                "id": "LM",
+                "title": "Liked Music",
+                "trackCount": len(self.liked),
+                "tracks": [self._track(video_id) for video_id in video_ids],
+            }
+
+    def get_library_playlists(self, limit: Optional[int] = 25) -> List[Dict[str, Any]]:
+        self._call("get_library_playlists")
+        with self._lock:
+            playlists = [
+                {
+                    "playlistId": playlist_id,
+                    "title": playlist["title"],
+                    "count": len(playlist["tracks"]),
+                }
+                for playlist_id, playlist in self.playlists.items()
+            ]
+        return playlists if limit is None else playlists[:limit]
+
+    def _track(self, video_id: str) -> Dict[str, Any]:
+        song = self.songs.get(video_id)
+        if song is None:
+            return {"videoId": video_id, "title": video_id, "artists": []}
+        return dict(song)
+
+    # Write calls
+
+    def create_playlist(
+        self,
+        title: str,
+        description: str,
+        privacy_status: str = "PRIVATE",
+        video_ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> str:
+        self._call("create_playlist")
+        with self._lock:
+            playlist_id = f"PLsim{len(self.playlists):06d}"
+            self.playlists[playlist_id] = {
+                "title": title,
+                "description": description,
+                "privacy": privacy_status,
+                "tracks": list(video_ids or []),
+            }
+            return playlist_id
+
+    def add_playlist_items(
+        self,
+        playlistId: str,
+        videoIds: Optional[List[str]] = None,
+        source_playlist: Optional[str] = None,
+        duplicates: bool = False,
+    ) -> Dict[str, Any]:
+        self._call("add_playlist_items")
+        with self._lock:
+            playlist = self.playlists.get(playlistId)
+            if playlist is None:
+                raise YTMusicServerError(
+                    "Server returned HTTP 404: Not Found.\n" f"No playlist {playlistId}"
+                )
+            video_ids = list(videoIds or [])
+            if not duplicates and (
+                len(set(video_ids)) < len(video_ids)
+                or set(video_ids) & set(playlist["tracks"])
+            ):
+                # Like YTMusic, one duplicate rejects the whole request
+                return {"status": "STATUS_FAILED", "actions": []}
+            playlist["tracks"].extend(video_ids)
+            return {
+                "status": "STATUS_SUCCEEDED",
+                "playlistEditResults": [{"videoId": v} for v in video_ids],
+            }
+
+    def rate_song(self, videoId: str, rating: str = "INDIFFERENT") -> Dict[str, Any]:
+        self._call("rate_song")
+        with self._lock:
+            if videoId in self.liked:
+                self.liked.remove(videoId)
+            if rating == "LIKE":
+                self.liked.append(videoId)
+            return {}
@@ -4,50 +4,512 @@
 #  This file originates from https://github.com/caseychu/spotify-backup
 
 import codecs
+import collections
+import contextlib
+import email.utils
+import gzip
+import hashlib
 import http.client
 import http.server
 import json
+import os
+import random
 import re
 import sys
+import tempfile
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+
+# Compact backup schema
+#
+# By default only the fields the migration (and the txt format) uses are
+# downloaded and kept.  The result has the same nesting as a full backup, so
+# every reader of playlists.json handles both:
+#
+#   {
+#     "schema": "s2yt-compact-1",
+#     "playlists": [
+#       {"id", "name", "snapshot_id",
+#        "tracks": [
+#          {"added_at",
+#           "track": {"id", "name", "uri", "duration_ms",
+#                     "external_ids": {"isrc"},
+#                     "artists": [{"name"}],
+#                     "album": {"name", "release_date"}}}]}],
+#     "albums": [
+#       {"added_at",
+#        "album": {"id", "name", "release_date",
+#                  "artists": [{"name"}],
+#                  "tracks": {"items": [{"name", "uri", "duration_ms",
+#                                        "artists": [{"name"}]}]}}}]
+#   }
+#
+# Liked Songs are the playlist without an "id".  "track" may be null, and
+# fields Spotify has no value for are left out.  A full backup (--full) has
+# no "schema" key.
+COMPACT_SCHEMA = "s2yt-compact-1"
+
+_ARTISTS = {"name": None}
+TRACK_FIELDS = {
+    "added_at": None,
+    "track": {
+        "id": None,
+        "name": None,
+        "uri": None,
+        "duration_ms": None,
+        "external_ids": {"isrc": None},
+        "artists": _ARTISTS,
+        "album": {"name": None, "release_date": None},
+    },
+}
+ALBUM_FIELDS = {
+    "added_at": None,
+    "album": {
+        "id": None,
+        "name": None,
+        "release_date": None,
+        "artists": _ARTISTS,
+        "tracks": {
+            "items": {
+                "name": None,
+                "uri": None,
+                "duration_ms": None,
+                "artists": _ARTISTS,
+            }
+        },
+    },
+}
+PLAYLIST_FIELDS = {"id": None, "name": None, "snapshot_id": None}
+
+
+def project(value, fields):
+    """Keep only `fields` (a nested dict of field names) of a JSON value."""
+    if fields is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    return {
+        key: project(value[key], sub_fields)
+        for key, sub_fields in fields.items()
+        if key in value
+    }
+
+
+def fields_param(fields):
+    """Render `fields` in the syntax of Spotify's `fields` query parameter."""
+    return ",".join(
+        key if sub_fields is None else f"{key}({fields_param(sub_fields)})"
+        for key, sub_fields in fields.items()
+    )
+
+
+class SpotifyAPIError(Exception):
+    """
+    A Spotify API request failed.
+
+    `status` is the HTTP status, or None if no response was received, and
+    `retry_after` the number of seconds Spotify asked to wait, if any.
+    """
+
+    def __init__(self, url, message, status=None, retry_after=None):
+        super().__init__(f"{message}: {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        """Whether the request may succeed if it is repeated."""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+    @classmethod
+    def from_response(cls, url, res):
+        if res.status == 401:
+            message = "Access token expired or invalid (HTTP 401)"
+        elif res.status == 429:
+            message = "Rate limited (HTTP 429)"
+        else:
+            message = f"HTTP {res.status} {res.reason}"
+        return cls(url, message, res.status, _retry_after(res))
+
+
+def _retry_after(res):
+    """Return the seconds to wait from a Retry-After header, if any."""
+    value = res.getheader("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def default_cache_dir():
+    """Return the per-user cache directory responses are cached in by default."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "spotify2ytmusic")
+
+
+class ETagCache:
+    """
+    On-disk cache of API responses, revalidated with If-None-Match.
+
+    Every response that carries an ETag is stored gzip-compressed in
+    `directory`, in a file named after the Spotify `user` it was fetched for
+    and its URL: the ETag on the first line, the JSON body after it.  Entries
+    not used for `max_age` seconds are removed when the cache is opened, and
+    then the least recently used ones until all of them fit in `max_size`
+    bytes.  `hits` counts the responses served from the cache, `misses` the
+    ones downloaded.
+    """
+
+    MAX_AGE = 30 * 24 * 60 * 60
+    MAX_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, directory, user="", max_age=MAX_AGE, max_size=MAX_SIZE):
+        self.directory = directory
+        self.user = user
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.prune(max_age, max_size)
+
+    def prune(self, max_age, max_size):
+        """Remove the entries unused for `max_age` seconds or over `max_size`."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".gz"):
+                with contextlib.suppress(OSError):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort(reverse=True)
+        oldest = time.time() - max_age
+        size = 0
+        for mtime, entry_size, path in entries:
+            size += entry_size
+            if mtime < oldest or size > max_size:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    def record(self, hit):
+        """Count a response as served from the cache (`hit`) or downloaded."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _filename(self, url):
+        key = self.user + "\n" + url
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".gz")
+
+    def etag(self, url):
+        """Return the ETag of the cached response for `url`, if any."""
+        try:
+            with gzip.open(self._filename(url), "rb") as f:
+                return f.readline().rstrip(b"\n").decode("ascii") or None
+        except (OSError, EOFError, UnicodeDecodeError):
+            return None
+
+    def load(self, url):
+        """Return the cached response for `url`, or None if it is unusable."""
+        filename = self._filename(url)
+        try:
+            with gzip.open(filename, "rb") as f:
+                f.readline()
+                data = json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        # Marks the entry as used, for `prune`
+        with contextlib.suppress(OSError):
+            os.utime(filename)
+        return data
+
+    def store(self, url, etag, body):
+        """Cache `body` (the raw JSON bytes) as the response for `url`."""
+        fd, tmp_file = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(
+                fileobj=raw, mode="wb", compresslevel=1
+            ) as f:
+                f.write(etag.encode("ascii") + b"\n")
+                f.write(body)
+            os.replace(tmp_file, self._filename(url))
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+
+class ConnectionPool:
+    """
+    Persistent HTTP(S) connections, kept per host and reused between requests.
+
+    A connection is used by one thread at a time; threads that find no idle
+    connection for a host open a new one, and at most `maxsize` idle ones
+    per host are kept.
+    """
+
+    def __init__(self, maxsize=8, timeout=30):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def urlopen(self, url, headers):
+        """GET `url`, yielding the http.client response to read from."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+
+        conn, reused = self._checkout(key)
+        try:
+            conn.request("GET", path, headers=headers)
+            res = conn.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            conn.close()
+            if not reused:
+                raise
+            # The server closed an idle connection, retry on a new one
+            conn, _ = self._checkout(key, new=True)
+            conn.request("GET", path, headers=headers)
+            res = conn.getresponse()
+
+        try:
+            yield res
+            res.read()  # The response must be consumed to reuse the connection
+        finally:
+            if res.isclosed() and not res.will_close:
+                self._checkin(key, conn)
+            else:
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _checkout(self, key, new=False):
+        if not new:
+            with self._lock:
+                conns = self._idle.get(key)
+                if conns:
+                    return conns.pop(), True
+        scheme, netloc = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return conn, False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.maxsize:
+                conns.append(conn)
+                return
+        conn.close()
 
 
 class SpotifyAPI:
-    """Class to interact with the Spotify API using an OAuth token."""
+    """
+    Class to interact with the Spotify API using an OAuth token.
+
+    Failed requests are retried if that can help: after the delay a 429
+    response asks for (pausing every thread), or with jittered exponential
+    backoff after server and network errors.  With a `cache_dir`, responses
+    are cached in an `ETagCache` there, for the user the first request
+    finds the token is of, and revalidated on the next run.
+    With `metrics` (a `metrics.Metrics`), every request is recorded in it,
+    by endpoint, with the hit rate of the cache.
+    """
 
     BASE_URL = "https://api.spotify.com/v1/"
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+    # Path segments after these are IDs, left out of endpoint names
+    COLLECTIONS = {"albums", "artists", "playlists", "tracks", "users"}
 
-    def __init__(self, auth):
+    def __init__(self, auth, workers=8, cache_dir=None, metrics=None):
         self._auth = auth
+        self.workers = workers
+        # Bounds the requests in flight, however many threads make them
+        self._slots = threading.BoundedSemaphore(workers)
+        self._pool = ConnectionPool(maxsize=workers)
+        self._cache_dir = cache_dir
+        self._cache = None
+        self._cache_lock = threading.RLock()
+        self._rate_limit_lock = threading.Lock()
+        self._resume_at = 0.0
+        self._metrics = metrics
+
+    def get(self, url, params={}, tries=5):
+        """
+        Fetch a resource from Spotify API.
 
-    def get(self, url, params={}, tries=3):
-        """Fetch a resource from Spotify API."""
+        Raises:
+            SpotifyAPIError: If the request failed and retrying can't help,
+                or still failed after `tries` attempts
+        """
         url = self._construct_url(url, params)
-        for _ in range(tries):
+        self._open_cache()
+        for attempt in range(tries):
+            self._wait_for_rate_limit()
+            started = time.perf_counter()
             try:
                 req = self._create_request(url)
-                return self._read_response(req)
-            except Exception as err:
-                print(f"Error fetching URL {url}: {err}")
-                time.sleep(2)
-        sys.exit("Failed to fetch data from Spotify API after retries.")
+                with self._slots:
+                    started = time.perf_counter()
+                    response = self._read_response(req)
+                self._record(url, started)
+                return response
+            except SpotifyAPIError as err:
+                error = err
+            except (OSError, http.client.HTTPException, ValueError) as err:
+                # No (complete) response: connection problems, truncated bodies
+                error = SpotifyAPIError(url, f"{type(err).__name__}: {err}")
+                error.__cause__ = err
+            self._record(url, started, error)
+            if not error.retryable or attempt == tries - 1:
+                raise error
+            if self._metrics is not None:
+                self._metrics.retry(self.endpoint(url))
+
+            if error.retry_after is not None:
+                # Every thread waits, see _wait_for_rate_limit
+                delay = error.retry_after + random.uniform(0, 1)
+                with self._rate_limit_lock:
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                print(f"Error fetching URL {url}: {error}, retrying in {delay:.1f}s")
+            else:
+                cap = min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2**attempt)
+                delay = random.uniform(0, cap)
+                print(f"Error fetching URL {url}: {error}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _record(self, url, started, error=None):
+        """Record a request that started at `started` in the metrics, if any."""
+        if self._metrics is not None:
+            self._metrics.observe(
+                self.endpoint(url), time.perf_counter() - started, error
+            )
+
+    def endpoint(self, url):
+        """Name the endpoint of `url` in metrics, e.g. "spotify.playlists/{id}"."""
+        if url.startswith(self.BASE_URL):
+            url = url[len(self.BASE_URL) :]
+        parts = urllib.parse.urlsplit(url).path.strip("/").split("/")
+        names = [
+            "{id}" if i and parts[i - 1] in self.COLLECTIONS else part
+            for i, part in enumerate(parts)
+        ]
+        return "spotify." + "/".join(names)
+
+    def _wait_for_rate_limit(self):
+        """Sleep until the end of the latest Retry-After delay, if any."""
+        with self._rate_limit_lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
 
     def list(self, url, params={}):
-        """Fetch paginated resources and return as a combined list."""
+        """
+        Fetch paginated resources and return as a combined list.
+
+        The URLs of all remaining pages are computed from the first one, and
+        fetched concurrently.  Pages without an offset (cursor paging) are
+        followed one by one.
+        """
         response = self.get(url, params)
         items = response["items"]
 
+        page_urls = self._page_urls(response, params)
+        if page_urls is not None:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for page in pool.map(self.get, page_urls):
+                    items += page["items"]
+            return items
+
         while response["next"]:
             response = self.get(response["next"])
             items += response["items"]
         return items
 
+    def list_until(self, url, params, stop):
+        """
+        Fetch pages one by one until an item for which `stop(item)` is true.
+
+        Returns:
+            (items, total): The items before that one, and the total number of
+            items the first page reported
+        """
+        response = self.get(url, params)
+        total = response.get("total")
+        items = []
+        while True:
+            for item in response["items"]:
+                if stop(item):
+                    return items, total
+                items.append(item)
+            if not response["next"]:
+                return items, total
+            response = self.get(response["next"])
+
+    @staticmethod
+    def _page_urls(response, params={}):
+        """Return the URLs of the pages after `response`, or None if unknown."""
+        if not response.get("next"):
+            return []
+        paging = [response.get(k) for k in ("total", "limit", "offset")]
+        if not all(isinstance(value, int) for value in paging):
+            return None
+
+        next_url = urllib.parse.urlsplit(response["next"])
+        query = urllib.parse.parse_qsl(next_url.query)
+        if "offset" not in dict(query):
+            return None
+        # Spotify doesn't repeat every parameter (e.g. fields) in next links
+        query += [(k, str(v)) for k, v in params.items() if k not in dict(query)]
+
+        urls = []
+        limit = response["limit"] or 1
+        for offset in range(response["offset"] + limit, response["total"], limit):
+            page_query = [(k, str(offset) if k == "offset" else v) for k, v in query]
+            urls.append(
+                urllib.parse.urlunsplit(
+                    next_url._replace(query=urllib.parse.urlencode(page_query))
+                )
+            )
+        return urls
+
+    def _open_cache(self):
+        """Open the ETagCache of the user of the token, before the first request."""
+        with self._cache_lock:
+            if self._cache_dir is None:
+                return
+            cache_dir, self._cache_dir = self._cache_dir, None
+            # Fetched uncached, this request doesn't open the cache again
+            user = self.get("me")["id"]
+            self._cache = ETagCache(cache_dir, user)
+            if self._metrics is not None:
+                self._metrics.track_cache("spotify", self._cache)
+
     @staticmethod
-    def authorize(client_id, scope):
+    def authorize(client_id, scope, cache_dir=None, metrics=None):
         """Open a browser for user authorization and return SpotifyAPI instance."""
         redirect_uri = f"http://127.0.0.1:{SpotifyAPI._SERVER_PORT}/redirect"
         url = SpotifyAPI._construct_auth_url(client_id, scope, redirect_uri)
@@ -59,7 +521,7 @@ class SpotifyAPI:
             while True:
                 server.handle_request()
         except SpotifyAPI._Authorization as auth:
-            return SpotifyAPI(auth.access_token)
+            return SpotifyAPI(auth.access_token, cache_dir=cache_dir, metrics=metrics)
 
     @staticmethod
     def _construct_auth_url(client_id, scope, redirect_uri):
@@ -81,16 +543,44 @@ class SpotifyAPI:
         return url
 
     def _create_request(self, url):
-        """Create an authenticated request."""
-        req = urllib.request.Request(url)
-        req.add_header("Authorization", f"Bearer {self._auth}")
-        return req
+        """Create an authenticated request, as (url, headers)."""
+        return url, {
+            "Authorization": f"Bearer {self._auth}",
+            "Accept-Encoding": "gzip",
+        }
 
-    def _read_response(self, req):
-        """Read and parse the response."""
-        with urllib.request.urlopen(req) as res:
-            reader = codecs.getreader("utf-8")
-            return json.load(reader(res))
+    def _read_response(self, req, conditional=True):
+        """Send the request on a pooled connection and parse the response."""
+        url, headers = req
+        etag = self._cache.etag(url) if self._cache and conditional else None
+        if etag:
+            headers = dict(headers, **{"If-None-Match": etag})
+
+        with self._pool.urlopen(url, headers) as res:
+            if res.status == 304 and etag:
+                cached = self._cache.load(url)
+            elif res.status >= 400:
+                res.read()  # Keeps the connection reusable
+                raise SpotifyAPIError.from_response(url, res)
+            else:
+                if self._cache:
+                    self._cache.record(hit=False)
+                body = res
+                if res.getheader("Content-Encoding", "").lower() == "gzip":
+                    body = gzip.GzipFile(fileobj=res)
+                new_etag = res.getheader("ETag")
+                if self._cache and new_etag:
+                    data = body.read()
+                    self._cache.store(url, new_etag, data)
+                    return json.loads(data)
+                reader = codecs.getreader("utf-8")
+                return json.load(reader(body))
+
+        if cached is None:
+            # The cache entry is damaged, fetch the resource again
+            return self._read_response(req, conditional=False)
+        self._cache.record(hit=True)
+        return cached
 
     _SERVER_PORT = 43019
 
@@ -136,73 +626,427 @@ class SpotifyAPI:
             self.access_token = access_token
 
 
-def fetch_user_data(spotify, dump):
-    """Fetch playlists and liked songs based on the dump parameter."""
-    playlists = []
-    liked_albums = []
+def load_previous_backup(file):
+    """Return the playlists and liked albums of an existing JSON backup, if any."""
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            backup = json.load(f)
+    except (OSError, ValueError) as err:
+        print(f"Not using the previous backup in {file}: {err}")
+        return None
+    return backup.get("playlists", []), backup.get("albums", [])
+
+
+def _saved_item_key(item):
+    """Identify a saved track or album by when and what was saved."""
+    saved = item.get("track") or item.get("album") or {}
+    return item.get("added_at"), saved.get("id")
+
+
+def _list_saved(spotify, url, known_items):
+    """
+    Fetch saved tracks or albums, newest first, reusing `known_items`.
+
+    Only the items saved after the newest known one are fetched.  If the
+    total doesn't add up (e.g. something was unsaved), everything is fetched.
+    """
+    if known_items:
+        known = {_saved_item_key(item) for item in known_items}
+        new_items, total = spotify.list_until(
+            url, {"limit": 50}, lambda item: _saved_item_key(item) in known
+        )
+        if total == len(new_items) + len(known_items):
+            print(f"  {len(new_items)} new, {len(known_items)} from previous backup")
+            return new_items + known_items
+    return spotify.list(url, {"limit": 50})
+
+
+def iter_user_data(spotify, dump, previous=None, done=frozenset(), compact=False):
+    """
+    Fetch playlists and liked songs based on the dump parameter, as they come.
+
+    Yields ("playlist", playlist) and ("albums", liked_albums) entries, in
+    backup order.  Entries whose key (see `BackupWriter.entry_key`) is in
+    `done` are not fetched.
+
+    With `previous` (playlists and liked albums of an earlier backup, see
+    `load_previous_backup`), only playlists whose snapshot_id changed are
+    fetched again, and liked songs and albums are fetched until the newest
+    one already known.  The entries of `previous` that `dump` doesn't cover
+    (e.g. its playlists when only "liked" is dumped) are yielded as they
+    are, so that an update doesn't lose them.
+
+    With `compact`, entries are in the compact schema (see COMPACT_SCHEMA),
+    and playlist tracks are requested with only those fields.
+    """
+    track_fields = TRACK_FIELDS if compact else None
+    album_fields = ALBUM_FIELDS if compact else None
+    playlist_fields = PLAYLIST_FIELDS if compact else None
+    previous_playlists, previous_albums = previous or ([], [])
+    known_playlists = {pl["id"]: pl for pl in previous_playlists if pl.get("id")}
+    known_liked = []
+    for pl in previous_playlists:
+        if pl.get("name") == "Liked Songs" and not pl.get("id"):
+            known_liked = pl["tracks"]
 
     if "liked" in dump:
         print("Loading liked albums and songs...")
-        liked_tracks = spotify.list("me/tracks", {"limit": 50})
-        liked_albums = spotify.list("me/albums", {"limit": 50})
-        playlists.append({"name": "Liked Songs", "tracks": liked_tracks})
+        if "Liked Songs" not in done:
+            liked_tracks = _list_saved(spotify, "me/tracks", known_liked)
+            yield "playlist", {
+                "name": "Liked Songs",
+                "tracks": project(liked_tracks, track_fields),
+            }
+        if "albums" not in done:
+            liked_albums = _list_saved(spotify, "me/albums", previous_albums)
+            yield "albums", project(liked_albums, album_fields)
+    elif previous:
+        # Kept from the previous backup (projecting is a no-op on entries
+        # already in the schema of this run)
+        for pl in previous_playlists:
+            if not pl.get("id") and pl.get("name") not in done:
+                yield "playlist", dict(pl, tracks=project(pl["tracks"], track_fields))
+        if previous_albums and "albums" not in done:
+            yield "albums", project(previous_albums, album_fields)
 
     if "playlists" in dump:
         print("Loading playlists...")
-        playlist_data = spotify.list("me/playlists", {"limit": 50})
-        for playlist in playlist_data:
-            print(f"Loading playlist: {playlist['name']}")
-            playlist["tracks"] = spotify.list(
-                playlist["tracks"]["href"], {"limit": 100}
-            )
-        playlists.extend(playlist_data)
+        playlist_data = [
+            playlist
+            for playlist in spotify.list("me/playlists", {"limit": 50})
+            if playlist["id"] not in done
+        ]
+
+        def _fetch(playlist):
+            known = known_playlists.get(playlist["id"])
+            if (
+                known is not None
+                and playlist.get("snapshot_id")
+                and known.get("snapshot_id") == playlist["snapshot_id"]
+            ):
+                return project(known["tracks"], track_fields)
+            params = {"limit": 100}
+            if compact:
+                fields = fields_param(TRACK_FIELDS)
+                params["fields"] = f"items({fields}),next,total,limit,offset"
+            return spotify.list(playlist["tracks"]["href"], params)
+
+        # Fetch ahead on the pool, but only so far that memory stays bounded
+        with ThreadPoolExecutor(max_workers=spotify.workers) as pool:
+            in_flight = collections.deque()
+            for playlist in playlist_data:
+                print(f"Loading playlist: {playlist['name']}")
+                in_flight.append((playlist, pool.submit(_fetch, playlist)))
+                if len(in_flight) >= 2 * spotify.workers:
+                    playlist, future = in_flight.popleft()
+                    yield "playlist", _with_tracks(
+                        playlist, future.result(), playlist_fields
+                    )
+            while in_flight:
+                playlist, future = in_flight.popleft()
+                yield "playlist", _with_tracks(
+                    playlist, future.result(), playlist_fields
+                )
+    elif previous:
+        for pl in previous_playlists:
+            if pl.get("id") and pl["id"] not in done:
+                yield "playlist", _with_tracks(
+                    pl, project(pl["tracks"], track_fields), playlist_fields
+                )
+
+
+def _with_tracks(playlist, tracks, playlist_fields):
+    playlist = project(playlist, playlist_fields)
+    playlist["tracks"] = tracks
+    return playlist
+
 
+def fetch_user_data(spotify, dump, previous=None, compact=False):
+    """Fetch playlists and liked songs based on the dump parameter."""
+    playlists = []
+    liked_albums = []
+    for kind, value in iter_user_data(spotify, dump, previous, compact=compact):
+        if kind == "playlist":
+            playlists.append(value)
+        else:
+            liked_albums = value
     return playlists, liked_albums
 
 
+class BackupWriter:
+    """
+    Write a backup one playlist at a time, so a failed run loses nothing.
+
+    Entries are appended to `file + ".partial"` as JSON lines, flushed to
+    disk as soon as they are written, after a header line recording the
+    `dump`, `format` and `schema` of the backup and when it was started.
+    `finish` assembles the final file in the requested format from them,
+    reading one entry at a time, and removes the partial file, recording
+    `schema` in JSON backups.
+
+    A partial file left by an interrupted run is resumed from if its header
+    matches this backup, or regardless with `resume=True`: its entries are
+    kept, and their keys are in `done`.  Otherwise, or with `resume=False`,
+    the backup starts over.
+    """
+
+    def __init__(self, file, format="json", resume=None, schema=None, dump=None):
+        self.file = file
+        self.format = format
+        self.schema = schema
+        self.partial_file = file + ".partial"
+        self.done = set()
+        self.header = {"dump": dump, "format": format, "schema": schema}
+
+        if resume is not False and os.path.exists(self.partial_file):
+            header = self._read_header()
+            if resume or self._same_backup(header):
+                self._load()
+                print(f"Resuming from {self.partial_file} ({len(self.done)} entries)")
+                self._f = open(self.partial_file, "a", encoding="utf-8")
+                return
+            started = (header or {}).get("started", "an unknown time")
+            print(
+                f"Starting over: {self.partial_file} (started {started}) was not "
+                "written with the same options, pass --resume to resume from it"
+            )
+
+        self.header["started"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._f = open(self.partial_file, "w", encoding="utf-8")
+        self._f.write(json.dumps({"header": self.header}) + "\n")
+        self._f.flush()
+
+    def _read_header(self):
+        """Return the header of the partial file, or None if it has none."""
+        with open(self.partial_file, "r", encoding="utf-8") as f:
+            try:
+                return json.loads(f.readline()).get("header")
+            except ValueError:
+                return None
+
+    def _same_backup(self, header):
+        """Return whether `header` is of a backup with the same options."""
+        return header is not None and all(
+            header.get(key) == value for key, value in self.header.items()
+        )
+
+    @staticmethod
+    def entry_key(kind, value):
+        """Return the key of an entry: playlist ID, "Liked Songs" or "albums"."""
+        if kind == "albums":
+            return "albums"
+        return value.get("id") or value["name"]
+
+    def write(self, kind, value):
+        """Append a ("playlist", playlist) or ("albums", liked_albums) entry."""
+        self._f.write(json.dumps({kind: value}) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.done.add(self.entry_key(kind, value))
+
+    def finish(self):
+        """Write the final backup file and remove the partial one."""
+        self._f.close()
+        print(f"Writing to {self.file}...")
+        tmp_file = self.file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            if self.format == "json":
+                if self.schema is not None:
+                    f.write('{"schema": ' + json.dumps(self.schema) + ", ")
+                else:
+                    f.write("{")
+                f.write('"playlists": [')
+                for i, playlist in enumerate(self._entries("playlist")):
+                    f.write((", " if i else "") + json.dumps(playlist))
+                albums = next(self._entries("albums"), [])
+                f.write('], "albums": ' + json.dumps(albums) + "}")
+            else:
+                for playlist in self._entries("playlist"):
+                    _write_txt_playlist(f, playlist)
+        os.replace(tmp_file, self.file)
+        os.remove(self.partial_file)
+
+    def _entries(self, kind):
+        with open(self.partial_file, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if kind in entry:
+                    yield entry[kind]
+
+    def _load(self):
+        """Collect the keys of the partial file, dropping a torn last line."""
+        good = 0
+        with open(self.partial_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    ((kind, value),) = json.loads(line).items()
+                except ValueError:
+                    break
+                if kind != "header":
+                    self.done.add(self.entry_key(kind, value))
+                good += len(line)
+        with open(self.partial_file, "r+b") as f:
+            f.truncate(good)
+
+
+def _write_txt_playlist(f, playlist):
+    f.write(playlist["name"] + "\r\n")
+    for track in playlist["tracks"]:
+        if track["track"]:
+            f.write(
+                "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
+                    uri=track["track"]["uri"],
+                    name=track["track"]["name"],
+                    artists=", ".join(
+                        [artist["name"] for artist in track["track"]["artists"]]
+                    ),
+                    album=track["track"]["album"]["name"],
+                    release_date=track["track"]["album"]["release_date"],
+                )
+            )
+    f.write("\r\n")
+
+
 def write_to_file(file, format, playlists, liked_albums):
     """Write fetched data to a file in the specified format."""
-    print(f"Writing to {file}...")
-    with open(file, "w", encoding="utf-8") as f:
-        if format == "json":
-            json.dump({"playlists": playlists, "albums": liked_albums}, f)
-        else:
-            for playlist in playlists:
-                f.write(playlist["name"] + "\r\n")
-                for track in playlist["tracks"]:
-                    if track["track"]:
-                        f.write(
-                            "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
-                                uri=track["track"]["uri"],
-                                name=track["track"]["name"],
-                                artists=", ".join(
-                                    [
-                                        artist["name"]
-                                        for artist in track["track"]["artists"]
-                                    ]
-                                ),
-                                album=track["track"]["album"]["name"],
-                                release_date=track["track"]["album"]["release_date"],
-                            )
-                        )
-                f.write("\r\n")
-
-
-def main(dump="playlists,liked", format="json", file="playlists.json", token=""):
+    writer = BackupWriter(file, format, resume=False)
+    for playlist in playlists:
+        writer.write("playlist", playlist)
+    writer.write("albums", liked_albums)
+    writer.finish()
+
+
+def main(
+    dump="playlists,liked",
+    format="json",
+    file="playlists.json",
+    token="",
+    incremental=False,
+    resume=None,
+    compact=True,
+    cache_dir=default_cache_dir(),
+    metrics=None,
+):
+    """
+    Back up the Spotify library to `file`.
+
+    Every playlist is written to disk as soon as it has been fetched, and a
+    run picks up the playlists an interrupted one of the same backup wrote
+    (see `BackupWriter` for `resume`).
+    With `incremental`, an existing JSON backup in `file` is updated: only
+    changed playlists and newly saved songs and albums are downloaded.
+    With `compact`, only the fields listed under COMPACT_SCHEMA are kept.
+    Responses are cached in `cache_dir` (unless it is None), per user, so
+    that unchanged ones are not downloaded again.  With `metrics`, the requests
+    are recorded in it and summarized at the end.
+    """
     print("Starting backup...")
+    previous = None
+    if incremental and format == "json":
+        previous = load_previous_backup(file)
+
     spotify = (
-        SpotifyAPI(token)
+        SpotifyAPI(token, cache_dir=cache_dir, metrics=metrics)
         if token
         else SpotifyAPI.authorize(
+            cache_dir=cache_dir,
+            metrics=metrics,
             client_id="d3b96f46d3d04e828c9ab2da0c0d1506",
             scope="playlist-read-private playlist-read-collaborative user-library-read",
         )
     )
 
-    playlists, liked_albums = fetch_user_data(spotify, dump)
-    write_to_file(file, format, playlists, liked_albums)
+    writer = BackupWriter(
+        file,
+        format,
+        resume=resume,
+        schema=COMPACT_SCHEMA if compact else None,
+        dump=dump,
+    )
+    for kind, value in iter_user_data(
+        spotify, dump, previous, writer.done, compact=compact
+    ):
+        writer.write(kind, value)
+    writer.finish()
     print(f"Backup completed! Data written to {file}")
+    if metrics is not None:
+        print(metrics.summary())
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Back up a Spotify library")
+    parser.add_argument("file", nargs="?", default="playlists.json")
+    parser.add_argument("--dump", default="playlists,liked")
+    parser.add_argument("--format", choices=["json", "txt"], default="json")
+    parser.add_argument("--token", default="")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Update an existing JSON backup, only downloading what changed",
+    )
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument(
+        "--resume",
+        action="store_const",
+        const=True,
+        help="Resume from a .partial file left by an interrupted run, even if "
+        "it was started with other options",
+    )
+    resume.add_argument(
+        "--no-resume",
+        action="store_const",
+        const=False,
+        dest="resume",
+        help="Start over instead of resuming from a .partial file left by an "
+        "interrupted run",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Keep every field Spotify returns instead of the compact schema",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=default_cache_dir(),
+        help="Directory of cached responses, revalidated with ETags; entries "
+        "unused for 30 days are removed (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Don't cache responses")
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Write per-endpoint request counts, errors and latencies to this "
+        "JSON file, and print a summary of them",
+    )
+    args = parser.parse_args()
+
+    metrics = None
+    if args.metrics_file:
+        try:
+            from spotify2ytmusic.metrics import Metrics
+        except ImportError:  # Run as a script from the source tree
+            from metrics import Metrics
+        metrics = Metrics()
+    try:
+        main(
+            args.dump,
+            args.format,
+            args.file,
+            args.token,
+            args.incremental,
+            resume=args.resume,
+            compact=not args.full,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            metrics=metrics,
+        )
+    except SpotifyAPIError as err:
+        sys.exit(f"Failed to fetch data from Spotify API: {err}")
+    finally:
+        if metrics is not None:
+            metrics.write_json(args.metrics_file)
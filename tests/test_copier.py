@@ -0,0 +1,594 @@
+#!/usr/bin/env python
+
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import async_backend, backend
+from spotify2ytmusic.journal import Journal
+from spotify2ytmusic.match_cache import MatchCache
+from spotify2ytmusic.simulator import YTMusicSimulator
+
+
+def make_ytmusic():
+    """Return a mocked YTMusic that resolves every song to a videoId of its title."""
+    yt = MagicMock()
+    yt.get_playlist.return_value = {"title": "Test Playlist"}
+    yt.get_album.return_value = {"tracks": []}
+
+    def search(query, filter):
+        if filter == "albums":
+            return []
+        title = query.split(" by ")[0]
+        return [{"title": title, "videoId": title, "artists": [{"name": "Artist"}]}]
+
+    yt.search.side_effect = search
+    return yt
+
+
+def songs(count):
+    return [backend.SongInfo(f"v{i}", "Artist", "Album") for i in range(count)]
+
+
+class TestLookupPipeline(unittest.TestCase):
+    def test_concurrent_lookups_commit_in_order(self):
+        yt = make_ytmusic()
+        src = songs(20) + songs(3)
+        backend.copier(
+            iter(src), "dst", track_sleep=0, yt=yt, batch_size=1, lookup_workers=4
+        )
+
+        added = [c.kwargs["videoIds"][0] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(added, [f"v{i}" for i in range(20)])
+
+    def test_async_engine_commits_in_order(self):
+        yt = make_ytmusic()
+        async_backend.run(
+            async_backend.copier(
+                iter(songs(20)), "dst", track_sleep=0, yt=yt, concurrency=4
+            ),
+            concurrency=4,
+        )
+
+        batches = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(batches, [[f"v{i}" for i in range(20)]])
+
+
+class TestAlbumCache(unittest.TestCase):
+    def test_album_is_fetched_once(self):
+        yt = MagicMock()
+        yt.search.return_value = [{"browseId": "album1"}]
+        yt.get_album.return_value = {
+            "tracks": [
+                {"title": f"v{i}", "videoId": f"v{i}", "artists": [{"name": "Artist"}]}
+                for i in range(12)
+            ]
+        }
+
+        backend.copier(iter(songs(12)), "dst", track_sleep=0, yt=yt)
+
+        self.assertEqual(yt.search.call_count, 1)
+        self.assertEqual(yt.get_album.call_count, 1)
+        added = yt.add_playlist_items.call_args.kwargs["videoIds"]
+        self.assertEqual(added, [f"v{i}" for i in range(12)])
+
+    def test_concurrent_misses_share_one_fetch(self):
+        yt = MagicMock()
+
+        def search(query, filter):
+            time.sleep(0.05)  # Keeps the other workers waiting on this fetch
+            if filter == "albums":
+                return [{"browseId": "album1"}]
+            return []
+
+        yt.search.side_effect = search
+        yt.get_album.return_value = {
+            "tracks": [
+                {"title": f"v{i}", "videoId": f"v{i}", "artists": [{"name": "Artist"}]}
+                for i in range(12)
+            ]
+        }
+        album_cache = backend.AlbumCache()
+
+        backend.copier(
+            iter(songs(12)),
+            "dst",
+            track_sleep=0,
+            yt=yt,
+            album_cache=album_cache,
+            lookup_workers=8,
+        )
+
+        self.assertEqual(yt.search.call_count, 1)
+        self.assertEqual(yt.get_album.call_count, 1)
+        self.assertEqual((album_cache.hits, album_cache.misses), (22, 2))
+
+
+class TestJournal(unittest.TestCase):
+    def test_resume_skips_finished_tracks(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal_file = os.path.join(tmpdir, "journal.jsonl")
+            yt = make_ytmusic()
+            search = yt.search.side_effect
+
+            def failing_search(query, filter):
+                if query.startswith("v3 by"):
+                    raise Exception("search failed")
+                return search(query, filter)
+
+            yt.search.side_effect = failing_search
+            with Journal(journal_file) as journal:
+                backend.copier(
+                    iter(songs(5)), "dst", track_sleep=0, yt=yt, journal=journal
+                )
+                self.assertFalse(journal.is_done("dst"))
+
+            yt = make_ytmusic()
+            with Journal(journal_file, resume=True) as journal:
+                backend.copier(
+                    iter(songs(5)), "dst", track_sleep=0, yt=yt, journal=journal
+                )
+                self.assertTrue(journal.is_done("dst"))
+
+            # Only the failed track was looked up and written again
+            self.assertEqual(
+                [
+                    c.kwargs["query"]
+                    for c in yt.search.call_args_list
+                    if c.kwargs["filter"] == "songs"
+                ],
+                ["v3 by Artist"],
+            )
+            yt.add_playlist_items.assert_called_once_with(
+                playlistId="dst", videoIds=["v3"], duplicates=False
+            )
+
+    def test_existing_journal_is_not_truncated(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal_file = os.path.join(tmpdir, "journal.jsonl")
+            with Journal(journal_file) as journal:
+                journal.record("dst", 0, "v0", "added")
+
+            with self.assertRaises(FileExistsError):
+                Journal(journal_file)
+            with Journal(journal_file, resume=True) as journal:
+                self.assertTrue(journal.is_done("dst", 0))
+
+    def test_resume_twice_after_torn_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal_file = os.path.join(tmpdir, "journal.jsonl")
+            with Journal(journal_file) as journal:
+                journal.record("dst", 0, "v0", "added")
+            with open(journal_file, "a", encoding="utf-8") as f:
+                f.write('{"playlist": "dst", "ind')  # killed mid-write
+
+            with Journal(journal_file, resume=True) as journal:
+                self.assertTrue(journal.is_done("dst", 0))
+                journal.record("dst", 1, "v1", "added")
+
+            with Journal(journal_file, resume=True) as journal:
+                self.assertTrue(journal.is_done("dst", 0))
+                self.assertTrue(journal.is_done("dst", 1))
+
+    def test_concurrent_writers_and_readers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal_file = os.path.join(tmpdir, "journal.jsonl")
+            with Journal(journal_file) as journal:
+
+                def write(playlist):
+                    for index in range(2000):
+                        journal.record(playlist, index, f"v{index}", "added")
+                    journal.mark_done(playlist)
+
+                def read(playlist):
+                    for _ in range(200):
+                        journal.video_ids(playlist)
+                        journal.is_done(playlist, 0)
+
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    futures = [pool.submit(write, f"pl{i}") for i in range(4)]
+                    futures += [pool.submit(read, f"pl{i}") for i in range(4)]
+                    for future in futures:
+                        future.result()
+
+            with Journal(journal_file, resume=True) as journal:
+                for i in range(4):
+                    self.assertTrue(journal.is_done(f"pl{i}"))
+                    self.assertEqual(len(journal.video_ids(f"pl{i}")), 2000)
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.yt = make_ytmusic()
+        # v0-v7 are present; "V8" only as another version of the song
+        tracks = [
+            {"title": f"V{i}", "videoId": f"v{i}", "artists": [{"name": "artist"}]}
+            for i in range(8)
+        ]
+        tracks.append(
+            {"title": "V8", "videoId": "v8-live", "artists": [{"name": "artist"}]}
+        )
+        self.yt.get_playlist.return_value = {"title": "Test Playlist", "tracks": tracks}
+
+    def song_searches(self):
+        return [
+            c.kwargs["query"]
+            for c in self.yt.search.call_args_list
+            if c.kwargs["filter"] == "songs"
+        ]
+
+    def test_sync_only_copies_missing_tracks(self):
+        backend.copier(iter(songs(10)), "dst", track_sleep=0, yt=self.yt, sync=True)
+
+        self.yt.get_playlist.assert_called_once_with(playlistId="dst", limit=None)
+        # Membership is decided on the resolved videoIds
+        self.assertEqual(self.song_searches(), [f"v{i} by Artist" for i in range(10)])
+        self.yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst", videoIds=["v8", "v9"], duplicates=False
+        )
+
+    def test_sync_skips_cached_matches_before_searching(self):
+        with tempfile.TemporaryDirectory() as tmpdir, MatchCache(
+            os.path.join(tmpdir, "matches.sqlite")
+        ) as match_cache:
+            for song in songs(8):
+                match_cache.put(
+                    song.title, song.artist, song.album, 0, {"videoId": song.title}
+                )
+
+            backend.copier(
+                iter(songs(10)),
+                "dst",
+                track_sleep=0,
+                yt=self.yt,
+                sync=True,
+                match_cache=match_cache,
+            )
+            self.assertEqual((match_cache.hits, match_cache.misses), (0, 2))
+
+        self.assertEqual(self.song_searches(), ["v8 by Artist", "v9 by Artist"])
+        self.yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst", videoIds=["v8", "v9"], duplicates=False
+        )
+
+
+@patch("spotify2ytmusic.backend.time.sleep")
+class TestPlaylistWriter(unittest.TestCase):
+    def test_batches_keep_order(self, _sleep):
+        yt = make_ytmusic()
+        backend.copier(iter(songs(7)), "dst", track_sleep=0, yt=yt, batch_size=3)
+
+        batches = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(batches, [["v0", "v1", "v2"], ["v3", "v4", "v5"], ["v6"]])
+
+    def test_rejected_chunk_is_checked_against_playlist(self, _sleep):
+        yt = MagicMock()
+        playlist = ["present"]
+        yt.get_playlist.side_effect = lambda playlistId, limit: {
+            "tracks": [{"videoId": video_id} for video_id in playlist]
+        }
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if set(videoIds) & set(playlist):
+                return {"status": "STATUS_FAILED"}
+            playlist.extend(videoIds)
+            return {"status": "STATUS_SUCCEEDED"}
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        committed = []
+        writer = backend.PlaylistWriter(
+            yt,
+            "dst",
+            batch_size=4,
+            on_commit=lambda video_id, status: committed.append((video_id, status)),
+        )
+        with redirect_stdout(io.StringIO()):
+            for video_id in ["a", "b", "present", "c", "d", "a"]:
+                writer.add(video_id)
+            writer.flush()
+
+        self.assertEqual(
+            [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list],
+            [["a", "b", "present", "c"], ["a"], ["b"], ["c"], ["d", "a"], ["d"]],
+        )
+        yt.get_playlist.assert_called_once_with(playlistId="dst", limit=None)
+        self.assertEqual(
+            committed,
+            [
+                ("a", "added"),
+                ("b", "added"),
+                ("present", "rejected"),
+                ("c", "added"),
+                ("d", "added"),
+                ("a", "rejected"),
+            ],
+        )
+        self.assertEqual(writer.error_count, 0)
+
+    def test_rerun_costs_one_call_per_chunk(self, _sleep):
+        src = songs(100)
+        yt = YTMusicSimulator(src)
+        dst = yt.create_playlist("Copy", "", video_ids=list(yt.songs))
+        yt.calls.clear()
+
+        with redirect_stdout(io.StringIO()):
+            backend.copier(iter(src), dst, track_sleep=0, yt=yt, batch_size=50)
+
+        self.assertEqual(yt.calls["add_playlist_items"], 2)
+        self.assertEqual(yt.calls["get_playlist"], 2)  # As copier checks it exists
+        self.assertEqual(yt.get_playlist(dst)["trackCount"], 100)
+
+    def test_failing_track_is_counted(self, _sleep):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "bad" in videoIds:
+                raise Exception("server error")
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        writer = backend.PlaylistWriter(yt, "dst", batch_size=2)
+        for video_id in ["a", "bad", "c"]:
+            writer.add(video_id)
+        writer.flush()
+
+        self.assertEqual(writer.error_count, 1)
+        self.assertIn(
+            ["a"], [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        )
+
+
+@patch.object(backend.time, "sleep")
+class TestLibraryPlaylists(unittest.TestCase):
+    def test_fetched_once_and_updated_on_create(self, _sleep):
+        yt = MagicMock()
+        yt.get_library_playlists.return_value = [
+            {"playlistId": "PL1", "title": "One", "count": 3}
+        ]
+        yt.create_playlist.return_value = "PL2"
+        library_playlists = backend.LibraryPlaylists()
+
+        self.assertEqual(
+            backend._find_or_create_playlist(yt, "One", "PRIVATE", library_playlists),
+            "PL1",
+        )
+        self.assertEqual(
+            backend._find_or_create_playlist(yt, "Two", "PRIVATE", library_playlists),
+            "PL2",
+        )
+        self.assertEqual(
+            backend._find_or_create_playlist(yt, "Two", "PRIVATE", library_playlists),
+            "PL2",
+        )
+        yt.get_library_playlists.assert_called_once()
+        yt.create_playlist.assert_called_once()
+
+    def test_saved_snapshot_expires(self, _sleep):
+        yt = MagicMock()
+        yt.get_library_playlists.return_value = [{"playlistId": "PL1", "title": "One"}]
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "library.json")
+            backend.LibraryPlaylists(filename).add("ignored", "X")
+            backend.LibraryPlaylists(filename).get(yt, "One")
+            self.assertEqual(backend.LibraryPlaylists(filename).get(yt, "One"), "PL1")
+            self.assertEqual(yt.get_library_playlists.call_count, 1)
+
+            self.assertIsNone(backend.LibraryPlaylists(filename, ttl=-1).get(yt, "X"))
+            self.assertEqual(yt.get_library_playlists.call_count, 2)
+
+
+@patch.object(backend.time, "sleep")
+class TestParallelPlaylists(unittest.TestCase):
+    def setUp(self):
+        def track(title):
+            return {
+                "track": {
+                    "name": title,
+                    "artists": [{"name": "Artist"}],
+                    "album": {"name": "Album"},
+                }
+            }
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "playlists.json")
+        playlists = [
+            {
+                "id": f"id{n}",
+                "name": f"pl{n}",
+                "tracks": [track(f"v{n}.{i}") for i in range(n)],
+            }
+            for n in (2, 5, 3)
+        ]
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump({"playlists": playlists}, f)
+
+        self.yt = make_ytmusic()
+        self.yt.get_library_playlists.return_value = []
+        self.yt.create_playlist.side_effect = lambda title, **kw: f"PL-{title}"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, output):
+        added = {}
+        for c in self.yt.add_playlist_items.call_args_list:
+            added.setdefault(c.kwargs["playlistId"], []).extend(c.kwargs["videoIds"])
+        for n in (2, 5, 3):
+            self.assertEqual(
+                added[f"PL-pl{n}"], [f"v{n}.{i}" for i in reversed(range(n))]
+            )
+            # Each playlist's output is printed in one piece
+            start = output.index(f"== Spotify Playlist: pl{n}")
+            self.assertNotIn(
+                "== Spotify Playlist",
+                output[start + 1 : output.index("Playlist done!", start)],
+            )
+        self.assertTrue(output.rstrip().endswith("All done!"))
+
+    def test_thread_pool(self, _sleep):
+        with patch.object(
+            backend, "get_ytmusic", return_value=self.yt
+        ), redirect_stdout(io.StringIO()) as out:
+            backend.copy_all_playlists(
+                track_sleep=0,
+                spotify_playlist_file=self.filename,
+                parallel_playlists=3,
+                lookup_workers=2,
+            )
+        self.check(out.getvalue())
+
+    def test_async_engine(self, _sleep):
+        with patch.object(
+            backend, "get_ytmusic", return_value=self.yt
+        ), redirect_stdout(io.StringIO()) as out:
+            async_backend.run(
+                async_backend.copy_all_playlists(
+                    track_sleep=0,
+                    spotify_playlist_file=self.filename,
+                    parallel_playlists=3,
+                    concurrency=2,
+                ),
+                concurrency=6,
+            )
+        self.check(out.getvalue())
+
+
+@patch.object(backend.time, "sleep")
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        def track(title):
+            return {
+                "track": {
+                    "name": title,
+                    "artists": [{"name": "Artist"}],
+                    "album": {"name": "Album"},
+                }
+            }
+
+        self.doc = {
+            "playlists": [
+                {"id": "a", "name": "A", "tracks": [track("x"), track("y")]},
+                {"id": "b", "name": "B", "tracks": [track("X "), track("z")]},
+                {"name": "Liked Songs", "tracks": [track("y"), track("z")]},
+            ]
+        }
+        self.yt = make_ytmusic()
+        self.yt.get_library_playlists.return_value = []
+        self.yt.create_playlist.side_effect = lambda title, **kw: f"PL-{title}"
+
+    def copy_all(self, **kwargs):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "playlists.json")
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(self.doc, f)
+            with patch.object(
+                backend, "get_ytmusic", return_value=self.yt
+            ), redirect_stdout(io.StringIO()):
+                backend.copy_all_playlists(
+                    track_sleep=0,
+                    spotify_playlist_file=filename,
+                    dedupe=True,
+                    include_liked=True,
+                    **kwargs,
+                )
+
+    def song_searches(self):
+        return [
+            c.kwargs["query"]
+            for c in self.yt.search.call_args_list
+            if c.kwargs["filter"] == "songs"
+        ]
+
+    def test_shared_songs_are_looked_up_once(self, _sleep):
+        self.copy_all()
+
+        self.assertEqual(len(self.song_searches()), 3)
+        self.assertEqual(
+            [c.kwargs["videoIds"] for c in self.yt.add_playlist_items.call_args_list],
+            [["y", "x"], ["z", "x"]],
+        )
+        self.assertEqual(
+            [c.args for c in self.yt.rate_song.call_args_list],
+            [("y", "LIKE"), ("z", "LIKE")],
+        )
+
+    def test_failed_lookup_is_retried(self, _sleep):
+        search = self.yt.search.side_effect
+        failures = []
+
+        def flaky_search(query, filter):
+            if query.startswith("x ") and not failures:
+                failures.append(query)
+                raise ConnectionError("connection reset")
+            return search(query, filter)
+
+        self.yt.search.side_effect = flaky_search
+        self.copy_all()
+
+        self.assertEqual(failures, ["x by Artist"])
+        # Looked up again by each playlist, as written in it
+        self.assertEqual(self.song_searches()[3:], ["x by Artist", "X  by Artist"])
+        self.assertEqual(
+            [c.kwargs["videoIds"] for c in self.yt.add_playlist_items.call_args_list],
+            [["y", "x"], ["z", "X "]],
+        )
+
+    def test_missing_song_is_looked_up_once(self, _sleep):
+        search = self.yt.search.side_effect
+        self.yt.search.side_effect = lambda query, filter: (
+            [] if query.startswith("z ") else search(query, filter)
+        )
+        self.copy_all()
+
+        self.assertEqual(self.song_searches().count("z by Artist"), 1)
+        self.assertEqual(
+            [c.kwargs["videoIds"] for c in self.yt.add_playlist_items.call_args_list],
+            [["y", "x"], ["x"]],
+        )
+
+    def test_sync_leaves_out_songs_the_destination_holds(self, _sleep):
+        self.yt.get_library_playlists.return_value = [
+            {"playlistId": "PL-A", "title": "A"},
+            {"playlistId": "PL-B", "title": "B"},
+        ]
+        held = {"PL-A": ["x", "y"], "PL-B": ["x"]}
+        self.yt.get_playlist.side_effect = lambda playlistId, limit: {
+            "title": playlistId,
+            "tracks": [{"videoId": v} for v in held[playlistId]],
+        }
+        self.yt.get_liked_songs.return_value = {"tracks": []}
+
+        with tempfile.TemporaryDirectory() as tmp, MatchCache(
+            os.path.join(tmp, "matches.sqlite")
+        ) as match_cache:
+            for title in ("x", "y"):
+                match_cache.put(
+                    title, "Artist", "Album", 0, {"title": title, "videoId": title}
+                )
+            self.copy_all(sync=True, match_cache=match_cache)
+
+        # Only z is missing from a destination and not cached
+        self.assertEqual(self.song_searches(), ["z by Artist"])
+        # Every destination is fetched once, for both the dedupe and the copy
+        self.assertEqual(
+            [c.kwargs["playlistId"] for c in self.yt.get_playlist.call_args_list],
+            ["PL-A", "PL-B"],
+        )
+        self.yt.get_liked_songs.assert_called_once_with(limit=None)
+        self.assertEqual(
+            [c.kwargs["videoIds"] for c in self.yt.add_playlist_items.call_args_list],
+            [["z"]],
+        )
+        self.assertEqual(
+            [c.args for c in self.yt.rate_song.call_args_list],
+            [("y", "LIKE"), ("z", "LIKE")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.jsonstream import JSONStreamReader
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "playliststest.json")
+
+
+def load_songs(src_pl_id, filename=TEST_FILE):
+    """Songs of a playlist, the way iter_spotify_playlist used to read them."""
+    with open(filename, encoding="utf-8") as f:
+        for pl in json.load(f)["playlists"]:
+            if str(pl.get("id")) == str(src_pl_id):
+                return [
+                    backend.SongInfo(
+                        t["track"]["name"],
+                        t["track"]["artists"][0]["name"],
+                        t["track"]["album"]["name"],
+                        t["track"]["duration_ms"],
+                    )
+                    for t in pl["tracks"]
+                    if t["track"] is not None
+                ]
+
+
+class TestJSONStreamReader(unittest.TestCase):
+    def test_navigation_across_chunks(self):
+        doc = {"a": [1, 22.5, 'x"y', None, {"b": [True, False]}], "c": {}, "d": []}
+        with patch.object(JSONStreamReader, "CHUNK_SIZE", 3):
+            reader = JSONStreamReader(StringIO(json.dumps(doc)))
+            seen = {}
+            for key in reader.iter_object():
+                if key == "a":
+                    seen[key] = [reader.read_value() for _ in reader.iter_array()]
+                else:
+                    reader.skip_value()
+            self.assertEqual(seen, {"a": doc["a"]})
+            self.assertEqual(reader.peek(), "")
+
+    def test_numbers_at_every_chunk_size(self):
+        doc = '{"n": [22.5, -0.125, 1E-7, 3.5e+12, -4E2, 100, 0, -17, 6.02e23, true]}'
+        for size in range(1, len(doc) + 1):
+            with self.subTest(size=size), patch.object(
+                JSONStreamReader, "CHUNK_SIZE", size
+            ):
+                reader = JSONStreamReader(StringIO(doc))
+                self.assertEqual(reader.read_value(), json.loads(doc))
+                reader = JSONStreamReader(StringIO(doc))
+                for _ in reader.iter_object():
+                    values = [reader.read_value() for _ in reader.iter_array()]
+                self.assertEqual(values, json.loads(doc)["n"])
+
+
+class TestStreamingIterators(unittest.TestCase):
+    def test_matches_full_load(self):
+        expected = load_songs("68QlHDwCiXfhodLpS72iOx")
+        with patch.object(JSONStreamReader, "CHUNK_SIZE", 7):
+            forward = list(
+                backend.iter_spotify_playlist(
+                    "68QlHDwCiXfhodLpS72iOx", TEST_FILE, reverse_playlist=False
+                )
+            )
+            reverse = list(
+                backend.iter_spotify_playlist("68QlHDwCiXfhodLpS72iOx", TEST_FILE)
+            )
+        self.assertEqual(forward, expected)
+        self.assertEqual(reverse, expected[::-1])
+
+        with self.assertRaises(ValueError):
+            list(backend.iter_spotify_playlist("missing", TEST_FILE))
+
+    def test_id_after_tracks_and_liked_albums(self):
+        track = {
+            "track": {"name": "t", "artists": [{"name": "a"}], "album": {"name": "b"}}
+        }
+        doc = {
+            "playlists": [
+                {"tracks": [track], "name": "Other", "id": "other"},
+                {"tracks": [track, {"track": None}], "name": "Late", "id": "late"},
+            ],
+            "albums": [
+                {
+                    "added_at": "2024-01-01",
+                    "album": {"name": "Al", "tracks": {"items": [track["track"]]}},
+                }
+            ],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "playlists.json")
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(doc, f)
+
+            self.assertEqual(
+                list(backend.iter_spotify_playlist("late", filename)),
+                [backend.SongInfo("t", "a", "b")],
+            )
+            self.assertEqual(
+                list(backend.iter_spotify_liked_albums(filename)),
+                [backend.SongInfo("t", "a", "Al")],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.library_index import build_index, find_index
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "playliststest.json")
+PLAYLIST_ID = "68QlHDwCiXfhodLpS72iOx"
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmp.name, "playlists.json")
+        shutil.copy(TEST_FILE, self.json_file)
+        self.expected = list(backend.iter_spotify_playlist(PLAYLIST_ID, self.json_file))
+        self.index_file = build_index(self.json_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iterators_read_index(self):
+        self.assertEqual(find_index(self.json_file), self.index_file)
+        with patch.object(backend, "_stream_spotify_playlist") as stream:
+            for filename in (self.json_file, self.index_file):
+                self.assertEqual(
+                    list(backend.iter_spotify_playlist(PLAYLIST_ID, filename)),
+                    self.expected,
+                )
+                self.assertEqual(
+                    list(
+                        backend.iter_spotify_playlist(
+                            PLAYLIST_ID, filename, reverse_playlist=False
+                        )
+                    ),
+                    self.expected[::-1],
+                )
+            stream.assert_not_called()
+
+        self.assertEqual(
+            backend.list_spotify_playlists(self.json_file),
+            [
+                {
+                    "id": PLAYLIST_ID,
+                    "name": "Raid the Data Center",
+                    "track_count": 38,
+                }
+            ],
+        )
+        with self.assertRaises(ValueError):
+            list(backend.iter_spotify_playlist("missing", self.json_file))
+
+    def test_stale_index_is_ignored(self):
+        with open(self.json_file, "w", encoding="utf-8") as f:
+            json.dump({"playlists": []}, f)
+        self.assertIsNone(find_index(self.json_file))
+        self.assertEqual(backend.list_spotify_playlists(self.json_file), [])
+
+
+class TestSpotifyLibrary(unittest.TestCase):
+    def test_library_matches_file(self):
+        library = backend.SpotifyLibrary(TEST_FILE)
+        for reverse in (True, False):
+            self.assertEqual(
+                list(
+                    backend.iter_spotify_playlist(
+                        PLAYLIST_ID, library, reverse_playlist=reverse
+                    )
+                ),
+                list(
+                    backend.iter_spotify_playlist(
+                        PLAYLIST_ID, TEST_FILE, reverse_playlist=reverse
+                    )
+                ),
+            )
+        self.assertEqual(
+            backend.list_spotify_playlists(library),
+            backend.list_spotify_playlists(TEST_FILE),
+        )
+        self.assertEqual(
+            library.playlist_by_name("Raid the Data Center").id, PLAYLIST_ID
+        )
+        with self.assertRaises(ValueError):
+            library.playlist(None)
+
+        artists = {}
+        for song in library.playlist(PLAYLIST_ID).tracks:
+            self.assertIs(artists.setdefault(song.artist, song.artist), song.artist)
+
+    def test_copy_all_playlists_parses_once(self):
+        yt = MagicMock()
+        yt.get_library_playlists.return_value = []
+        yt.create_playlist.return_value = "dst"
+        with patch.object(backend, "get_ytmusic", return_value=yt), patch.object(
+            backend, "copier"
+        ) as copier, patch.object(
+            backend.SpotifyLibrary,
+            "_load_json",
+            autospec=True,
+            side_effect=backend.SpotifyLibrary._load_json,
+        ) as load, patch.object(
+            backend.time, "sleep"
+        ):
+            backend.copy_all_playlists(spotify_playlist_file=TEST_FILE)
+            songs = list(copier.call_args.args[0])
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(len(songs), 38)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.match_cache import MatchCache
+
+
+class TestMatchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmpdir.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lookup_song_uses_cache(self):
+        yt = MagicMock()
+        yt.search.return_value = [
+            {"title": "Song", "videoId": "vid1", "artists": [{"name": "Artist"}]}
+        ]
+        yt.get_album.return_value = {"tracks": []}
+
+        with MatchCache(self.cache_file) as cache:
+            first = backend.lookup_song(
+                yt, "Song", "Artist", "Album", 0, match_cache=cache
+            )
+        calls = yt.search.call_count
+
+        with MatchCache(self.cache_file) as cache:
+            second = backend.lookup_song(
+                yt, " song ", "ARTIST", "Album", 0, match_cache=cache
+            )
+            self.assertEqual(cache.hits, 1)
+
+        self.assertEqual(first, second)
+        self.assertEqual(yt.search.call_count, calls)
+
+    def test_ttl_and_eviction(self):
+        with MatchCache(self.cache_file, ttl=None, max_entries=2) as cache:
+            for i in range(3):
+                cache.put(f"Song {i}", "Artist", "Album", 0, {"videoId": f"v{i}"})
+            cache.get("Song 0", "Artist", "Album", 0)
+            self.assertEqual(cache.purge(), 1)
+            self.assertIsNone(cache.get("Song 1", "Artist", "Album", 0))
+
+        with MatchCache(self.cache_file, ttl=-1) as cache:
+            self.assertIsNone(cache.get("Song 0", "Artist", "Album", 0))
+
+    def test_export_import(self):
+        export_file = os.path.join(self.tmpdir.name, "cache.json")
+        with MatchCache(self.cache_file) as cache:
+            cache.put("Song", "Artist", "Album", 2, {"videoId": "vid1"})
+            self.assertEqual(cache.export_json(export_file), 1)
+
+        with MatchCache(os.path.join(self.tmpdir.name, "other.sqlite")) as cache:
+            self.assertEqual(cache.import_json(export_file), 1)
+            self.assertEqual(
+                cache.get("Song", "Artist", "Album", 2), {"videoId": "vid1"}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
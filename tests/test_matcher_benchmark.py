@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+
+from benchmarks import matcher
+from spotify2ytmusic.replay import ReplayYTMusic, load_fixture, save_fixture
+
+# Floors/ceilings with some margin below what the recorded corpus gives today;
+# a change to lookup_song that crosses one is a regression.  CPU time depends
+# on the machine, so it is only reported by benchmarks.matcher, not checked
+THRESHOLDS = {
+    # algo: (min precision, min recall, max calls/track)
+    0: (0.65, 0.70, 0.90),
+    1: (0.95, 0.50, 0.90),
+    2: (0.80, 0.85, 0.95),
+}
+
+
+class TestMatcherBenchmark(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fixture = load_fixture(matcher.DEFAULT_FIXTURE)
+
+    def test_corpus(self):
+        self.assertGreater(len(self.fixture["tracks"]), 2000)
+        yt = ReplayYTMusic(self.fixture["responses"])
+        self.assertEqual(yt.search("not recorded", filter="songs"), [])
+        with self.assertRaises(KeyError):
+            yt.get_album("not recorded")
+        self.assertEqual(yt.unrecorded["search"], 1)
+
+    def test_saved_fixture_is_reproducible(self):
+        fixture = {"tracks": [], "responses": {"search": {}, "get_album": {}}}
+        with tempfile.TemporaryDirectory() as tmp:
+            contents = []
+            for name in ("a.json.gz", "b.json.gz"):
+                filename = os.path.join(tmp, name)
+                save_fixture(fixture, filename)
+                with open(filename, "rb") as f:
+                    contents.append(f.read())
+            self.assertEqual(load_fixture(filename), fixture)
+        self.assertEqual(contents[0], contents[1])
+
+    def test_thresholds(self):
+        for algo, (precision, recall, calls) in THRESHOLDS.items():
+            with self.subTest(algo=algo):
+                result = matcher.evaluate(self.fixture, algo)
+                self.assertGreaterEqual(result["precision"], precision)
+                self.assertGreaterEqual(result["recall"], recall)
+                self.assertLessEqual(result["calls_per_track"], calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+from ytmusicapi.exceptions import YTMusicServerError
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.metrics import Histogram, Metrics, error_class, instrumented
+from spotify2ytmusic.ratelimit import RateLimiter
+from spotify2ytmusic.simulator import YTMusicSimulator
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "playliststest.json")
+PLAYLIST_ID = "68QlHDwCiXfhodLpS72iOx"
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram((0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 0.7, 3.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 2, 1])
+        self.assertEqual(histogram.cumulative()[-1], (float("inf"), 5))
+        self.assertEqual(histogram.quantile(0.4), 0.1)
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(0.99), 3.0)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_error_class(self):
+        self.assertEqual(
+            error_class(YTMusicServerError("Server returned HTTP 503: Unavailable")),
+            "HTTP 503",
+        )
+        self.assertEqual(error_class(ValueError("Did not find")), "ValueError")
+
+    def test_copier(self):
+        src = list(backend.iter_spotify_playlist(PLAYLIST_ID, TEST_FILE))
+        yt = YTMusicSimulator(src, errors={"add_playlist_items": {503: 0.3}})
+        dst = yt.create_playlist("Copy", "")
+        metrics = Metrics()
+
+        with tempfile.TemporaryDirectory() as tmp, patch.object(backend.time, "sleep"):
+            limiter = RateLimiter(
+                reads_per_second=1000, state_file=os.path.join(tmp, "ratelimit.json")
+            )
+            backend.copier(
+                iter(src),
+                dst,
+                track_sleep=0,
+                yt=yt,
+                rate_limiter=limiter,
+                metrics=metrics,
+                batch_size=5,
+            )
+
+        data = metrics.snapshot()
+        add = data["endpoints"]["ytmusic.add_playlist_items"]
+        self.assertEqual(add["calls"], yt.calls["add_playlist_items"])
+        self.assertEqual(
+            add["errors"], {"HTTP 503": yt.failures[("add_playlist_items", 503)]}
+        )
+        self.assertEqual(add["retries"], sum(add["errors"].values()))
+        self.assertEqual(
+            data["endpoints"]["ytmusic.search"]["calls"], yt.calls["search"]
+        )
+        # An album search and an album tracklist per track
+        album = data["caches"]["album"]
+        self.assertEqual(album["hits"] + album["misses"], 2 * len(src))
+
+        text = metrics.prometheus()
+        self.assertIn(
+            's2yt_api_latency_seconds_bucket{endpoint="ytmusic.search",le="+Inf"} '
+            f'{yt.calls["search"]}\n',
+            text,
+        )
+        self.assertIn("ytmusic.add_playlist_items", metrics.summary())
+
+    def test_wrap_is_idempotent(self):
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as tmp:
+            limiter = RateLimiter(state_file=os.path.join(tmp, "ratelimit.json"))
+            yt = limiter.wrap(metrics.wrap(YTMusicSimulator()))
+            self.assertIs(metrics.wrap(yt), yt)
+            self.assertIs(instrumented(yt), metrics)
+            yt.get_library_playlists()
+        self.assertEqual(
+            metrics.snapshot()["endpoints"]["ytmusic.get_library_playlists"]["calls"], 1
+        )
+
+    def test_json_file_and_server(self):
+        metrics = Metrics()
+        metrics.observe("ytmusic.search", 0.2)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "metrics.json")
+            metrics.write_json(filename)
+            with open(filename, encoding="utf-8") as f:
+                data = json.load(f)
+        self.assertEqual(data["endpoints"]["ytmusic.search"]["calls"], 1)
+
+        server = metrics.serve(0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as res:
+                text = res.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('s2yt_api_calls_total{endpoint="ytmusic.search"} 1\n', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+import importlib
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import ratelimit
+from spotify2ytmusic.ratelimit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmpdir.name, "ratelimit.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_buckets_are_separate_and_shared(self):
+        now = [1000.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        first = RateLimiter(2, 1, state_file=self.state_file)
+        second = RateLimiter(2, 1, state_file=self.state_file)
+        with patch("spotify2ytmusic.ratelimit.time.time", lambda: now[0]), patch(
+            "spotify2ytmusic.ratelimit.time.sleep", side_effect=sleep
+        ):
+            # A burst of two reads is free, the third read has to wait
+            self.assertEqual(first.acquire("read"), 0)
+            self.assertEqual(second.acquire("read"), 0)
+            self.assertEqual(first.acquire("write"), 0)
+            self.assertAlmostEqual(second.acquire("read"), 0.5)
+
+    def test_wrapped_client_calls(self):
+        yt = MagicMock()
+        limiter = RateLimiter(None, 1, state_file=self.state_file)
+        limited = limiter.wrap(yt)
+        self.assertIs(limiter.wrap(limited), limited)
+
+        with patch.object(limiter, "acquire") as acquire:
+            limited.search(query="x", filter="songs")
+            limited.add_playlist_items(playlistId="p", videoIds=["v"])
+            limited.get_history()
+        self.assertEqual(
+            [c.args for c in acquire.call_args_list], [("read",), ("write",)]
+        )
+        yt.search.assert_called_once_with(query="x", filter="songs")
+
+    def test_default_state_file_is_per_user(self):
+        cache_home = os.path.join(self.tmpdir.name, "cache")
+        try:
+            with patch.dict(
+                os.environ, {"XDG_CACHE_HOME": cache_home, "LOCALAPPDATA": ""}
+            ):
+                importlib.reload(ratelimit)
+                ratelimit.RateLimiter(1).acquire("read")
+        finally:
+            importlib.reload(ratelimit)
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(cache_home, "spotify2ytmusic", "ratelimit.json")
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
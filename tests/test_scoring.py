@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import unittest
+from unittest.mock import MagicMock
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.scoring import TrackMatcher, normalize_title
+
+
+def song(title, artist, album=None, duration_seconds=None, video_id="v"):
+    return {
+        "resultType": "song",
+        "title": title,
+        "videoId": video_id,
+        "artists": [{"name": artist}],
+        "album": {"name": album} if album else None,
+        "duration_seconds": duration_seconds,
+    }
+
+
+def fake_yt(songs, videos=()):
+    yt = MagicMock()
+    yt.search.side_effect = lambda query, filter: {
+        "songs": list(songs),
+        "videos": list(videos),
+    }.get(filter, [])
+    return yt
+
+
+class TestTrackMatcher(unittest.TestCase):
+    def test_normalize_title(self):
+        self.assertEqual(
+            normalize_title("Café del Mar (Energy 52 Remix) [Live]"), "cafe del mar"
+        )
+        self.assertEqual(normalize_title("DON'T STOP"), "don t stop")
+
+    def test_ranking(self):
+        matcher = TrackMatcher(
+            "Bohemian Rhapsody - Remastered 2011",
+            "Queen",
+            "A Night at the Opera",
+            354320,
+        )
+        candidates = [
+            song("Bohemian Rhapsody", "Pentatonix", "PTX", 290, "cover"),
+            song("Bohemian Rhapsody (Live Aid)", "Queen", "Live Aid", 366, "live"),
+            song("Bohemian Rhapsody", "Queen", "A Night at the Opera", 355, "orig"),
+        ]
+        best, confidence = matcher.best(candidates)
+        self.assertEqual(best["videoId"], "orig")
+        self.assertGreater(confidence, 0.95)
+        self.assertEqual(matcher.best([]), (None, 0.0))
+
+        video = dict(song("Queen - Bohemian Rhapsody", "Queen"), resultType="video")
+        self.assertGreater(matcher.score(video), 0.95)
+
+
+class TestApproximateLookup(unittest.TestCase):
+    def test_confident_match_skips_video_search(self):
+        yt = fake_yt(
+            [
+                song("Yesterday - Live", "Beatles Tribute", None, 150, "wrong"),
+                song("Yesterday (Remastered 2009)", "The Beatles", "Help!", 125, "ok"),
+            ]
+        )
+        details = backend.ResearchDetails()
+        track = backend.lookup_song(
+            yt, "Yesterday", "The Beatles", "Help!", 2, details, duration_ms=125000
+        )
+        self.assertEqual(track["videoId"], "ok")
+        self.assertGreater(details.confidence, 0.75)
+        filters = [call.kwargs["filter"] for call in yt.search.call_args_list]
+        self.assertNotIn("videos", filters)
+
+    def test_video_fallback_below_threshold(self):
+        yt = fake_yt(
+            [song("Something Else", "Someone", "Other", 200, "wrong")],
+            [
+                dict(
+                    song(
+                        "Artist - Rare Song (Official Video)", "Artist", None, 181, "v"
+                    ),
+                    resultType="video",
+                )
+            ],
+        )
+        track = backend.lookup_song(
+            yt, "Rare Song", "Artist", "Album", 2, duration_ms=180000
+        )
+        self.assertEqual(track["videoId"], "v")
+
+        yt = fake_yt([song("Something Else", "Someone", "Other", 200)])
+        with self.assertRaises(ValueError):
+            backend.lookup_song(yt, "Rare Song", "Artist", "Album", 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ytmusicapi.exceptions import YTMusicServerError
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.ratelimit import RateLimiter
+from spotify2ytmusic.simulator import YTMusicSimulator, constant, lognormal
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "playliststest.json")
+PLAYLIST_ID = "68QlHDwCiXfhodLpS72iOx"
+
+
+def playlist_songs():
+    return list(backend.iter_spotify_playlist(PLAYLIST_ID, TEST_FILE))
+
+
+class TestYTMusicSimulator(unittest.TestCase):
+    def test_copier_survives_write_faults(self):
+        src = playlist_songs()
+        yt = YTMusicSimulator(
+            src,
+            latency={"default": constant(0.0005)},
+            errors={"add_playlist_items": {503: 0.3, 500: 0.1}},
+        )
+        dst = yt.create_playlist("Copy", "")
+
+        with patch.object(backend.time, "sleep"):
+            backend.copier(
+                iter(src), dst, track_sleep=0, yt=yt, batch_size=2, lookup_workers=4
+            )
+
+        titles = [yt.songs[v]["title"] for v in yt.playlists[dst]["tracks"]]
+        self.assertEqual(titles, [song.title for song in src])
+        self.assertGreater(yt.failures[("add_playlist_items", 503)], 0)
+        self.assertEqual(yt.get_playlist(dst)["trackCount"], len(src))
+
+    def test_liked_songs_and_library(self):
+        src = playlist_songs()[:3]
+        yt = YTMusicSimulator(src)
+        backend.copier(iter(src), None, track_sleep=0, yt=yt)
+        self.assertEqual(
+            [t["title"] for t in yt.get_liked_songs()["tracks"]],
+            [song.title for song in reversed(src)],
+        )
+
+        pl_id = yt.create_playlist("New", "", video_ids=list(yt.songs)[:2])
+        self.assertEqual(
+            yt.get_library_playlists(),
+            [{"playlistId": pl_id, "title": "New", "count": 2}],
+        )
+        self.assertEqual(
+            yt.add_playlist_items(pl_id, list(yt.songs)[:1])["status"],
+            "STATUS_FAILED",
+        )
+
+    def test_quota_and_rate_limiter(self):
+        yt = YTMusicSimulator(quotas={"read": 10})
+        with self.assertRaisesRegex(YTMusicServerError, "HTTP 429"):
+            for _ in range(11):
+                yt.search("anything by anyone", filter="songs")
+
+        yt = YTMusicSimulator(quotas={"read": 10})
+        with tempfile.TemporaryDirectory() as tmp:
+            limiter = RateLimiter(
+                reads_per_second=8,
+                burst=0.1,
+                state_file=os.path.join(tmp, "ratelimit.json"),
+            )
+            limited = limiter.wrap(yt)
+            for _ in range(12):
+                limited.search("anything by anyone", filter="songs")
+        self.assertEqual(sum(yt.failures.values()), 0)
+
+    def test_latency_distribution(self):
+        slept = []
+        yt = YTMusicSimulator(
+            latency={"search": lognormal(0.2, 1.0)},
+            time_scale=0.5,
+            sleep=slept.append,
+        )
+        for _ in range(2000):
+            yt.search("x", filter="songs")
+        yt.get_library_playlists()
+
+        slept.sort()
+        self.assertAlmostEqual(slept[1000], 0.1, delta=0.01)
+        self.assertAlmostEqual(slept[1980], 0.5, delta=0.1)
+        self.assertEqual(yt.latencies["get_library_playlists"], [0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+
+import gzip
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.parse
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from spotify2ytmusic import spotify_backup
+from spotify2ytmusic.metrics import Metrics
+
+
+def fake_get(total, limit):
+    """Return a SpotifyAPI.get stand-in serving `total` numbered items."""
+    requested = []
+    lock = threading.Lock()
+
+    def get(self, url, params={}, tries=3):
+        url = self._construct_url(url, params)
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        offset = int(query.get("offset", 0))
+        with lock:
+            requested.append(offset)
+        next_offset = offset + limit
+        return {
+            "items": list(range(offset, min(offset + limit, total))),
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next": url.split("?")[0] + f"?offset={next_offset}&limit={limit}"
+            if next_offset < total
+            else None,
+        }
+
+    return get, requested
+
+
+class TestSpotifyAPIList(unittest.TestCase):
+    def test_pages_fetched_concurrently_in_order(self):
+        get, requested = fake_get(total=1005, limit=100)
+        with patch.object(spotify_backup.SpotifyAPI, "get", get):
+            spotify = spotify_backup.SpotifyAPI("token", workers=4)
+            items = spotify.list("playlists/x/tracks", {"limit": 100})
+
+        self.assertEqual(items, list(range(1005)))
+        self.assertEqual(sorted(requested), list(range(0, 1005, 100)))
+
+    def test_cursor_paging_followed_serially(self):
+        pages = {
+            None: {"items": [1, 2], "next": "https://api.spotify.com/v1/x?after=2"},
+            "2": {"items": [3], "next": None},
+        }
+
+        def get(self, url, params={}, tries=3):
+            query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+            return pages[query.get("after")]
+
+        with patch.object(spotify_backup.SpotifyAPI, "get", get):
+            items = spotify_backup.SpotifyAPI("token").list("x")
+        self.assertEqual(items, [1, 2, 3])
+
+
+class FakeSpotify:
+    """SpotifyAPI stand-in serving a fixed library, counting fetched items."""
+
+    def __init__(self, liked, playlists, playlist_tracks):
+        self.workers = 2
+        self.fetched = []
+        self.collections = {
+            "me/tracks": liked,
+            "me/albums": [],
+            "me/playlists": playlists,
+        }
+        self.collections.update(playlist_tracks)
+
+    def list(self, url, params={}):
+        self.fetched.extend(self.collections[url])
+        return list(self.collections[url])
+
+    def list_until(self, url, params, stop):
+        items = []
+        for item in self.collections[url]:
+            self.fetched.append(item)
+            if stop(item):
+                break
+            items.append(item)
+        return items, len(self.collections[url])
+
+
+def saved(n):
+    return {"added_at": f"2024-01-{n:02}", "track": {"id": f"t{n}"}}
+
+
+class TestIncrementalBackup(unittest.TestCase):
+    def test_only_changes_are_fetched(self):
+        previous = (
+            [
+                {"name": "Liked Songs", "tracks": [saved(2), saved(1)]},
+                {"id": "a", "snapshot_id": "s1", "tracks": ["old a"]},
+                {"id": "b", "snapshot_id": "s1", "tracks": ["old b"]},
+            ],
+            [],
+        )
+        playlists = [
+            {"id": "a", "name": "A", "snapshot_id": "s1", "tracks": {"href": "a"}},
+            {"id": "b", "name": "B", "snapshot_id": "s2", "tracks": {"href": "b"}},
+        ]
+        spotify = FakeSpotify(
+            [saved(4), saved(3), saved(2), saved(1)],
+            playlists,
+            {"a": ["new a"], "b": ["new b"]},
+        )
+
+        result, _ = spotify_backup.fetch_user_data(spotify, "playlists,liked", previous)
+
+        self.assertEqual(result[0]["tracks"], [saved(4), saved(3), saved(2), saved(1)])
+        self.assertEqual(result[1]["tracks"], ["old a"])
+        self.assertEqual(result[2]["tracks"], ["new b"])
+        self.assertNotIn("new a", spotify.fetched)
+        self.assertNotIn(saved(1), spotify.fetched)
+
+    def test_unsaved_song_triggers_full_fetch(self):
+        previous = ([{"name": "Liked Songs", "tracks": [saved(2), saved(1)]}], [])
+        spotify = FakeSpotify([saved(3), saved(2)], [], {})
+        result, _ = spotify_backup.fetch_user_data(spotify, "liked", previous)
+        self.assertEqual(result[0]["tracks"], [saved(3), saved(2)])
+
+    def test_entries_outside_dump_are_kept(self):
+        liked = {"name": "Liked Songs", "tracks": [saved(1)]}
+        pl_a = {"id": "a", "name": "A", "snapshot_id": "s1", "tracks": ["old a"]}
+        albums = [{"added_at": "2024-01-01", "album": {"id": "al1"}}]
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "playlists.json")
+            with open(file, "w", encoding="utf-8") as f:
+                json.dump({"playlists": [liked, pl_a], "albums": albums}, f)
+            spotify = FakeSpotify([saved(2), saved(1)], [], {})
+            spotify.collections["me/albums"] = albums
+
+            with patch.object(spotify_backup, "SpotifyAPI", return_value=spotify):
+                spotify_backup.main(
+                    "liked", file=file, token="t", incremental=True, compact=False
+                )
+            with open(file, encoding="utf-8") as f:
+                backup = json.load(f)
+            self.assertEqual(
+                backup["playlists"],
+                [{"name": "Liked Songs", "tracks": [saved(2), saved(1)]}, pl_a],
+            )
+            self.assertEqual(backup["albums"], albums)
+
+            # And the other way around
+            result, liked_albums = spotify_backup.fetch_user_data(
+                FakeSpotify([], [], {}),
+                "playlists",
+                spotify_backup.load_previous_backup(file),
+            )
+            self.assertEqual(result[0]["tracks"], [saved(2), saved(1)])
+            self.assertEqual(liked_albums, albums)
+
+
+class TestCompactSchema(unittest.TestCase):
+    def test_projection(self):
+        item = {
+            "added_at": "2024-01-01",
+            "is_local": False,
+            "track": {
+                "id": "t",
+                "name": "Song",
+                "popularity": 50,
+                "available_markets": ["US"] * 100,
+                "artists": [{"name": "A", "id": "a"}, {"name": "B", "id": "b"}],
+                "album": {"name": "Al", "images": [{"url": "x"}]},
+            },
+        }
+        self.assertEqual(
+            spotify_backup.project(item, spotify_backup.TRACK_FIELDS),
+            {
+                "added_at": "2024-01-01",
+                "track": {
+                    "id": "t",
+                    "name": "Song",
+                    "artists": [{"name": "A"}, {"name": "B"}],
+                    "album": {"name": "Al"},
+                },
+            },
+        )
+        self.assertEqual(
+            spotify_backup.project({"track": None}, spotify_backup.TRACK_FIELDS),
+            {"track": None},
+        )
+        self.assertEqual(
+            spotify_backup.fields_param({"a": None, "b": {"c": None, "d": None}}),
+            "a,b(c,d)",
+        )
+
+    def test_fields_requested_for_every_page(self):
+        get, _ = fake_get(total=250, limit=100)
+        urls = []
+
+        def recording_get(self, url, params={}, tries=3):
+            urls.append(self._construct_url(url, params))
+            return get(self, url, params, tries)
+
+        with patch.object(spotify_backup.SpotifyAPI, "get", recording_get):
+            spotify = spotify_backup.SpotifyAPI("token")
+            spotify.list("playlists/x/tracks", {"limit": 100, "fields": "items"})
+
+        self.assertEqual(len(urls), 3)
+        for url in urls:
+            query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+            self.assertEqual(query["fields"], "items")
+
+    def test_compact_backup(self):
+        track = {"added_at": "d", "track": {"id": "t", "name": "n", "popularity": 1}}
+        playlists = [{"id": "a", "name": "A", "public": True, "tracks": {"href": "a"}}]
+        spotify = FakeSpotify([track], playlists, {"a": [track]})
+        with patch.object(spotify, "list", wraps=spotify.list) as list_:
+            result, _ = spotify_backup.fetch_user_data(
+                spotify, "playlists,liked", compact=True
+            )
+
+        self.assertEqual(
+            result[0]["tracks"], [{"added_at": "d", "track": {"id": "t", "name": "n"}}]
+        )
+        # Playlist tracks are projected by Spotify itself
+        self.assertEqual(result[1], {"id": "a", "name": "A", "tracks": [track]})
+        self.assertIn("fields", list_.call_args_list[-1].args[1])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "playlists.json")
+            writer = spotify_backup.BackupWriter(
+                file, schema=spotify_backup.COMPACT_SCHEMA
+            )
+            writer.write("playlist", result[0])
+            writer.finish()
+            with open(file, encoding="utf-8") as f:
+                backup = json.load(f)
+        self.assertEqual(backup["schema"], spotify_backup.COMPACT_SCHEMA)
+        self.assertEqual(backup["playlists"], [result[0]])
+
+
+class TestBackupWriter(unittest.TestCase):
+    def test_resume_partial_backup(self):
+        liked = {"name": "Liked Songs", "tracks": []}
+        pl_a = {"id": "a", "name": "A", "tracks": [1]}
+        pl_b = {"id": "b", "name": "B", "tracks": [2]}
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "playlists.json")
+            writer = spotify_backup.BackupWriter(file)
+            writer.write("playlist", liked)
+            writer.write("playlist", pl_a)
+            writer._f.write('{"playlist": {"id": "b", "na')  # killed mid-write
+            writer._f.close()
+
+            writer = spotify_backup.BackupWriter(file)
+            self.assertEqual(writer.done, {"Liked Songs", "a"})
+            writer.write("albums", ["album"])
+            writer.write("playlist", pl_b)
+            writer.finish()
+
+            with open(file, encoding="utf-8") as f:
+                self.assertEqual(
+                    json.load(f),
+                    {"playlists": [liked, pl_a, pl_b], "albums": ["album"]},
+                )
+            self.assertFalse(os.path.exists(file + ".partial"))
+
+    def test_partial_backup_of_other_options_is_not_resumed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "playlists.json")
+            writer = spotify_backup.BackupWriter(file, dump="liked")
+            writer.write("playlist", {"name": "Liked Songs", "tracks": []})
+            writer._f.close()
+
+            with redirect_stdout(io.StringIO()) as out:
+                writer = spotify_backup.BackupWriter(file, dump="playlists")
+            self.assertIn("Starting over", out.getvalue())
+            self.assertEqual(writer.done, set())
+            writer._f.close()
+
+            # Left by a run of the same backup, or resumed explicitly
+            writer = spotify_backup.BackupWriter(file, dump="playlists")
+            writer.write("playlist", {"id": "a", "name": "A", "tracks": []})
+            writer._f.close()
+            writer = spotify_backup.BackupWriter(file, dump="playlists")
+            self.assertEqual(writer.done, {"a"})
+            writer._f.close()
+            writer = spotify_backup.BackupWriter(file, resume=True, dump="liked")
+            self.assertEqual(writer.done, {"a"})
+            writer.finish()
+
+            with open(file, encoding="utf-8") as f:
+                self.assertEqual(
+                    json.load(f),
+                    {
+                        "playlists": [{"id": "a", "name": "A", "tracks": []}],
+                        "albums": [],
+                    },
+                )
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests = []
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        self.requests.append(self.path)
+        errors = {"missing": 404, "expired": 401, "limited": 429, "down": 503}
+        status = errors.get(self.path.rsplit("/", 1)[-1])
+        if status == 429 and self.requests.count(self.path) > 1:
+            status = None
+        if status:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.requests.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        user = self.headers["Authorization"].split()[-1]
+        body = json.dumps(
+            {"id": user, "path": self.path, "items": ["é"] * 100}
+        ).encode()
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        _Handler.connections = set()
+        _Handler.requests = []
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.spotify = spotify_backup.SpotifyAPI("token")
+        self.spotify.BASE_URL = f"http://127.0.0.1:{self.server.server_port}/v1/"
+
+    def tearDown(self):
+        self.spotify._pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_and_gzip(self):
+        for i in range(5):
+            response = self.spotify.get("me/tracks", {"offset": i})
+            self.assertEqual(response["path"], f"/v1/me/tracks?offset={i}")
+            self.assertEqual(response["items"], ["é"] * 100)
+        self.assertEqual(len(_Handler.connections), 1)
+
+        with self.assertRaises(spotify_backup.SpotifyAPIError):
+            self.spotify._read_response(
+                self.spotify._create_request(self.spotify.BASE_URL + "missing")
+            )
+        self.spotify.get("me/tracks")
+        self.assertEqual(len(_Handler.connections), 1)
+
+    def test_errors_retried_by_class(self):
+        with patch.object(spotify_backup.time, "sleep") as sleep:
+            self.assertEqual(self.spotify.get("limited")["path"], "/v1/limited")
+            self.assertEqual(len(sleep.call_args_list), 1)
+            self.assertLessEqual(sleep.call_args.args[0], 1)
+
+            for path, status, tries in (("expired", 401, 1), ("down", 503, 3)):
+                _Handler.requests = []
+                with self.assertRaises(spotify_backup.SpotifyAPIError) as cm:
+                    self.spotify.get(path, tries=3)
+                self.assertEqual(cm.exception.status, status)
+                self.assertEqual(len(_Handler.requests), tries)
+
+    def test_etag_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(2):
+                spotify = spotify_backup.SpotifyAPI("token", cache_dir=tmp)
+                spotify.BASE_URL = self.spotify.BASE_URL
+                response = spotify.get("me/tracks")
+                self.assertEqual(response["items"], ["é"] * 100)
+                spotify._pool.close()
+            self.assertEqual(_Handler.requests.count(304), 1)
+            self.assertEqual(_Handler.requests.count("/v1/me"), 2)
+
+            # Another account doesn't get the responses cached for this one
+            other = spotify_backup.SpotifyAPI("other", cache_dir=tmp)
+            other.BASE_URL = self.spotify.BASE_URL
+            other.get("me/tracks")
+            other._pool.close()
+            self.assertEqual(_Handler.requests.count(304), 1)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+            # A damaged entry is replaced by an unconditional request
+            for name in os.listdir(tmp):
+                with open(os.path.join(tmp, name), "wb") as f:
+                    f.write(gzip.compress(b'"v1"\n{'))
+            self.assertEqual(spotify.get("me/tracks")["path"], "/v1/me/tracks")
+            spotify._pool.close()
+
+    def test_etag_cache_is_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = spotify_backup.ETagCache(tmp, "user")
+            for i in range(4):
+                cache.store(f"url{i}", '"v1"', json.dumps([0] * 100 * i).encode())
+                age = 100 - 30 * i
+                os.utime(cache._filename(f"url{i}"), (time.time() - age,) * 2)
+            self.assertEqual(cache.load("url1"), [0] * 100)  # Now the latest
+
+            size = sum(
+                os.path.getsize(cache._filename(url)) for url in ("url1", "url3")
+            )
+            spotify_backup.ETagCache(tmp, "user", max_age=90, max_size=size)
+            # url0 is too old, url2 doesn't fit besides the more recently used
+            self.assertEqual(
+                sorted(os.listdir(tmp)),
+                sorted(os.path.basename(cache._filename(u)) for u in ("url1", "url3")),
+            )
+
+    def test_metrics(self):
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as tmp:
+            spotify = spotify_backup.SpotifyAPI("token", cache_dir=tmp, metrics=metrics)
+            spotify.BASE_URL = self.spotify.BASE_URL
+            with patch.object(spotify_backup.time, "sleep"):
+                for _ in range(2):
+                    spotify.get("playlists/37i9dQZF1DXcBWIGoYBM5M/tracks")
+                spotify.get("limited")
+                with self.assertRaises(spotify_backup.SpotifyAPIError):
+                    spotify.get("down", tries=2)
+            spotify._pool.close()
+
+        data = metrics.snapshot()
+        tracks = data["endpoints"]["spotify.playlists/{id}/tracks"]
+        self.assertEqual(tracks["calls"], 2)
+        self.assertEqual(tracks["buckets"]["+Inf"], 2)
+        limited = data["endpoints"]["spotify.limited"]
+        self.assertEqual((limited["calls"], limited["retries"]), (2, 1))
+        self.assertEqual(limited["errors"], {"HTTP 429": 1})
+        down = data["endpoints"]["spotify.down"]
+        self.assertEqual((down["calls"], down["retries"]), (2, 1))
+        self.assertEqual(down["errors"], {"HTTP 503": 2})
+        self.assertEqual(data["caches"]["spotify"]["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
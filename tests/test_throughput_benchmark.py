@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import throughput
+
+
+class TestThroughputBenchmark(unittest.TestCase):
+    def test_scenarios(self):
+        songs = throughput.synthetic_songs(600)
+        size = throughput.PLAYLIST_SIZE
+
+        def available(songs):
+            return {song for song in songs if int(song.title.split()[-1]) % 50}
+
+        # Repeats of a song within a playlist are not added
+        expected = {
+            "copier": len(available(songs)),
+            "copy_playlist": len(available(songs)),
+            "copy_all_playlists": sum(
+                len(available(songs[i : i + size])) for i in range(0, 600, size)
+            ),
+        }
+        for scenario in throughput.SCENARIOS:
+            with self.subTest(scenario=scenario):
+                result = throughput.run_scenario(
+                    scenario, 600, lookup_workers=4, time_scale=0
+                )
+                self.assertEqual(result["added"], expected[scenario])
+                self.assertLess(result["calls_per_track"], 2)
+                self.assertLessEqual(result["lookup_p50_ms"], result["lookup_p99_ms"])
+
+    def test_history_is_appended(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            history = os.path.join(tmp, "history.json")
+            throughput.append_history(history, {"label": "a"})
+            throughput.append_history(history, {"label": "b"})
+            with open(history, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), [{"label": "a"}, {"label": "b"}])
+
+
+if __name__ == "__main__":
+    unittest.main()